@@ -628,6 +628,21 @@ app.post("/live/now", async (req, res) => {
 
 import SurveyResponse from "./models/SurveyResponse.js";
 
+// 챗봇 서버의 유저 프로필 캐시 무효화 (새 설문이 다음 채팅에 바로 반영되도록)
+const CHATBOT_URL = process.env.CHATBOT_URL || "http://localhost:8000";
+// 챗봇의 관리용 엔드포인트 토큰 (챗봇 쪽 CHATBOT_ADMIN_TOKEN 과 같은 값)
+const CHATBOT_ADMIN_TOKEN = process.env.CHATBOT_ADMIN_TOKEN || "";
+
+function invalidateChatbotProfile(userId) {
+  if (!CHATBOT_ADMIN_TOKEN) return; // 토큰이 없으면 챗봇이 거절하므로 캐시 TTL 에 맡김
+  fetch(`${CHATBOT_URL}/cache/profile/${encodeURIComponent(userId)}`, {
+    method: "DELETE",
+    headers: { "X-Admin-Token": CHATBOT_ADMIN_TOKEN },
+  }).catch((err) => {
+    console.error("Chatbot profile cache invalidate error:", err.message);
+  });
+}
+
 app.post("/api/survey/submit", async (req, res) => {
   try {
     const { user_id, answers } = req.body;
@@ -643,6 +658,7 @@ app.post("/api/survey/submit", async (req, res) => {
       genres: answers.genres,
       favorite_artists: answers.favorite_artists,
     });
+    invalidateChatbotProfile(user_id);
 
     res.json({ ok: true });
   } catch (err) {
@@ -670,6 +686,7 @@ app.post("/api/survey", async (req, res) => {
       { spotify_user_id: user_id },
       { hasSurvey: true }
     );
+    invalidateChatbotProfile(user_id);
 
     return res.json({ ok: true });
   } catch (err) {
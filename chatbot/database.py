@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 from pymongo import MongoClient
 from pathlib import Path
 import os
+import threading
 
 BASE_DIR = Path(__file__).resolve().parent  # .../ops_musicRecommend
 ENV_PATH = BASE_DIR / ".env"
@@ -10,20 +11,41 @@ load_dotenv(dotenv_path=ENV_PATH)
 
 # MONGO_URI 우선, 없으면 DB_URL 사용
 MONGO_URI = os.getenv("DB_URL")
-if not MONGO_URI:
-    raise ValueError("❌ MONGO_URI(DB_URL)가 설정 안 됐어요!")
 
-client = MongoClient(MONGO_URI)
-db = client.get_default_database()
-if db is None:
-    db = client["ops_music"]
+# import 시점에는 연결하지 않고, 처음 get_db() 할 때 연결
+# (벤치마크/테스트에서는 set_db() 로 가짜 DB 를 주입)
+client = None
+db = None
+_db_lock = threading.Lock()
+
+
+def _connect():
+    global client
+    if not MONGO_URI:
+        raise ValueError("❌ MONGO_URI(DB_URL)가 설정 안 됐어요!")
+    client = MongoClient(MONGO_URI)
+    database = client.get_default_database()
+    if database is None:
+        database = client["ops_music"]
+    return database
 
 
 def get_db():
     """다른 모듈에서 Mongo DB 객체를 가져올 때 사용하는 헬퍼."""
+    global db
+    if db is None:
+        with _db_lock:
+            if db is None:
+                db = _connect()
     return db
 
 
+def set_db(database) -> None:
+    """Mongo DB 객체를 교체한다 (가짜 DB 주입용). None 이면 다음 get_db() 때 다시 연결."""
+    global db
+    db = database
+
+
 """
 if __name__ == "__main__":
     print("✅ MongoDB 연결 테스트 시작")
@@ -0,0 +1,177 @@
+# chatbot/mcp/bench/fake_mongo.py
+# -*- coding: utf-8 -*-
+"""
+벤치마크용 인메모리 MongoDB 대역.
+
+user_profile.py 가 실제로 쓰는 부분만 흉내 낸다.
+- users.aggregate([$match, $limit, $lookup(pipeline: $sort/$limit/$project), $project])
+- surveyresponses.find_one(filter, projection=..., sort=[...])
+chatbot.database.set_db(FakeMongoDB(...)) 로 주입한다.
+"""
+import copy
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .fakes import FaultConfig
+
+_GENRES = ["발라드", "인디", "K-POP", "R&B", "힙합", "록", "재즈", "어쿠스틱"]
+_ARTISTS = [
+    "아이유",
+    "NewJeans",
+    "검정치마",
+    "잔나비",
+    "DEAN",
+    "백예린",
+    "혁오",
+    "윤하",
+]
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """단순 동등 비교만 지원."""
+    return all(doc.get(k) == v for k, v in query.items())
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = [k for k, v in projection.items() if v and k != "_id"]
+    out = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+    if projection.get("_id", 1) and "_id" in doc:
+        out["_id"] = doc["_id"]
+    return out
+
+
+def _sort(docs: List[Dict[str, Any]], spec: List[Tuple[str, int]]) -> List[Dict]:
+    for field, direction in reversed(spec):
+        docs = sorted(docs, key=lambda d: d.get(field) or 0, reverse=direction < 0)
+    return docs
+
+
+class FakeCollection:
+    def __init__(self, db: "FakeMongoDB", name: str) -> None:
+        self.db = db
+        self.name = name
+        self.docs: List[Dict[str, Any]] = []
+
+    def insert_many(self, docs: List[Dict[str, Any]]) -> None:
+        with self.db._lock:
+            for d in docs:
+                d = dict(d)
+                d.setdefault("_id", f"{self.name}-{len(self.docs)}")
+                self.docs.append(d)
+
+    def _find(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.db._lock:
+            return [d for d in self.docs if _matches(d, query)]
+
+    def find_one(
+        self,
+        filter: Optional[Dict[str, Any]] = None,  # noqa: A002
+        projection: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        self.db._roundtrip("find_one")
+        docs = self._find(filter or {})
+        if sort:
+            docs = _sort(docs, sort)
+        return _project(docs[0], projection) if docs else None
+
+    def _run_pipeline(
+        self, docs: List[Dict[str, Any]], pipeline: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        for st in pipeline:
+            ((op, arg),) = st.items()
+            if op == "$match":
+                docs = [d for d in docs if _matches(d, arg)]
+            elif op == "$limit":
+                docs = docs[:arg]
+            elif op == "$sort":
+                docs = _sort(docs, list(arg.items()))
+            elif op == "$project":
+                docs = [_project(d, arg) for d in docs]
+            elif op == "$lookup":
+                other = self.db[arg["from"]]
+                joined = []
+                for d in docs:
+                    d = dict(d)
+                    matched = other._find(
+                        {arg["foreignField"]: d.get(arg["localField"])}
+                    )
+                    d[arg["as"]] = other._run_pipeline(matched, arg.get("pipeline", []))
+                    joined.append(d)
+                docs = joined
+            else:
+                raise NotImplementedError(f"FakeMongoDB: {op} 미지원")
+        return docs
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        self.db._roundtrip("aggregate")
+        return iter(self._run_pipeline(self._find({}), pipeline))
+
+
+class FakeMongoDB:
+    def __init__(self, fault: Optional[FaultConfig] = None) -> None:
+        self.fault = fault or FaultConfig()
+        self._lock = threading.RLock()
+        self._collections: Dict[str, FakeCollection] = {}
+        self.counters: Dict[str, int] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        with self._lock:
+            coll = self._collections.get(name)
+            if coll is None:
+                coll = self._collections[name] = FakeCollection(self, name)
+            return coll
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def _roundtrip(self, op: str) -> None:
+        """네트워크 왕복 흉내 (지연 + 오류 주입)."""
+        with self._lock:
+            self.counters[op] = self.counters.get(op, 0) + 1
+        time.sleep(self.fault.sample_latency())
+        if self.fault.should_fail():
+            with self._lock:
+                self.counters["errors"] = self.counters.get("errors", 0) + 1
+            raise RuntimeError("FakeMongoDB: injected failure")
+
+
+def bench_user_id(i: int) -> str:
+    return f"bench-user-{i}"
+
+
+def seed_users(
+    db: FakeMongoDB, n: int, survey_ratio: float = 0.8, seed: int = 42
+) -> List[str]:
+    """bench-user-0..n-1 유저와 (일부) 설문 응답을 만든다. 반환: user_id 목록."""
+    rng = random.Random(seed)
+    users, surveys = [], []
+    now = time.time()
+    for i in range(n):
+        uid = bench_user_id(i)
+        has_survey = rng.random() < survey_ratio
+        users.append(
+            {
+                "spotify_user_id": uid,
+                "display_name": f"벤치{i}",
+                "hasSurvey": has_survey,
+            }
+        )
+        if has_survey:
+            surveys.append(
+                {
+                    "user_id": uid,
+                    "novelty": rng.randint(1, 5),
+                    "yearCategory": rng.choice(["2020s", "2010s", "2000s", "90s"]),
+                    "genres": rng.sample(_GENRES, 3),
+                    "favorite_artists": rng.sample(_ARTISTS, 3),
+                    "created_at": now - rng.randint(0, 86400 * 30),
+                }
+            )
+    db["users"].insert_many(users)
+    db["surveyresponses"].insert_many(surveys)
+    return [u["spotify_user_id"] for u in users]
@@ -0,0 +1,364 @@
+# chatbot/mcp/bench/fakes.py
+# -*- coding: utf-8 -*-
+"""
+벤치마크용 로컬 가짜 서버 (OpenAI chat API, Spotify Web API).
+
+표준 라이브러리 http.server 만 사용하고, 응답 지연 / 오류를 주입할 수 있다.
+- OpenAI: POST /v1/chat/completions (일반 응답 + stream=True SSE, include_usage 지원)
+- Spotify: POST /api/token, GET /v1/search, GET /v1/tracks?ids= (검색으로 돌려준 곡만)
+클라이언트가 스트림을 중간에 끊으면 (추천 곡을 충분히 찾은 경우) cancelled_streams 로 센다.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class FaultConfig:
+    """지연 시간(평균 ± 표준편차)과 오류 주입 비율."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def sample_latency(self) -> float:
+        if self.jitter <= 0:
+            return max(0.0, self.latency)
+        return max(0.0, random.gauss(self.latency, self.jitter))
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass  # 요청마다 stderr 로그를 찍지 않음
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            # 토큰 요청은 form 인코딩
+            return {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+
+    def _send_json(
+        self, status: int, body: Any, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _inject_fault(self) -> bool:
+        """설정된 지연을 주고, 오류를 주입했으면 True."""
+        fault = self.server.fault
+        time.sleep(fault.sample_latency())
+        if fault.should_fail():
+            self.server.count("errors")
+            self._send_json(
+                fault.error_status,
+                {"error": {"message": "injected failure", "type": "server_error"}},
+                headers={"Retry-After": "1"} if fault.error_status == 429 else None,
+            )
+            return True
+        return False
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler: type, fault: FaultConfig) -> None:
+        super().__init__(("127.0.0.1", 0), handler)
+        self.fault = fault
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# =========================
+# OpenAI
+# =========================
+_FAKE_MOODS = ["위로", "잔잔함", "설렘", "에너지", "새벽", "드라이브", "집중", "힐링"]
+
+
+def _requested_track_count(messages: List[Dict[str, Any]]) -> int:
+    """compact 프롬프트면 payload 의 n, 아니면 기본 20곡."""
+    user = next((m for m in reversed(messages) if m.get("role") == "user"), None)
+    if user:
+        last_line = str(user.get("content", "")).rsplit("\n", 1)[-1]
+        try:
+            n = json.loads(last_line).get("n")
+            if isinstance(n, int) and n > 0:
+                return n
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    return 20
+
+
+def fake_tracks(
+    seed_text: str, n: int, catalog_size: int = 500
+) -> List[Dict[str, Any]]:
+    """입력에 따라 결정되는 가짜 추천 곡 목록 (같은 입력이면 같은 곡)."""
+    seed = int(hashlib.sha1(seed_text.encode("utf-8")).hexdigest()[:8], 16)
+    tracks = []
+    for i in range(n):
+        k = (seed + i * 7919) % catalog_size
+        tracks.append(
+            {
+                "title": f"벤치 노래 {k}",
+                "artist": f"벤치 가수 {k % 50}",
+                "reason": f"지금 기분에 어울리는 {_FAKE_MOODS[k % len(_FAKE_MOODS)]} 곡이에요.",
+                "mood_tags": [
+                    _FAKE_MOODS[k % len(_FAKE_MOODS)],
+                    _FAKE_MOODS[(k + 3) % len(_FAKE_MOODS)],
+                ],
+                "match_score": round(1.0 - i / max(n, 1), 2),
+            }
+        )
+    return tracks
+
+
+class _OpenAIHandler(_FakeHandler):
+    server: "FakeOpenAIServer"
+
+    def do_POST(self) -> None:  # noqa: N802
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        body = self._read_json()
+        self.server.count("requests")
+        messages = body.get("messages") or []
+        prompt = "".join(str(m.get("content", "")) for m in messages)
+        n = _requested_track_count(messages)
+        content = json.dumps(
+            {"tracks": fake_tracks(prompt, n)}, ensure_ascii=False, indent=1
+        )
+        # 대략 한글 2자 = 1토큰
+        usage = {
+            "prompt_tokens": len(prompt) // 2,
+            "completion_tokens": len(content) // 2,
+            "total_tokens": (len(prompt) + len(content)) // 2,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+
+        if body.get("stream"):
+            self._stream(body, content, usage)
+            return
+
+        if self._inject_fault():
+            return
+        self._send_json(
+            200,
+            {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            },
+        )
+
+    def _stream(self, body: Dict[str, Any], content: str, usage: Dict) -> None:
+        fault = self.server.fault
+        total = fault.sample_latency()
+        # 첫 토큰까지는 전체의 일부, 나머지는 청크마다 나눠서 지연
+        time.sleep(total * self.server.ttft_ratio)
+        if fault.should_fail():
+            self.server.count("errors")
+            self._send_json(
+                fault.error_status,
+                {"error": {"message": "injected failure", "type": "server_error"}},
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        size = self.server.chunk_chars
+        pieces = [content[i : i + size] for i in range(0, len(content), size)]
+        per_chunk = total * (1 - self.server.ttft_ratio) / max(len(pieces), 1)
+        base = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+        }
+        try:
+            for piece in pieces:
+                chunk = {
+                    **base,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {"content": piece},
+                            "finish_reason": None,
+                        }
+                    ],
+                }
+                self._write_event(chunk)
+                time.sleep(per_chunk)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._write_event({**base, "choices": [], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.server.count("completed_streams")
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 충분한 곡을 찾고 스트림을 끊은 경우
+            self.server.count("cancelled_streams")
+
+    def _write_event(self, obj: Dict[str, Any]) -> None:
+        data = json.dumps(obj, ensure_ascii=False)
+        self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(FakeServer):
+    def __init__(
+        self,
+        fault: FaultConfig,
+        ttft_ratio: float = 0.15,
+        chunk_chars: int = 8,
+    ) -> None:
+        super().__init__(_OpenAIHandler, fault)
+        self.ttft_ratio = ttft_ratio
+        self.chunk_chars = chunk_chars
+
+
+# =========================
+# Spotify
+# =========================
+def _parse_search_query(q: str) -> Dict[str, str]:
+    """'track:제목 artist:가수' 또는 '제목' 형태."""
+    if q.startswith("track:"):
+        rest = q[len("track:") :]
+        title, _, artist = rest.partition(" artist:")
+        return {"title": title.strip(), "artist": artist.strip()}
+    return {"title": q.strip(), "artist": ""}
+
+
+def fake_track_item(title: str, artist: str) -> Dict[str, Any]:
+    track_id = hashlib.sha1(f"{title}|{artist}".encode("utf-8")).hexdigest()[:22]
+    return {
+        "id": track_id,
+        "name": title,
+        "uri": f"spotify:track:{track_id}",
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+        "preview_url": None,
+        "artists": [{"name": artist or "벤치 가수"}],
+    }
+
+
+class _SpotifyHandler(_FakeHandler):
+    server: "FakeSpotifyServer"
+
+    def do_POST(self) -> None:  # noqa: N802
+        if self.path.rstrip("/").endswith("/api/token"):
+            self._read_json()
+            self.server.count("token_requests")
+            self._send_json(
+                200,
+                {"access_token": "bench", "token_type": "Bearer", "expires_in": 3600},
+            )
+            return
+        self._send_json(404, {"error": {"status": 404, "message": "not found"}})
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        if path.endswith("/tracks"):
+            self._get_tracks(url.query)
+            return
+        if not path.endswith("/search"):
+            self._send_json(404, {"error": {"status": 404, "message": "not found"}})
+            return
+        self.server.count("requests")
+        if self._inject_fault():
+            return
+        q = parse_qs(url.query).get("q", [""])[0]
+        parsed = _parse_search_query(q)
+        items: List[Dict[str, Any]] = []
+        if not self.server.is_miss(parsed["title"]):
+            item = fake_track_item(parsed["title"], parsed["artist"])
+            self.server.tracks[item["id"]] = item
+            items = [item]
+        else:
+            self.server.count("misses")
+        self._send_json(200, {"tracks": {"items": items, "total": len(items)}})
+
+    def _get_tracks(self, query: str) -> None:
+        """/v1/tracks?ids=a,b,c (최대 50개, 모르는 id 는 null)."""
+        self.server.count("track_lookups")
+        if self._inject_fault():
+            return
+        ids = [i for i in parse_qs(query).get("ids", [""])[0].split(",") if i]
+        if len(ids) > 50:
+            self._send_json(400, {"error": {"status": 400, "message": "too many ids"}})
+            return
+        self.server.count("track_lookup_ids", len(ids))
+        self._send_json(200, {"tracks": [self.server.tracks.get(i) for i in ids]})
+
+
+class FakeSpotifyServer(FakeServer):
+    def __init__(self, fault: FaultConfig, miss_rate: float = 0.2) -> None:
+        super().__init__(_SpotifyHandler, fault)
+        self.miss_rate = miss_rate
+        # 검색으로 한 번 돌려준 곡 (/v1/tracks 조회용)
+        self.tracks: Dict[str, Dict[str, Any]] = {}
+
+    def is_miss(self, title: str) -> bool:
+        """제목별로 항상 같은 결과 (재검색/캐시 동작이 실제와 비슷하도록)."""
+        h = int(hashlib.md5(title.encode("utf-8")).hexdigest()[:6], 16)
+        return (h % 1000) < self.miss_rate * 1000
@@ -0,0 +1,414 @@
+# chatbot/mcp/bench/run.py
+# -*- coding: utf-8 -*-
+"""
+외부 서비스 없이 돌리는 부하 벤치마크.
+
+OpenAI / Spotify / MongoDB 를 로컬 가짜 서버(fakes.py, fake_mongo.py)로 바꾸고
+실제 FastAPI 앱을 uvicorn 으로 띄운 다음 /analyze, /recommend, /chat 을
+정해진 동시성으로 호출해서 처리량, p50/p95/p99 지연, 단계별 시간을 출력한다.
+(단계별 시간은 /metrics 의 ops_stage_seconds 를 엔드포인트 전후로 읽어서 차이를 낸다)
+
+    python -m chatbot.mcp.bench.run --endpoints analyze,recommend,chat \
+        --concurrency 16 --requests 200 --openai-latency 1.5 --spotify-latency 0.08
+
+NLP 모델(zero-shot, 감정, KeyBERT)은 진짜로 로드하므로 HF 캐시가 필요하다.
+응답 캐시(분석/추천/Spotify)는 --cache 를 주지 않으면 끈 상태로 측정한다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .fake_mongo import FakeMongoDB, seed_users
+from .fakes import FakeOpenAIServer, FakeSpotifyServer, FaultConfig
+
+# 벤치용 입력 문장 (상황/감정이 골고루 섞이도록)
+SAMPLE_TEXTS = [
+    "오늘 시험 망쳐서 너무 우울해",
+    "퇴근길 지하철인데 기분 전환할 노래 추천해줘",
+    "새벽에 잠이 안 와서 잔잔한 노래 듣고 싶어",
+    "헬스장에서 운동할 때 들을 신나는 노래",
+    "비 오는 날 카페에서 공부 중이야",
+    "여자친구랑 헤어졌어 너무 슬프다",
+    "주말에 드라이브 가는데 설레는 노래 틀어줘",
+    "과제 마감이라 집중해야 돼",
+    "친구들이랑 파티하는데 분위기 띄울 노래",
+    "아침에 일어나기 너무 힘들다",
+    "합격 소식 들었어 너무 행복해",
+    "혼자 산책하면서 생각 정리하는 중",
+]
+
+_STAGE_RE = re.compile(
+    r'^ops_stage_seconds_(sum|count)\{stage="([^"]+)"\}\s+([0-9.eE+-]+)$'
+)
+
+
+# =========================
+# 환경 준비
+# =========================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def configure_env(
+    openai_url: str, spotify_url: str, tmpdir: str, use_cache: bool
+) -> None:
+    """앱 모듈을 import 하기 전에 호출해야 한다 (설정은 import 시점에 읽음)."""
+    os.environ["OPENAI_BASE_URL"] = f"{openai_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["SPOTIFY_CLIENT_ID"] = "bench"
+    os.environ["SPOTIFY_CLIENT_SECRET"] = "bench"
+    os.environ["SPOTIFY_API_BASE"] = f"{spotify_url}/v1/"
+    os.environ["SPOTIFY_TOKEN_URL"] = f"{spotify_url}/api/token"
+    os.environ["CHAT_DB_PATH"] = os.path.join(tmpdir, "chat.db")
+    os.environ["SPOTIFY_CACHE_DB_PATH"] = os.path.join(tmpdir, "spotify_cache.db")
+    os.environ["MODEL_LOAD_MODE"] = "eager"
+    os.environ["DB_URL"] = "mongodb://bench.invalid/ops_music"
+    if not use_cache:
+        os.environ["SPOTIFY_CACHE_ENABLED"] = "0"
+        os.environ["REC_CACHE_ENABLED"] = "0"
+        os.environ["ANALYSIS_CACHE_SIZE"] = "0"
+        os.environ["PROFILE_CACHE_SIZE"] = "0"
+        # 로그가 쌓여도 카탈로그 경로로 빠지지 않게 LLM 경로만 측정
+        os.environ.setdefault("RECOMMEND_MODE", "llm")
+
+
+def start_app(port: int) -> Tuple[Any, threading.Thread]:
+    import uvicorn
+
+    from chatbot.mcp.server.server import app
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    return server, thread
+
+
+async def wait_ready(client: Any, timeout: float) -> Dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    last: Any = None
+    while time.monotonic() < deadline:
+        try:
+            resp = await client.get("/ready")
+            last = resp.json()
+            if resp.status_code == 200:
+                return last
+        except Exception as e:  # 아직 포트가 안 열림
+            last = repr(e)
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"앱이 {timeout:.0f}s 안에 준비되지 않음: {last}")
+
+
+# =========================
+# 요청 생성
+# =========================
+def _user_id(rng: random.Random, user_ids: List[str]) -> Optional[str]:
+    # 일부는 비로그인 요청
+    return rng.choice(user_ids) if user_ids and rng.random() < 0.9 else None
+
+
+async def _prepare_analysis_jsons(client: Any, n: int) -> List[str]:
+    """/recommend 입력으로 쓸 analysis_json 을 미리 만든다."""
+    out = []
+    for text in SAMPLE_TEXTS[:n]:
+        resp = await client.post("/analyze", json={"text": text})
+        resp.raise_for_status()
+        out.append(resp.json()["analysis_json"])
+    return out
+
+
+def build_payload(
+    endpoint: str,
+    i: int,
+    rng: random.Random,
+    user_ids: List[str],
+    analysis_jsons: List[str],
+) -> Dict[str, Any]:
+    text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+    if endpoint == "analyze":
+        # 같은 문장만 반복되면 실제보다 캐시가 잘 맞으므로 꼬리에 번호를 붙임
+        return {"text": f"{text} {i}"}
+    if endpoint == "recommend":
+        return {
+            "analysis_json": analysis_jsons[i % len(analysis_jsons)],
+            "user_id": _user_id(rng, user_ids),
+        }
+    if endpoint == "chat":
+        return {
+            "messages": [{"role": "user", "content": f"{text} {i}"}],
+            "user_id": _user_id(rng, user_ids),
+        }
+    raise ValueError(f"알 수 없는 endpoint: {endpoint}")
+
+
+# =========================
+# 측정
+# =========================
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def parse_stage_metrics(text: str) -> Dict[str, List[float]]:
+    """/metrics 본문 → stage → [sum, count]."""
+    out: Dict[str, List[float]] = {}
+    for line in text.splitlines():
+        m = _STAGE_RE.match(line)
+        if not m:
+            continue
+        kind, name, value = m.groups()
+        entry = out.setdefault(name, [0.0, 0.0])
+        entry[0 if kind == "sum" else 1] = float(value)
+    return out
+
+
+def diff_stages(
+    before: Dict[str, List[float]], after: Dict[str, List[float]], requests: int
+) -> Dict[str, Dict[str, float]]:
+    out = {}
+    for name, (s, c) in after.items():
+        s0, c0 = before.get(name, [0.0, 0.0])
+        count = c - c0
+        if count <= 0:
+            continue
+        total = s - s0
+        out[name] = {
+            "count": int(count),
+            "avg_ms": total / count * 1000,
+            "per_request_ms": total / max(requests, 1) * 1000,
+        }
+    return out
+
+
+async def _scrape_stages(client: Any) -> Dict[str, List[float]]:
+    resp = await client.get("/metrics")
+    resp.raise_for_status()
+    return parse_stage_metrics(resp.text)
+
+
+async def run_endpoint(
+    client: Any,
+    endpoint: str,
+    total: int,
+    concurrency: int,
+    rng: random.Random,
+    user_ids: List[str],
+    analysis_jsons: List[str],
+    offset: int = 0,
+) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    songs: List[int] = []
+
+    async def one(i: int) -> None:
+        payload = build_payload(endpoint, offset + i, rng, user_ids, analysis_jsons)
+        async with sem:
+            started = time.perf_counter()
+            try:
+                resp = await client.post(f"/{endpoint}", json=payload)
+                key = str(resp.status_code)
+                if resp.status_code == 200 and endpoint != "analyze":
+                    songs.append(len(resp.json().get("songs") or []))
+            except Exception as e:
+                key = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[key] = statuses.get(key, 0) + 1
+
+    before = await _scrape_stages(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    after = await _scrape_stages(client)
+
+    ok = statuses.get("200", 0)
+    return {
+        "endpoint": endpoint,
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "ok": ok,
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+        "avg_songs": sum(songs) / len(songs) if songs else None,
+        "stages": diff_stages(before, after, total),
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(
+        f"\n=== /{result['endpoint']}  "
+        f"(requests={result['requests']}, concurrency={result['concurrency']}) ==="
+    )
+    print(
+        f"throughput {result['throughput_rps']:.2f} req/s  "
+        f"ok {result['ok']}/{result['requests']}  statuses {result['statuses']}"
+    )
+    print(
+        f"latency p50 {result['p50_ms']:.1f}ms  p95 {result['p95_ms']:.1f}ms  "
+        f"p99 {result['p99_ms']:.1f}ms  max {result['max_ms']:.1f}ms"
+    )
+    if result["avg_songs"] is not None:
+        print(f"songs/response {result['avg_songs']:.1f}")
+    stages = sorted(result["stages"].items(), key=lambda kv: -kv[1]["per_request_ms"])
+    if stages:
+        print(f"{'stage':<22}{'count':>8}{'avg ms':>10}{'ms/req':>10}")
+        for name, s in stages:
+            print(
+                f"{name:<22}{s['count']:>8}{s['avg_ms']:>10.1f}"
+                f"{s['per_request_ms']:>10.1f}"
+            )
+
+
+# =========================
+# main
+# =========================
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="외부 의존성 없는 부하 벤치마크")
+    p.add_argument("--endpoints", default="analyze,recommend,chat")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--requests", type=int, default=100, help="엔드포인트당 요청 수")
+    p.add_argument("--warmup", type=int, default=5, help="엔드포인트당 워밍업 요청 수")
+    p.add_argument("--users", type=int, default=200, help="가짜 Mongo 유저 수")
+    p.add_argument("--openai-latency", type=float, default=1.5)
+    p.add_argument("--openai-jitter", type=float, default=0.3)
+    p.add_argument("--openai-error-rate", type=float, default=0.0)
+    p.add_argument("--spotify-latency", type=float, default=0.08)
+    p.add_argument("--spotify-jitter", type=float, default=0.02)
+    p.add_argument("--spotify-error-rate", type=float, default=0.0)
+    p.add_argument("--spotify-error-status", type=int, default=500)
+    p.add_argument("--spotify-miss-rate", type=float, default=0.2)
+    p.add_argument("--mongo-latency", type=float, default=0.005)
+    p.add_argument("--cache", action="store_true", help="응답 캐시를 켠 채로 측정")
+    p.add_argument("--ready-timeout", type=float, default=600)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", dest="json_path", help="결과를 JSON 파일로 저장")
+    return p.parse_args(argv)
+
+
+async def _drive(args: argparse.Namespace, port: int, user_ids: List[str]) -> List:
+    import httpx
+
+    rng = random.Random(args.seed)
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=120.0, limits=limits
+    ) as client:
+        ready = await wait_ready(client, args.ready_timeout)
+        print(f"[bench] ready (warmup {ready.get('warmup')})")
+
+        analysis_jsons: List[str] = []
+        if "recommend" in endpoints:
+            analysis_jsons = await _prepare_analysis_jsons(client, len(SAMPLE_TEXTS))
+
+        results = []
+        for endpoint in endpoints:
+            if args.warmup:
+                await run_endpoint(
+                    client,
+                    endpoint,
+                    args.warmup,
+                    min(args.concurrency, args.warmup),
+                    rng,
+                    user_ids,
+                    analysis_jsons,
+                    offset=10**6,
+                )
+            result = await run_endpoint(
+                client,
+                endpoint,
+                args.requests,
+                args.concurrency,
+                rng,
+                user_ids,
+                analysis_jsons,
+            )
+            print_report(result)
+            results.append(result)
+
+        # 429 / 재시도 / 헤징 횟수 (--spotify-error-status 429 로 확인)
+        spotify = (await client.get("/stats/spotify")).json()
+        for name, stats in spotify["clients"].items():
+            print(f"[bench] {name} http events: {stats['events']}")
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+
+    openai_server = FakeOpenAIServer(
+        FaultConfig(args.openai_latency, args.openai_jitter, args.openai_error_rate)
+    ).start()
+    spotify_server = FakeSpotifyServer(
+        FaultConfig(
+            args.spotify_latency,
+            args.spotify_jitter,
+            args.spotify_error_rate,
+            args.spotify_error_status,
+        ),
+        miss_rate=args.spotify_miss_rate,
+    ).start()
+    mongo = FakeMongoDB(FaultConfig(args.mongo_latency))
+    user_ids = seed_users(mongo, args.users)
+
+    tmpdir = tempfile.mkdtemp(prefix="ops-bench-")
+    configure_env(openai_server.base_url, spotify_server.base_url, tmpdir, args.cache)
+
+    from chatbot.database import set_db
+
+    set_db(mongo)
+
+    port = _free_port()
+    server, thread = start_app(port)
+    try:
+        results = asyncio.run(_drive(args, port, user_ids))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+        openai_server.stop()
+        spotify_server.stop()
+
+    fakes = {
+        "openai": dict(openai_server.counters),
+        "spotify": dict(spotify_server.counters),
+        "mongo": dict(mongo.counters),
+    }
+    print(f"\n[bench] fake servers: {json.dumps(fakes, ensure_ascii=False)}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"args": vars(args), "results": results, "fakes": fakes},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"[bench] 결과 저장: {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# chatbot/mcp/bench/situation.py
+# -*- coding: utf-8 -*-
+"""
+classify_situation 마이크로 벤치마크: 기존 하드코딩 키워드 스캔 vs Aho-Corasick 규칙 엔진.
+
+    python -m chatbot.mcp.bench.situation --sizes 0,1000,5000 --repeat 2000
+
+- parity: 기존 4개 상황 키워드만으로 만든 규칙이 기존 구현과 같은 답을 내는지 확인
+- 키워드 수를 늘렸을 때(가짜 키워드 추가) 두 방식의 문장당 시간 비교
+  (기존 방식 = 상황마다 any(k in t for k in keywords) 를 순서대로)
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chatbot.mcp.server.situation import SituationRuleSet, situation_classifier
+
+from .run import SAMPLE_TEXTS
+
+# 규칙 엔진 도입 전 model.classify_situation 의 키워드 (우선순위 순)
+LEGACY_RULES: List[Tuple[str, List[str]]] = [
+    (
+        "healing",
+        ["힘들", "지쳤", "우울", "힘빠지", "버겁", "수고했", "힘 빠져", "지치"],
+    ),
+    (
+        "breakup",
+        [
+            "이별",
+            "헤어졌",
+            "차였",
+            "실연",
+            "전여친",
+            "전 남친",
+            "전남친",
+            "전여자친구",
+            "전남자친구",
+            "새벽",
+        ],
+    ),
+    (
+        "focus",
+        ["공부", "집중", "코딩", "과제", "숙제", "시험", "레포트", "프로젝트", "논문"],
+    ),
+    ("workout", ["운동", "러닝", "헬스", "뛰", "달리기", "조깅"]),
+]
+
+PARITY_TEXTS = SAMPLE_TEXTS + [
+    "오늘 하루 너무 지쳤는데 잔잔한 노래 듣고 싶어",
+    "전남친 생각나는 밤",
+    "코딩하면서 들을 노래",
+    "러닝할 때 듣기 좋은 곡",
+    "HELLO 그냥 아무 노래나",
+    "",
+]
+
+
+def legacy_classify(
+    text: str, rules: List[Tuple[str, List[str]]] = LEGACY_RULES
+) -> str:
+    t = (text or "").lower()
+    for name, keywords in rules:
+        if any(k in t for k in keywords):
+            return name
+    return "general"
+
+
+def _rules_config(rules: List[Tuple[str, List[str]]]) -> Dict[str, Any]:
+    n = len(rules)
+    return {
+        "default": "general",
+        "situations": [
+            {"name": name, "priority": n - i, "keywords": keywords}
+            for i, (name, keywords) in enumerate(rules)
+        ],
+    }
+
+
+def _fake_keywords(n: int, rng: random.Random) -> List[str]:
+    """문장에 거의 안 나오는 2~4글자 한글 키워드 (최악의 경우: 전부 훑어야 함)."""
+    out = set()
+    while len(out) < n:
+        length = rng.randint(2, 4)
+        out.add("".join(chr(rng.randint(0xAC00, 0xD7A3)) for _ in range(length)))
+    return sorted(out)
+
+
+def _expand(
+    rules: List[Tuple[str, List[str]]], extra: int, rng: random.Random
+) -> List[Tuple[str, List[str]]]:
+    fakes = _fake_keywords(extra, rng)
+    per = len(fakes) // len(rules) + 1
+    return [
+        (name, keywords + fakes[i * per : (i + 1) * per])
+        for i, (name, keywords) in enumerate(rules)
+    ]
+
+
+def _time_per_call(fn: Callable[[str], str], texts: List[str], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            fn(t)
+    return (time.perf_counter() - started) / (repeat * len(texts))
+
+
+def check_parity() -> Dict[str, Any]:
+    engine = SituationRuleSet(_rules_config(LEGACY_RULES))
+    mismatches = [
+        (t, legacy_classify(t), engine.classify(t))
+        for t in PARITY_TEXTS
+        if legacy_classify(t) != engine.classify(t)
+    ]
+    # 배포용 규칙 파일과의 차이 (새 상황 / 가중치로 바뀐 결과, 정보용)
+    changed = [
+        (t, legacy_classify(t), situation_classifier.classify(t))
+        for t in PARITY_TEXTS
+        if legacy_classify(t) != situation_classifier.classify(t)
+    ]
+    return {"ok": not mismatches, "mismatches": mismatches, "rules_file_diff": changed}
+
+
+def run_benchmark(sizes: List[int], repeat: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    texts = [t for t in PARITY_TEXTS if t]
+    rows = []
+    for extra in sizes:
+        rules = _expand(LEGACY_RULES, extra, rng) if extra else LEGACY_RULES
+        started = time.perf_counter()
+        engine = SituationRuleSet(_rules_config(rules))
+        compile_ms = (time.perf_counter() - started) * 1000
+        legacy = _time_per_call(lambda t: legacy_classify(t, rules), texts, repeat)
+        compiled = _time_per_call(engine.classify, texts, repeat)
+        rows.append(
+            {
+                "keywords": len(engine.patterns),
+                "legacy_us": legacy * 1e6,
+                "automaton_us": compiled * 1e6,
+                "speedup": legacy / compiled if compiled else 0.0,
+                "compile_ms": compile_ms,
+            }
+        )
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="상황 분류 마이크로 벤치마크")
+    p.add_argument("--sizes", default="0,100,1000,5000", help="추가할 가짜 키워드 수")
+    p.add_argument("--repeat", type=int, default=500)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+
+    parity = check_parity()
+    print(f"parity (기존 키워드): {'OK' if parity['ok'] else 'MISMATCH'}")
+    for t, old, new in parity["mismatches"]:
+        print(f"  ✗ {t!r}: legacy={old} engine={new}")
+    for t, old, new in parity["rules_file_diff"]:
+        print(f"  규칙 파일 기준 변경: {t!r}: {old} → {new}")
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    print(
+        f"\n{'keywords':>9}{'legacy µs':>12}{'automaton µs':>15}"
+        f"{'speedup':>9}{'compile ms':>12}"
+    )
+    for row in run_benchmark(sizes, args.repeat, args.seed):
+        print(
+            f"{row['keywords']:>9}{row['legacy_us']:>12.2f}{row['automaton_us']:>15.2f}"
+            f"{row['speedup']:>8.1f}x{row['compile_ms']:>12.1f}"
+        )
+    return 0 if parity["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+# chatbot/mcp/server/async_pipeline.py
+# -*- coding: utf-8 -*-
+"""
+FastAPI async 엔드포인트용 비동기 파이프라인.
+
+- OpenAI 추천: AsyncOpenAI
+- Spotify 검색: httpx 커넥션 풀 기반 AsyncSpotifyClient
+- 모델 추론(감정/키워드 분석): 전용 스레드 풀에서 실행
+
+네트워크 I/O 를 기다리는 동안 스레드를 붙잡지 않으므로, 워커 하나로도
+수백 개의 요청을 동시에 처리할 수 있다. 프롬프트 / 요청 인자 생성, 응답 파싱
+(RecommendStream), Spotify 매칭/캐시, 스트리밍 결과 처리(StreamedLinks),
+카탈로그 대체는 model.py 의 순수 로직을 그대로 쓰고 여기에는 I/O 만 둔다.
+"""
+import asyncio
+import contextvars
+import copy
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from openai import AsyncOpenAI
+
+from .lazy import LazyResource
+from .metrics import SPOTIFY_MATCHES, stage
+from .singleflight import AsyncSingleFlight
+from .model import (
+    ANALYZE_BATCH_SIZE,
+    OPENAI_API_KEY,
+    RECOMMEND_LLM_TIMEOUT,
+    RECOMMEND_MODE,
+    RECOMMEND_STREAMING,
+    SPOTIFY_CLIENT_ID,
+    SPOTIFY_CLIENT_SECRET,
+    SPOTIFY_MAX_WORKERS,
+    AnalysisResult,
+    RecommendStream,
+    StreamedLinks,
+    adaptive_track_count,
+    analysis_cache_key,
+    analyze_text_logic,
+    analyze_texts_logic,
+    build_recommend_messages,
+    catalog_fill_songs,
+    lookup_cached_track,
+    match_spotify_items,
+    recommend_completion_kwargs,
+    recommend_from_catalog,
+    recommendation_cache,
+    spotify_search_items,
+    spotify_search_key,
+    spotify_search_queries,
+    stream_deadline,
+    stream_timeout_error,
+    time_left,
+    tracks_from_completion,
+)
+from .spotify_client import AsyncSpotifyClient
+
+T = TypeVar("T")
+
+# 모델 추론 전용 스레드 수 (CPU 코어를 넘게 잡으면 오히려 느려짐)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# 요청 하나당 동시에 진행할 Spotify 검색 수
+SPOTIFY_MAX_CONCURRENCY = int(
+    os.getenv("SPOTIFY_MAX_CONCURRENCY", str(SPOTIFY_MAX_WORKERS))
+)
+
+_inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_WORKERS, thread_name_prefix="inference"
+)
+
+
+def _build_async_openai() -> AsyncOpenAI:
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
+    return AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+
+def _build_async_spotify() -> AsyncSpotifyClient:
+    return AsyncSpotifyClient(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+
+
+async_openai_client: LazyResource[AsyncOpenAI] = LazyResource(
+    "openai_async", _build_async_openai
+)
+async_spotify_client: LazyResource[AsyncSpotifyClient] = LazyResource(
+    "spotify_async", _build_async_spotify
+)
+
+
+async def run_inference(fn: Callable[..., T], *args: Any) -> T:
+    """모델 추론을 전용 스레드 풀에서 실행하고 결과를 기다린다."""
+    loop = asyncio.get_running_loop()
+    # 요청 컨텍스트(단계별 시간 기록 등)를 추론 스레드에서도 그대로 사용
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _inference_executor, functools.partial(ctx.run, fn, *args)
+    )
+
+
+# =========================
+# 1) 감정/키워드 분석
+# =========================
+# 같은 문장 분석은 이벤트 루프에서 합친다 (follower 가 추론 스레드를 붙잡지 않도록)
+analysis_flight_async: AsyncSingleFlight[AnalysisResult] = AsyncSingleFlight(
+    "analysis_async"
+)
+
+
+async def analyze_text_async(text: str) -> AnalysisResult:
+    with stage("analysis"):
+        stripped = (text or "").strip()
+        if not stripped:
+            return await run_inference(analyze_text_logic, text)
+        result = await analysis_flight_async.do(
+            analysis_cache_key(stripped), run_inference, analyze_text_logic, stripped
+        )
+        # 합쳐진 호출끼리 같은 객체를 받으므로 각자 복사본 사용
+        return copy.deepcopy(result)
+
+
+async def iter_analyze_texts_async(
+    texts: List[str], batch_size: Optional[int] = None
+) -> AsyncIterator[Tuple[int, AnalysisResult]]:
+    """
+    texts 를 batch_size 개씩 추론 스레드 풀에서 분석하고 (입력 위치, 결과) 를
+    입력 순서대로 내보낸다. 배치 하나가 끝날 때마다 바로 yield 하므로
+    큰 요청도 전체를 메모리에 모으지 않고 스트리밍할 수 있다.
+    """
+    batch_size = max(1, batch_size or ANALYZE_BATCH_SIZE)
+    for start in range(0, len(texts), batch_size):
+        with stage("analysis_batch"):
+            results = await run_inference(
+                analyze_texts_logic, texts[start : start + batch_size], batch_size
+            )
+        for offset, result in enumerate(results):
+            yield start + offset, result
+
+
+async def analyze_texts_async(
+    texts: List[str], batch_size: Optional[int] = None
+) -> List[AnalysisResult]:
+    with stage("analysis_batch"):
+        return await run_inference(analyze_texts_logic, texts, batch_size)
+
+
+# =========================
+# 2) OpenAI 기반 추천
+# =========================
+async def recommend_songs_via_openai_async(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    track_count: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    # 유사도 검색/임베딩은 CPU 작업이라 추론 스레드 풀에서
+    cached = await run_inference(
+        recommendation_cache.lookup, analysis_json, user_profile
+    )
+    if cached is not None:
+        return cached
+
+    messages = build_recommend_messages(analysis_json, user_profile, track_count)
+    started = time.perf_counter()
+    with stage("openai"):
+        resp = await async_openai_client.get().chat.completions.create(
+            **recommend_completion_kwargs(messages)
+        )
+    tracks = tracks_from_completion(resp, messages, started)
+    await run_inference(recommendation_cache.store, analysis_json, user_profile, tracks)
+    return tracks
+
+
+async def recommend_songs_async(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    track_count: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """recommend_songs_logic 의 async 버전 (RECOMMEND_MODE 에 따라 카탈로그/OpenAI)."""
+    if RECOMMEND_MODE == "catalog":
+        songs = await run_inference(
+            functools.partial(recommend_from_catalog, require_confident=True),
+            analysis_json,
+            user_profile,
+        )
+        if songs:
+            return songs
+    if RECOMMEND_MODE != "auto":
+        return await recommend_songs_via_openai_async(
+            analysis_json, user_profile, track_count
+        )
+
+    try:
+        return await asyncio.wait_for(
+            recommend_songs_via_openai_async(analysis_json, user_profile, track_count),
+            RECOMMEND_LLM_TIMEOUT,
+        )
+    except Exception as e:
+        print("[recommend] OpenAI 실패 → 카탈로그로 대체:", repr(e))
+        songs = await run_inference(recommend_from_catalog, analysis_json, user_profile)
+        if not songs:
+            raise
+        return songs
+
+
+async def stream_recommended_tracks_async(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    track_count: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """stream_recommended_tracks 의 async 버전 (닫히면 LLM 스트림도 끊는다)."""
+    cached = await run_inference(
+        recommendation_cache.lookup, analysis_json, user_profile
+    )
+    if cached is not None:
+        for track in cached:
+            yield track
+        return
+
+    messages = build_recommend_messages(analysis_json, user_profile, track_count)
+    state = RecommendStream(messages)
+    stream = await async_openai_client.get().chat.completions.create(
+        **recommend_completion_kwargs(messages, stream=True)
+    )
+    try:
+        async for chunk in stream:
+            for track in state.feed(chunk):
+                yield track
+        state.completed = True
+    except (GeneratorExit, asyncio.CancelledError):
+        # 충분히 받아서 호출 측이 닫았거나 pump 가 취소됨
+        state.stopped = True
+        raise
+    finally:
+        await stream.close()
+        if state.finish():
+            # 취소된 뒤라도 여기서의 await 는 진행된다 (stream.close 와 같음)
+            await run_inference(
+                recommendation_cache.store, analysis_json, user_profile, state.tracks
+            )
+
+
+# =========================
+# 3) Spotify 메타데이터 붙이기
+# =========================
+# 동시에 같은 곡을 검색하는 요청끼리 Spotify API 호출 한 번을 공유
+spotify_search_flight_async: AsyncSingleFlight[Optional[List[Dict[str, Any]]]] = (
+    AsyncSingleFlight("spotify_search_async")
+)
+
+
+async def _resolve_spotify_track_async(
+    song: Dict[str, Any],
+    stop_event: Optional[asyncio.Event] = None,
+) -> Optional[Dict[str, Any]]:
+    title = song.get("title", "").strip()
+    artist = song.get("artist", "").strip()
+
+    if not title:
+        return None
+
+    try:
+        # SQLite 캐시 조회는 짧지만 락 대기가 있을 수 있으므로 스레드에서
+        # (database is locked 등으로 실패해도 곡 하나의 실패로만 처리)
+        hit, cached = await asyncio.to_thread(lookup_cached_track, song)
+        if hit:
+            return cached
+
+        items = await spotify_search_flight_async.do(
+            spotify_search_key(title, artist),
+            _search_spotify_items_async,
+            title,
+            artist,
+            stop_event=stop_event,
+        )
+        if items is None:
+            return None
+        return await asyncio.to_thread(match_spotify_items, song, items)
+
+    except Exception as e:
+        SPOTIFY_MATCHES.labels("error").inc()
+        print("Spotify 검색 에러:", e)
+        return None
+
+
+async def _search_spotify_items_async(
+    title: str,
+    artist: str,
+    stop_event: Optional[asyncio.Event] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    sp = async_spotify_client.get()
+    items: List[Dict[str, Any]] = []
+    for i, query in enumerate(spotify_search_queries(title, artist)):
+        if i > 0 and stop_event is not None and stop_event.is_set():
+            return None
+        with stage("spotify_search"):
+            res = await sp.search(q=query, type="track", limit=1)
+        items = spotify_search_items(res)
+        if items:
+            break
+    return items
+
+
+async def iter_spotify_links_async(
+    songs: List[Dict[str, Any]],
+    min_valid: int = 6,
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    iter_spotify_links_logic 의 async 버전.
+    매칭된 곡을 찾는 즉시 (인덱스, 곡)을 내보내고, min_valid개를 찾으면
+    남은 검색은 취소한다.
+    """
+    if max_concurrency is None:
+        max_concurrency = SPOTIFY_MAX_CONCURRENCY
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+    stop_event = asyncio.Event()
+
+    async def _one(idx: int, song: Dict[str, Any]) -> Tuple[int, Optional[Dict]]:
+        async with sem:
+            if stop_event.is_set():
+                return idx, None
+            return idx, await _resolve_spotify_track_async(song, stop_event)
+
+    tasks = [asyncio.ensure_future(_one(i, s)) for i, s in enumerate(songs)]
+    try:
+        found = 0
+        for fut in asyncio.as_completed(tasks):
+            idx, enriched = await fut
+            if enriched is None:
+                continue
+            yield idx, enriched
+            found += 1
+            if found >= min_valid:
+                break
+    finally:
+        stop_event.set()
+        for t in tasks:
+            t.cancel()
+
+
+async def attach_spotify_links_async(
+    songs: List[Dict[str, Any]],
+    min_valid: int = 6,
+    max_concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """attach_spotify_links_logic 의 async 버전 (LLM 추천 순서 유지)."""
+    resolved = [
+        pair
+        async for pair in iter_spotify_links_async(
+            songs, min_valid=min_valid, max_concurrency=max_concurrency
+        )
+    ]
+    resolved.sort(key=lambda x: x[0])
+    return [enriched for _, enriched in resolved]
+
+
+async def iter_streaming_links_async(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    min_valid: int = 6,
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    iter_streaming_links_logic 의 async 버전.
+    LLM 스트림에서 곡이 완성될 때마다 Spotify 검색 task 를 띄우고,
+    min_valid개를 찾으면 LLM 스트림과 남은 검색 task 를 모두 취소한다.
+    LLM 오류는 받은 곡의 검색을 마저 내보낸 뒤 min_valid개가 안 되면 전달한다.
+    RECOMMEND_STREAM_DEADLINE 이 지나면 TimeoutError 로 중단.
+    """
+    if max_concurrency is None:
+        max_concurrency = SPOTIFY_MAX_CONCURRENCY
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+    stop_event = asyncio.Event()
+    # StreamedLinks 가 처리하는 메시지
+    results: "asyncio.Queue[Tuple[str, int, Any]]" = asyncio.Queue()
+    tasks: List["asyncio.Future[None]"] = []
+
+    async def _resolve(idx: int, song: Dict[str, Any]) -> None:
+        enriched = None
+        try:
+            async with sem:
+                if not stop_event.is_set():
+                    enriched = await _resolve_spotify_track_async(song, stop_event)
+        finally:
+            # 예외 / 취소여도 곡마다 "song" 메시지는 반드시 하나
+            results.put_nowait(("song", idx, enriched))
+
+    async def _pump() -> None:
+        count = 0
+        tracks = stream_recommended_tracks_async(
+            analysis_json, user_profile, adaptive_track_count(min_valid)
+        )
+        try:
+            async for track in tracks:
+                tasks.append(asyncio.ensure_future(_resolve(count, track)))
+                count += 1
+        except Exception as e:
+            results.put_nowait(("error", count, e))
+            return
+        finally:
+            await tracks.aclose()
+        results.put_nowait(("done", count, None))
+
+    pump = asyncio.ensure_future(_pump())
+    deadline = stream_deadline()
+    links = StreamedLinks(min_valid)
+    try:
+        while links.pending:
+            try:
+                kind, idx, payload = await asyncio.wait_for(
+                    results.get(), time_left(deadline)
+                )
+            except asyncio.TimeoutError:
+                raise stream_timeout_error() from None
+            song = links.on_message(kind, idx, payload)
+            if song is not None:
+                yield idx, song
+        links.raise_if_failed()
+    finally:
+        stop_event.set()
+        pump.cancel()
+        for t in tasks:
+            t.cancel()
+
+
+async def iter_recommend_links_async(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    min_valid: int = 6,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """iter_recommend_links_logic 의 async 버전."""
+    if not RECOMMEND_STREAMING:
+        songs = await recommend_songs_async(
+            analysis_json, user_profile, adaptive_track_count(min_valid)
+        )
+        async for pair in iter_spotify_links_async(songs, min_valid=min_valid):
+            yield pair
+        return
+
+    songs: List[Dict[str, Any]] = []
+    if RECOMMEND_MODE == "catalog":
+        songs = await run_inference(
+            functools.partial(recommend_from_catalog, require_confident=True),
+            analysis_json,
+            user_profile,
+        )
+
+    if songs:
+        async for pair in iter_spotify_links_async(songs, min_valid=min_valid):
+            yield pair
+        return
+
+    yielded: List[Tuple[int, Dict[str, Any]]] = []
+    try:
+        async for pair in iter_streaming_links_async(
+            analysis_json, user_profile, min_valid=min_valid
+        ):
+            yielded.append(pair)
+            yield pair
+        return
+    except Exception as e:
+        # 이미 곡을 내보냈으면 오류를 올리지 않고 받은 곡까지만 (auto 면 남은 자리 채움)
+        if RECOMMEND_MODE != "auto":
+            if not yielded:
+                raise
+            print("[recommend] 스트리밍 중단:", repr(e))
+            return
+        print("[recommend] OpenAI 실패 → 카탈로그로 대체:", repr(e))
+        songs = await run_inference(recommend_from_catalog, analysis_json, user_profile)
+        if not songs and not yielded:
+            raise
+    songs, offset, need = catalog_fill_songs(songs, yielded, min_valid)
+    if need <= 0:
+        return
+    async for idx, song in iter_spotify_links_async(songs, min_valid=need):
+        yield offset + idx, song
+
+
+async def recommend_with_links_async(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    min_valid: int = 6,
+) -> List[Dict[str, Any]]:
+    """recommend_with_links_logic 의 async 버전 (LLM 추천 순서 유지)."""
+    with stage("recommend"):
+        resolved = [
+            pair
+            async for pair in iter_recommend_links_async(
+                analysis_json, user_profile, min_valid=min_valid
+            )
+        ]
+    resolved.sort(key=lambda x: x[0])
+    return [enriched for _, enriched in resolved]
+
+
+async def aclose_clients() -> None:
+    """서버 종료 시 커넥션 풀 정리."""
+    if async_spotify_client.ready:
+        await async_spotify_client.get().aclose()
+    if async_openai_client.ready:
+        await async_openai_client.get().close()
+    _inference_executor.shutdown(wait=False)
@@ -0,0 +1,195 @@
+# chatbot/mcp/server/batching.py
+# -*- coding: utf-8 -*-
+"""
+요청 간 마이크로 배칭 스케줄러.
+
+동시에 들어온 여러 요청의 입력을 짧은 시간(window) 동안 모았다가
+한 번의 배치 호출로 처리하고, 각 호출자에게 자기 결과만 돌려준다.
+(예: 제로샷 감정 분류를 텍스트마다 따로 돌리지 않고 한 번에 패딩 배치로 실행)
+"""
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# 지연 시간 통계를 위해 최근 몇 개 요청까지 기억할지
+_LATENCY_WINDOW = 1000
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    batch_fn(List[T]) -> List[R] 앞에 두는 배칭 스케줄러.
+    - max_wait_ms: 첫 요청이 들어온 뒤 배치를 더 모으는 최대 시간
+    - max_batch_size: 한 배치의 최대 크기 (가득 차면 바로 실행)
+    요청이 드문드문 올 때(직전 요청과 간격이 window 보다 길 때)는 기다리지 않고
+    바로 실행한다. 동시에 몰릴 때만 window 동안 모은다 (저부하 지연 0).
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[T]], List[R]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+    ) -> None:
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.name = name
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # 직전 배치의 마지막 요청이 들어온 시각 (perf_counter)
+        self._last_arrival = float("-inf")
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._waited_batches = 0
+        self._items = 0
+        self._errors = 0
+        self._max_seen_batch = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.time()
+        self._latencies_ms: Deque[float] = collections.deque(maxlen=_LATENCY_WINDOW)
+        self._queue_waits_ms: Deque[float] = collections.deque(maxlen=_LATENCY_WINDOW)
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    # ---------- 공개 API ----------
+    def submit(self, item: T) -> "Future[R]":
+        """항목 하나를 큐에 넣고, 배치 처리 후 결과가 채워질 Future를 반환."""
+        self._ensure_worker()
+        fut: "Future[R]" = Future()
+        self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def __call__(self, item: T) -> R:
+        return self.submit(item).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            latencies = list(self._latencies_ms)
+            waits = list(self._queue_waits_ms)
+            uptime = max(time.time() - self._started_at, 1e-9)
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": self._batches,
+                "waited_batches": self._waited_batches,
+                "items": self._items,
+                "errors": self._errors,
+                "avg_batch_size": (
+                    self._items / self._batches if self._batches else 0.0
+                ),
+                "max_seen_batch_size": self._max_seen_batch,
+                "pending": self._queue.qsize(),
+                "throughput_items_per_sec": self._items / uptime,
+                "busy_items_per_sec": (
+                    self._items / self._busy_seconds if self._busy_seconds else 0.0
+                ),
+                "latency_ms_p50": _percentile(latencies, 50),
+                "latency_ms_p95": _percentile(latencies, 95),
+                "latency_ms_p99": _percentile(latencies, 99),
+                "queue_wait_ms_p50": _percentile(waits, 50),
+                "queue_wait_ms_p95": _percentile(waits, 95),
+            }
+
+    # ---------- 내부 ----------
+    def _after_fork(self) -> None:
+        # pre-fork 워커(serve.py): 부모의 배치 스레드는 자식에 없고, 큐/락은
+        # 부모 스레드가 잡고 있던 상태일 수 있으므로 새로 만든다
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-worker", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> List[tuple]:
+        # 첫 항목은 올 때까지 대기 + 이미 쌓여 있는 항목은 바로 합침
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        # 혼자 온 요청이고 직전 요청과도 간격이 window 보다 길면 바로 실행
+        window = self.max_wait_ms / 1000.0
+        first_enqueued = batch[0][2]
+        concurrent = len(batch) > 1 or first_enqueued - self._last_arrival < window
+        if concurrent and len(batch) < self.max_batch_size:
+            with self._stats_lock:
+                self._waited_batches += 1
+            # window 는 첫 항목이 들어온 시각 기준 (큐에서 이미 기다린 만큼 덜 기다림)
+            deadline = first_enqueued + window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        self._last_arrival = max(b[2] for b in batch)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [b[0] for b in batch]
+            started = time.perf_counter()
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"[{self.name}] 배치 결과 개수 불일치: "
+                        f"{len(results)} != {len(items)}"
+                    )
+                error: Optional[Exception] = None
+            except Exception as e:  # 배치 전체 실패 → 모든 호출자에게 전달
+                results = []
+                error = e
+            finished = time.perf_counter()
+
+            for i, (_, fut, _) in enumerate(batch):
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(results[i])
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                if error is not None:
+                    self._errors += 1
+                self._max_seen_batch = max(self._max_seen_batch, len(batch))
+                self._busy_seconds += finished - started
+                for _, _, enqueued in batch:
+                    self._latencies_ms.append((finished - enqueued) * 1000.0)
+                    self._queue_waits_ms.append((started - enqueued) * 1000.0)
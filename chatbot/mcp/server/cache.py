@@ -0,0 +1,118 @@
+# chatbot/mcp/server/cache.py
+# -*- coding: utf-8 -*-
+"""
+프로세스 내 LRU + TTL 캐시.
+
+분석 결과처럼 계산 비용이 큰 값을 메모리에 잠깐 들고 있기 위한 용도.
+- maxsize 를 넘으면 가장 오래 안 쓰인 항목부터 제거 (LRU)
+- ttl 초가 지나면 만료
+- 스레드 안전 (FastAPI 스레드풀에서 동시에 호출됨)
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0, name: str = "cache"):
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self.name = name
+
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, created_at, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """get 과 같지만 LRU 순서 / 적중 통계를 건드리지 않는다 (후보 훑어보기용)."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[2] <= now:
+                return default
+            return entry[0]
+
+    def touch(self, key: Hashable) -> bool:
+        """항목을 최근에 쓴 것으로 표시 (LRU 맨 뒤로). 없거나 만료면 False."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[2] <= now:
+                return False
+            self._data.move_to_end(key)
+            return True
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, now, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self) -> int:
+        with self._lock:
+            n = len(self._data)
+            self._data.clear()
+            return n
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def snapshot(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """최근에 쓰인 순서대로 항목 메타 정보(키, 나이, 남은 TTL)를 반환."""
+        now = time.time()
+        with self._lock:
+            items = list(self._data.items())[-limit:] if limit > 0 else []
+        return [
+            {
+                "key": str(key),
+                "age_sec": round(now - created_at, 3),
+                "expires_in_sec": round(expires_at - now, 3),
+            }
+            for key, (_, created_at, expires_at) in reversed(items)
+        ]
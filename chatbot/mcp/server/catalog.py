@@ -0,0 +1,292 @@
+# chatbot/mcp/server/catalog.py
+# -*- coding: utf-8 -*-
+"""
+채팅 로그 기반 로컬 트랙 카탈로그 (LLM 없이 추천하는 빠른 경로).
+
+chat_logs.meta_json["songs"] 에는 Spotify 매칭까지 끝난 곡들이 추천 이유,
+mood_tags 와 함께 남아 있다. 이것을 track_id 기준으로 모아서
+- 곡마다 (mood_tags + situation + 추천 이유) 문장 임베딩을 만들고
+- numpy 행렬(정규화된 벡터) 하나로 내적 검색한다 (flat index)
+수만 곡 규모까지는 행렬 곱 한 번이 ms 단위라 별도 ANN 라이브러리는 쓰지 않는다.
+
+추천 점수 = 코사인 유사도
+          + situation 일치 보너스
+          + 선호 아티스트 보너스
+          + 약간의 랜덤 jitter (같은 요청에 매번 같은 답이 나오지 않도록)
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .database import query_chat_logs
+
+# 카탈로그에 이 수보다 곡이 적으면 사용하지 않음 (LLM 경로로)
+CATALOG_MIN_TRACKS = int(os.getenv("CATALOG_MIN_TRACKS", "30"))
+# 이 유사도 이상인 후보가 충분해야 "자주 나오는 상황"으로 보고 카탈로그로 답함
+CATALOG_MIN_SCORE = float(os.getenv("CATALOG_MIN_SCORE", "0.35"))
+# 카탈로그를 다시 만드는 주기 (초). 0 이면 자동 재생성 안 함
+CATALOG_REFRESH_SEC = float(os.getenv("CATALOG_REFRESH_SEC", "3600"))
+CATALOG_SITUATION_WEIGHT = float(os.getenv("CATALOG_SITUATION_WEIGHT", "0.1"))
+CATALOG_ARTIST_WEIGHT = float(os.getenv("CATALOG_ARTIST_WEIGHT", "0.1"))
+CATALOG_JITTER = float(os.getenv("CATALOG_JITTER", "0.03"))
+
+# 곡 하나당 임베딩 문장에 넣을 추천 이유 / 태그 최대 개수
+_MAX_REASONS = 5
+_MAX_TAGS = 8
+_SCAN_PAGE = 500
+# 카탈로그 곡에 옮겨 담는 필드 (곡 자체의 정보)
+_TRACK_FIELDS = (
+    "title",
+    "artist",
+    "link",
+    "preview_url",
+    "track_id",
+    "uri",
+    "embed_url",
+)
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
+
+def _top_mood(mood: Any) -> Optional[str]:
+    if not isinstance(mood, dict) or not mood:
+        return None
+    return max(mood.items(), key=lambda kv: kv[1])[0]
+
+
+class _TrackAgg:
+    """track_id 하나에 대한 로그 집계."""
+
+    def __init__(self, song: Dict[str, Any]) -> None:
+        self.song = song
+        self.count = 0
+        self.reasons: List[str] = []
+        self.tags: Counter = Counter()
+        self.situations: Counter = Counter()
+
+    def add(self, song: Dict[str, Any], situation: Optional[str], mood: Any) -> None:
+        self.count += 1
+        reason = (song.get("reason") or "").strip()
+        if reason and reason not in self.reasons and len(self.reasons) < _MAX_REASONS:
+            self.reasons.append(reason)
+        for tag in song.get("mood_tags") or []:
+            self.tags[tag] += 1
+        top = _top_mood(mood)
+        if top:
+            self.tags[top] += 1
+        if situation:
+            self.situations[situation] += 1
+
+    def document(self) -> str:
+        tags = " ".join(t for t, _ in self.tags.most_common(_MAX_TAGS))
+        situations = " ".join(s for s, _ in self.situations.most_common(2))
+        return f"{tags} {situations} {' '.join(self.reasons)}".strip()
+
+    def generic_reason(self) -> str:
+        """
+        집계한 태그 / situation 으로 만든 추천 이유.
+        로그의 reason 은 그 로그를 남긴 사용자의 문장에 맞춰 쓴 것이라
+        다른 사용자 답변에 그대로 쓰면 남의 상황이 드러난다.
+        """
+        parts = [s for s, _ in self.situations.most_common(1)]
+        parts += [t for t, _ in self.tags.most_common(1)]
+        if not parts:
+            return "비슷한 상황에서 자주 추천된 곡"
+        return f"{'·'.join(parts)} 분위기에 자주 추천된 곡"
+
+    def to_track(self) -> Dict[str, Any]:
+        # 곡 자체의 정보만 (로그별 reason 등은 제외)
+        track = {k: self.song.get(k, "") for k in _TRACK_FIELDS}
+        track["reason"] = self.generic_reason()
+        track["mood_tags"] = [t for t, _ in self.tags.most_common(_MAX_TAGS)]
+        return track
+
+
+class TrackCatalog:
+    def __init__(self, embed_fn: EmbedFn) -> None:
+        self.embed_fn = embed_fn
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+        # 한 번에 교체되는 스냅샷 (검색 중에 재생성돼도 안전)
+        self._tracks: List[Dict[str, Any]] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._situations: List[Counter] = []
+        self._artists: List[str] = []
+        self._popularity = np.zeros(0, dtype=np.float32)
+
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.scanned_logs = 0
+        self.queries = 0
+        self.served = 0
+        self.declined = 0
+
+    # ---------- 생성 ----------
+    def _scan_logs(self) -> Dict[str, _TrackAgg]:
+        aggs: Dict[str, _TrackAgg] = {}
+        cursor: Optional[int] = None
+        scanned = 0
+        while True:
+            rows, cursor = query_chat_logs(
+                limit=_SCAN_PAGE, cursor=cursor, meta="songs,situation,mood"
+            )
+            for r in rows:
+                scanned += 1
+                meta = r["meta"] or {}
+                for song in meta.get("songs") or []:
+                    track_id = song.get("track_id")
+                    if not track_id or not song.get("link"):
+                        continue
+                    # 최신 로그부터 읽으므로 처음 본 곡 정보가 가장 최신
+                    agg = aggs.get(track_id)
+                    if agg is None:
+                        agg = aggs[track_id] = _TrackAgg(song)
+                    agg.add(song, meta.get("situation"), meta.get("mood"))
+            if cursor is None:
+                break
+        self.scanned_logs = scanned
+        return aggs
+
+    def rebuild(self) -> Dict[str, Any]:
+        """채팅 로그 전체를 읽어 카탈로그를 새로 만든다."""
+        with self._build_lock:
+            started = time.perf_counter()
+            aggs = list(self._scan_logs().values())
+            if aggs:
+                vecs = np.asarray(
+                    self.embed_fn([a.document() for a in aggs]), dtype=np.float32
+                )
+                norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+                matrix = vecs / np.clip(norms, 1e-12, None)
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+
+            counts = np.asarray([a.count for a in aggs], dtype=np.float32)
+            with self._lock:
+                self._tracks = [a.to_track() for a in aggs]
+                self._matrix = matrix
+                self._situations = [a.situations for a in aggs]
+                self._artists = [
+                    (a.song.get("artist") or "").strip().lower() for a in aggs
+                ]
+                # 자주 추천·매칭된 곡일수록 약간 우대 (0~1)
+                self._popularity = (
+                    np.log1p(counts) / math.log1p(float(counts.max()))
+                    if len(counts) and counts.max() > 0
+                    else counts
+                )
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+            print(
+                f"[catalog] {len(aggs)}곡 생성 "
+                f"(로그 {self.scanned_logs}건, {self.build_seconds:.2f}s)"
+            )
+            return self.stats()
+
+    def _refresh_in_background(self) -> None:
+        if self._build_lock.locked():
+            return
+        threading.Thread(
+            target=self.rebuild, name="catalog-rebuild", daemon=True
+        ).start()
+
+    def _ensure_built(self) -> None:
+        if self.built_at is None:
+            self.rebuild()
+        elif (
+            CATALOG_REFRESH_SEC > 0
+            and time.time() - self.built_at > CATALOG_REFRESH_SEC
+        ):
+            self._refresh_in_background()
+
+    # ---------- 추천 ----------
+    def recommend(
+        self,
+        analysis_json: str,
+        user_profile: Optional[Dict[str, Any]] = None,
+        k: int = 15,
+        require_confident: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        analysis_json / user_profile 로 카탈로그에서 곡을 골라 반환.
+        - 곡 수가 CATALOG_MIN_TRACKS 미만이면 []
+        - require_confident=True 이면 CATALOG_MIN_SCORE 이상인 후보가
+          k개 미만일 때 [] (자주 나오지 않는 상황은 LLM 에 맡김)
+        반환 곡에는 track_id/link 가 이미 있어서 Spotify 검색을 건너뛴다.
+        """
+        self._ensure_built()
+        self.queries += 1
+        with self._lock:
+            tracks = self._tracks
+            matrix = self._matrix
+            situations = self._situations
+            artists = self._artists
+            popularity = self._popularity
+        if len(tracks) < CATALOG_MIN_TRACKS:
+            self.declined += 1
+            return []
+
+        info = json.loads(analysis_json or "{}")
+        situation = info.get("situation")
+        query_text = " ".join(
+            [
+                info.get("mood_top1_ko", ""),
+                info.get("mood_top2_ko", ""),
+                situation or "",
+                " ".join(info.get("keywords") or []),
+                info.get("raw_text", ""),
+            ]
+        ).strip()
+        q = np.asarray(self.embed_fn([query_text]), dtype=np.float32)[0]
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        sims = matrix @ q
+
+        if require_confident and int((sims >= CATALOG_MIN_SCORE).sum()) < k:
+            self.declined += 1
+            return []
+
+        scores = sims + 0.05 * popularity
+        if situation and situation != "general":
+            bonus = np.asarray(
+                [c[situation] / max(sum(c.values()), 1) for c in situations],
+                dtype=np.float32,
+            )
+            scores = scores + CATALOG_SITUATION_WEIGHT * bonus
+        favorite = {
+            (a.get("name") or "").strip().lower()
+            for a in (user_profile or {}).get("favorite_artists") or []
+        }
+        favorite.discard("")
+        if favorite:
+            liked = np.asarray([a in favorite for a in artists], dtype=np.float32)
+            scores = scores + CATALOG_ARTIST_WEIGHT * liked
+        if CATALOG_JITTER > 0:
+            scores = scores + np.random.uniform(0, CATALOG_JITTER, size=len(scores))
+
+        k = min(k, len(tracks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        self.served += 1
+        return [dict(tracks[i]) for i in top]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracks": len(self._tracks),
+            "dim": int(self._matrix.shape[1]) if self._matrix.ndim == 2 else 0,
+            "scanned_logs": self.scanned_logs,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+            "building": self._build_lock.locked(),
+            "queries": self.queries,
+            "served": self.served,
+            "declined": self.declined,
+            "min_tracks": CATALOG_MIN_TRACKS,
+            "min_score": CATALOG_MIN_SCORE,
+        }
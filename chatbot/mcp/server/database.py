@@ -1,17 +1,65 @@
 # chatbot/mcp/server/database.py
 # -*- coding: utf-8 -*-
+import atexit
+import hashlib
 import json
+import os
+import queue
 import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
-DB_PATH = Path(__file__).resolve().parent / "chat.db"
+from .metrics import observe_stage, stage
 
+DB_PATH = Path(
+    os.getenv("CHAT_DB_PATH", str(Path(__file__).resolve().parent / "chat.db"))
+)
 
-def _get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# write-behind 로그 저장 설정
+CHAT_LOG_WRITE_BEHIND = os.getenv("CHAT_LOG_WRITE_BEHIND", "1") != "0"
+CHAT_LOG_QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", "10000"))
+CHAT_LOG_BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", "200"))
+CHAT_LOG_FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", "1.0"))
+
+_init_lock = threading.Lock()
+_initialized = False
+_local = threading.local()
+
+
+def _reset_after_fork() -> None:
+    # SQLite 연결은 fork 를 넘어 공유하면 안 됨 → 자식은 새로 연결
+    global _local, _init_lock
+    _local = threading.local()
+    _init_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, timeout=30)
     conn.row_factory = sqlite3.Row
+    # WAL: 쓰기 중에도 읽기가 막히지 않음, fsync 는 체크포인트 때만
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _get_conn() -> sqlite3.Connection:
+    """
+    스레드별로 재사용하는 연결 (요청마다 connect/close 하지 않음).
+    테이블은 import 시점이 아니라 처음 DB를 쓸 때 만든다.
+    """
+    if not _initialized:
+        init_db()
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
     return conn
 
 
@@ -25,7 +73,84 @@ def init_db() -> None:
     - meta_json: 분석 결과, 감정, 키워드 등 JSON 직렬화
     - created_at: ISO 문자열
     """
-    conn = _get_conn()
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        _init_db_locked()
+        _initialized = True
+
+
+# 스키마 마이그레이션: (버전, SQL 목록). PRAGMA user_version 으로 적용 여부 관리
+_MIGRATIONS: List[Tuple[int, List[str]]] = [
+    (
+        1,
+        [
+            # "유저 X의 최근 N개" → (user_id, id) 인덱스로 정렬 없이 조회
+            "CREATE INDEX IF NOT EXISTS idx_chat_logs_user_id "
+            "ON chat_logs (user_id, id)",
+            # "T1 ~ T2 사이 로그" 범위 조회
+            "CREATE INDEX IF NOT EXISTS idx_chat_logs_created_at "
+            "ON chat_logs (created_at)",
+        ],
+    ),
+    (
+        2,
+        [
+            # 행마다 복사되던 meta_json.user_profile → 내용 해시로 한 번만 저장
+            "ALTER TABLE chat_logs ADD COLUMN profile_hash TEXT",
+            """
+            CREATE TABLE IF NOT EXISTS user_profiles (
+                profile_hash TEXT PRIMARY KEY,
+                profile_json TEXT NOT NULL,
+                first_seen_at TEXT NOT NULL,
+                last_seen_at TEXT NOT NULL
+            )
+            """,
+            # 보관(retention.py) 된 파티션 목록. committed_bytes 까지만 유효한 내용
+            """
+            CREATE TABLE IF NOT EXISTS chat_log_archives (
+                day TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                committed_bytes INTEGER NOT NULL,
+                min_id INTEGER NOT NULL,
+                max_id INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """,
+        ],
+    ),
+]
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """
+    버전마다 BEGIN IMMEDIATE 트랜잭션 하나: 쓰기 락을 먼저 잡고 user_version 을
+    그 안에서 다시 읽는다. 여러 프로세스가 동시에 떠도 한 곳만 적용하고,
+    DDL 과 버전 갱신이 같이 커밋되므로 중간에 죽어도 반쯤 적용된 상태가 남지 않는다.
+    (sqlite3 모듈은 DDL 앞에서 트랜잭션을 자동으로 열지 않으므로 직접 BEGIN)
+    """
+    for target, statements in _MIGRATIONS:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+                conn.rollback()
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"[db] chat_logs 스키마 v{target} 적용")
+
+
+def _init_db_locked() -> None:
+    conn = _connect()
     try:
         conn.execute(
             """
@@ -40,71 +165,362 @@ def init_db() -> None:
             """
         )
         conn.commit()
+        _migrate(conn)
     finally:
         conn.close()
 
 
+# (user_id, user_text, reply, meta_json, created_at, profile_hash, profile_json)
+ChatLogRecord = Tuple[Optional[str], str, str, str, str, Optional[str], Optional[str]]
+
+_INSERT_SQL = """
+INSERT INTO chat_logs (user_id, user_text, reply, meta_json, created_at, profile_hash)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# last_seen_at = 이 프로필을 참조하는 가장 최근 로그의 created_at (retention 정리 기준)
+PROFILE_UPSERT_SQL = """
+INSERT INTO user_profiles (profile_hash, profile_json, first_seen_at, last_seen_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(profile_hash) DO UPDATE SET
+    last_seen_at = MAX(last_seen_at, excluded.last_seen_at)
+"""
+
+
+def profile_hash(profile: Dict[str, Any]) -> Tuple[str, str]:
+    """user_profile → (내용 해시, 정규화된 JSON). 내용이 같으면 같은 행을 공유."""
+    raw = json.dumps(profile, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest(), raw
+
+
+def _write_records(conn: sqlite3.Connection, batch: List[ChatLogRecord]) -> None:
+    """프로필 upsert + 로그 insert (호출한 쪽의 트랜잭션 안에서)."""
+    profiles: Dict[str, Tuple[str, str, str, str]] = {}
+    for r in batch:
+        if r[5] is None:
+            continue
+        prev = profiles.get(r[5])
+        seen = max(prev[3], r[4]) if prev else r[4]
+        first = min(prev[2], r[4]) if prev else r[4]
+        profiles[r[5]] = (r[5], r[6] or "{}", first, seen)
+    if profiles:
+        conn.executemany(PROFILE_UPSERT_SQL, list(profiles.values()))
+    conn.executemany(_INSERT_SQL, [r[:6] for r in batch])
+
+
+class ChatLogWriter:
+    """
+    채팅 로그 write-behind 저장기.
+    - save 는 메모리 큐에 넣기만 하고 바로 반환 (큐가 가득 차면 버리고 dropped 증가)
+    - 백그라운드 스레드가 긴 수명의 연결 하나로 배치 트랜잭션 저장
+    - flush 시점: flush_interval 초마다 / batch_size 개 모이면 / 종료 시
+    """
+
+    def __init__(
+        self,
+        queue_size: int = CHAT_LOG_QUEUE_SIZE,
+        batch_size: int = CHAT_LOG_BATCH_SIZE,
+        flush_interval: float = CHAT_LOG_FLUSH_INTERVAL,
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[ChatLogRecord]]" = queue.Queue(
+            maxsize=queue_size
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        self._counter_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.last_error: Optional[str] = None
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # pre-fork 부모는 요청을 받지 않으므로 자식은 빈 큐 / 새 스레드로 시작
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._stopping = False
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(
+                    target=self._run, name="chat-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def enqueue(self, record: ChatLogRecord) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+            print("[chat_log] 큐가 가득 차서 로그를 버립니다.")
+            return False
+        with self._counter_lock:
+            self.enqueued += 1
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """남은 로그를 모두 저장하고 스레드 종료."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._stopping = True
+        self._queue.put(None)  # 깨우기용
+        self._thread.join(timeout)
+
+    def _write(self, conn: sqlite3.Connection, batch: List[ChatLogRecord]) -> None:
+        started = time.perf_counter()
+        try:
+            with conn:  # 배치 하나 = 트랜잭션 하나
+                _write_records(conn, batch)
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            self.failed += len(batch)
+            self.last_error = f"{type(e).__name__}: {e}"
+            print("[chat_log] 배치 저장 실패:", e)
+        self.flushes += 1
+        elapsed = time.perf_counter() - started
+        self.last_flush_ms = elapsed * 1000.0
+        observe_stage("chat_log_write", elapsed)
+
+    def _run(self) -> None:
+        if not _initialized:
+            init_db()
+        conn = _connect()
+        batch: List[ChatLogRecord] = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                    if item is not None:
+                        batch.append(item)
+                except queue.Empty:
+                    pass
+
+                now = time.monotonic()
+                if batch and (len(batch) >= self.batch_size or now >= deadline):
+                    self._write(conn, batch)
+                    batch = []
+                if now >= deadline:
+                    deadline = now + self.flush_interval
+
+                if self._stopping:
+                    # 종료 시 큐에 남은 것까지 전부 저장
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is not None:
+                            batch.append(item)
+                    if batch:
+                        self._write(conn, batch)
+                    return
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": CHAT_LOG_WRITE_BEHIND,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "pending": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+        }
+
+
+chat_log_writer = ChatLogWriter()
+atexit.register(chat_log_writer.stop)
+
+
 def save_chat_log(
     user_text: str,
     reply: str,
     user_id: Optional[str] = None,
     meta: Optional[Dict[str, Any]] = None,
 ) -> None:
+    """
+    meta 의 user_profile 은 행마다 복사하지 않고 user_profiles 에 한 번만 저장,
+    로그에는 profile_hash 만 남긴다 (조회 시 다시 합쳐서 돌려줌).
+    """
+    meta = dict(meta or {})
+    p_hash: Optional[str] = None
+    p_json: Optional[str] = None
+    profile = meta.get("user_profile")
+    if isinstance(profile, dict) and profile:
+        p_hash, p_json = profile_hash(profile)
+        del meta["user_profile"]
+    record: ChatLogRecord = (
+        user_id,
+        user_text,
+        reply,
+        json.dumps(meta, ensure_ascii=False),
+        datetime.utcnow().isoformat(),
+        p_hash,
+        p_json,
+    )
+    if CHAT_LOG_WRITE_BEHIND:
+        chat_log_writer.enqueue(record)
+        return
+
     conn = _get_conn()
-    try:
-        conn.execute(
-            """
-            INSERT INTO chat_logs (user_id, user_text, reply, meta_json, created_at)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (
-                user_id,
-                user_text,
-                reply,
-                json.dumps(meta or {}, ensure_ascii=False),
-                datetime.utcnow().isoformat(),
-            ),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    with stage("chat_log_write"), conn:
+        _write_records(conn, [record])
 
 
 def get_recent_chat_logs(limit: int = 20) -> List[Dict[str, Any]]:
-    conn = _get_conn()
-    try:
-        cur = conn.execute(
-            """
-            SELECT id, user_id, user_text, reply, meta_json, created_at
-            FROM chat_logs
-            ORDER BY id DESC
-            LIMIT ?
-            """,
-            (limit,),
+    rows, _ = query_chat_logs(limit=limit)
+    return rows
+
+
+# meta 프로젝션에 쓸 수 있는 키 (SQL 에 그대로 들어가므로 제한)
+_META_KEY_CHARS = set("abcdefghijklmnopqrstuvwxyz0123456789_")
+META_FULL = "full"
+META_NONE = "none"
+
+
+def parse_meta_keys(meta: str) -> Optional[List[str]]:
+    """
+    meta 옵션 → 잘라서 가져올 키 목록 (None = 전체).
+    "none" 이거나 키가 없으면 빈 목록.
+    """
+    if meta == META_FULL:
+        return None
+    if meta == META_NONE:
+        return []
+    keys = [k.strip() for k in meta.split(",") if k.strip()]
+    for k in keys:
+        if not set(k.lower()) <= _META_KEY_CHARS:
+            raise ValueError(f"meta 키에 허용되지 않는 문자가 있습니다: {k!r}")
+    return keys
+
+
+# 분리 저장된 프로필이 있으면 그것, 예전 행이면 meta_json 안의 값
+_PROFILE_EXPR = (
+    "CASE WHEN p.profile_json IS NOT NULL THEN json(p.profile_json) "
+    "ELSE json_extract(meta_json, '$.user_profile') END"
+)
+
+
+def _meta_select(meta: str) -> Tuple[str, bool]:
+    """
+    meta 옵션 → (SELECT 절, user_profiles JOIN 필요 여부).
+    - "full": meta_json 전체 + 분리 저장된 프로필
+    - "none": meta 생략 (JSON 파싱도 안 함)
+    - "mood,songs": 해당 키만 SQLite json_extract 로 잘라서 가져옴
+    """
+    keys = parse_meta_keys(meta)
+    if keys is None:
+        return "meta_json, p.profile_json AS profile_json", True
+    if not keys:
+        return "NULL AS meta_json, NULL AS profile_json", False
+    pairs = ", ".join(
+        (
+            f"'{k}', {_PROFILE_EXPR}"
+            if k == "user_profile"
+            else f"'{k}', json_extract(meta_json, '$.{k}')"
         )
-        rows = cur.fetchall()
-        result: List[Dict[str, Any]] = []
-        for r in rows:
-            meta = {}
-            if r["meta_json"]:
-                try:
-                    meta = json.loads(r["meta_json"])
-                except json.JSONDecodeError:
-                    meta = {}
-            result.append(
-                {
-                    "id": r["id"],
-                    "user_id": r["user_id"],
-                    "user_text": r["user_text"],
-                    "reply": r["reply"],
-                    "meta": meta,
-                    "created_at": r["created_at"],
-                }
-            )
-        return result
-    finally:
-        conn.close()
+        for k in keys
+    )
+    return (
+        f"json_object({pairs}) AS meta_json, NULL AS profile_json",
+        "user_profile" in keys,
+    )
+
+
+def query_chat_logs(
+    limit: int = 20,
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[int] = None,
+    meta: str = META_FULL,
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    채팅 로그 조회 (최신순, keyset 페이지네이션).
+    - user_id: 특정 유저만
+    - since / until: created_at ISO 문자열 범위 [since, until)
+    - cursor: 이전 페이지의 next_cursor (이 id 보다 작은 로그부터)
+    - meta: "full" / "none" / 쉼표로 구분한 meta 키 목록
+    반환: (로그 목록, 다음 페이지 cursor 또는 None)
+    """
+    where: List[str] = []
+    params: List[Any] = []
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if since:
+        where.append("created_at >= ?")
+        params.append(since)
+    if until:
+        where.append("created_at < ?")
+        params.append(until)
+    if cursor is not None:
+        where.append("id < ?")
+        params.append(cursor)
+
+    select, join_profiles = _meta_select(meta)
+    sql = (
+        f"SELECT id, user_id, user_text, reply, {select}, created_at " "FROM chat_logs"
+    )
+    if join_profiles:
+        sql += " LEFT JOIN user_profiles p USING (profile_hash)"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    # 다음 페이지 존재 여부 확인용으로 1개 더 읽음
+    params.append(limit + 1)
 
+    conn = _get_conn()
+    rows = conn.execute(sql, params).fetchall()
+
+    next_cursor: Optional[int] = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["id"] if rows else None
 
-# 모듈 import 시 자동 초기화
-init_db()
+    result: List[Dict[str, Any]] = []
+    for r in rows:
+        meta_obj = {}
+        if r["meta_json"]:
+            try:
+                meta_obj = json.loads(r["meta_json"])
+            except json.JSONDecodeError:
+                meta_obj = {}
+        if r["profile_json"]:
+            meta_obj["user_profile"] = json.loads(r["profile_json"])
+        result.append(
+            {
+                "id": r["id"],
+                "user_id": r["user_id"],
+                "user_text": r["user_text"],
+                "reply": r["reply"],
+                "meta": meta_obj,
+                "created_at": r["created_at"],
+            }
+        )
+    return result, next_cursor
@@ -0,0 +1,95 @@
+# chatbot/mcp/server/json_stream.py
+# -*- coding: utf-8 -*-
+"""
+LLM 스트리밍 응답용 증분 JSON 파서.
+
+{"tracks": [ {...}, {...}, ... ]} 형태의 응답이 토큰 단위로 들어올 때,
+tracks 배열 안의 객체가 닫히는 즉시 dict 로 꺼낸다.
+응답 전체를 기다렸다가 json.loads 하지 않으므로 첫 곡부터 바로
+Spotify 검색을 시작할 수 있다.
+"""
+import json
+from typing import Any, Dict, List
+
+
+class TrackStreamParser:
+    def __init__(self, key: str = "tracks") -> None:
+        self._needle = f'"{key}"'
+        self._buf: List[str] = []
+        self._head = ""  # 배열 시작 전까지 읽은 텍스트
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.parsed = 0
+        self.errors = 0
+
+    @property
+    def done(self) -> bool:
+        """tracks 배열이 닫혔는지 여부."""
+        return self._done
+
+    def _find_array_start(self, chunk: str) -> str:
+        self._head += chunk
+        pos = self._head.find(self._needle)
+        if pos < 0:
+            return ""
+        bracket = self._head.find("[", pos + len(self._needle))
+        if bracket < 0:
+            return ""
+        self._in_array = True
+        rest = self._head[bracket + 1 :]
+        self._head = ""
+        return rest
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """chunk 를 이어 붙이고, 이번에 완성된 track 객체들을 반환."""
+        if self._done or not chunk:
+            return []
+        if not self._in_array:
+            chunk = self._find_array_start(chunk)
+            if not chunk:
+                return []
+
+        out: List[Dict[str, Any]] = []
+        for ch in chunk:
+            if self._depth == 0:
+                # 객체 사이 (쉼표/공백) 또는 배열 끝
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = [ch]
+                elif ch == "]":
+                    self._done = True
+                    break
+                continue
+
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._buf)
+                    self._buf = []
+                    try:
+                        obj = json.loads(raw)
+                    except json.JSONDecodeError:
+                        self.errors += 1
+                        print("[json_stream] track 파싱 실패:", raw)
+                        continue
+                    if isinstance(obj, dict):
+                        self.parsed += 1
+                        out.append(obj)
+        return out
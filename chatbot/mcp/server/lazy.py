@@ -0,0 +1,64 @@
+# chatbot/mcp/server/lazy.py
+# -*- coding: utf-8 -*-
+"""
+처음 사용할 때 만들어지는 리소스 (모델, 외부 API 클라이언트).
+
+import 시점에 모델을 올리지 않고, 백그라운드 스레드나 첫 요청에서
+get()을 호출할 때 한 번만 생성한다. 로딩 상태/시간은 /ready 에서 확인.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+STATE_NOT_LOADED = "not_loaded"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_ERROR = "error"
+
+
+class LazyResource(Generic[T]):
+    def __init__(self, name: str, factory: Callable[[], T]) -> None:
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+
+        self.state = STATE_NOT_LOADED
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == STATE_READY
+
+    def get(self) -> T:
+        """리소스를 반환 (아직 없으면 생성). 동시에 여러 스레드가 불러도 한 번만 생성."""
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._value is None:
+                self.state = STATE_LOADING
+                started = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self.state = STATE_ERROR
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.loaded_at = time.time()
+                self.state = STATE_READY
+                self.error = None
+                print(f"[lazy] {self.name} 로딩 완료 ({self.load_seconds:.2f}s)")
+        return self._value  # type: ignore[return-value]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+        }
@@ -0,0 +1,176 @@
+# chatbot/mcp/server/llm_usage.py
+# -*- coding: utf-8 -*-
+"""
+추천 LLM 호출의 토큰 사용량 / 지연 시간 기록.
+
+- 요청 단위: begin_request() 이후의 record_call() 기록이 한 리스트에 모인다
+  (ContextVar 라서 동시에 처리 중인 요청끼리 섞이지 않음) → chat log meta["llm"]
+- 전체 누적: llm_stats (GET /stats/llm) — 성공한 곡 1개당 토큰 수 확인용
+
+스트리밍을 중간에 끊으면 OpenAI 가 usage 를 보내주지 않는다. 그때는
+completion 토큰은 받은 청크 수로, prompt 토큰은 지금까지 관측한
+토큰/문자 비율로 추정하고 estimated=True 로 표시한다.
+"""
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from .metrics import LLM_TOKENS
+
+_request_calls: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar(
+    "llm_request_calls", default=None
+)
+
+
+class LLMUsageStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.completed_calls = 0
+        self.estimated_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.first_track_sum = 0.0
+        self.first_track_count = 0
+        self.requests = 0
+        self.songs = 0
+        # 정확한 usage 가 있었던 호출만으로 계산한 prompt 토큰/문자 비율
+        self._exact_prompt_tokens = 0
+        self._exact_prompt_chars = 0
+        self.by_prompt_mode: Dict[str, int] = {}
+
+    def prompt_tokens_per_char(self) -> Optional[float]:
+        if not self._exact_prompt_chars:
+            return None
+        return self._exact_prompt_tokens / self._exact_prompt_chars
+
+    def record_call(self, call: Dict[str, Any]) -> None:
+        with self._lock:
+            self.calls += 1
+            if call["completed"]:
+                self.completed_calls += 1
+            if call["estimated"]:
+                self.estimated_calls += 1
+            else:
+                self._exact_prompt_tokens += call["prompt_tokens"] or 0
+                self._exact_prompt_chars += call["prompt_chars"]
+            self.prompt_tokens += call["prompt_tokens"] or 0
+            self.completion_tokens += call["completion_tokens"] or 0
+            self.cached_tokens += call["cached_tokens"] or 0
+            self.latency_sum += call["latency"]
+            self.latency_max = max(self.latency_max, call["latency"])
+            if call.get("first_track_seconds") is not None:
+                self.first_track_sum += call["first_track_seconds"]
+                self.first_track_count += 1
+            mode = call["prompt_mode"]
+            self.by_prompt_mode[mode] = self.by_prompt_mode.get(mode, 0) + 1
+
+    def record_request(self, calls: List[Dict[str, Any]], songs: int) -> None:
+        """LLM 을 호출한 요청에 대해 최종적으로 돌려준 곡 수를 기록."""
+        if not calls:
+            return
+        with self._lock:
+            self.requests += 1
+            self.songs += songs
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.prompt_tokens + self.completion_tokens
+            return {
+                "calls": self.calls,
+                "completed_calls": self.completed_calls,
+                "estimated_calls": self.estimated_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens,
+                "total_tokens": total,
+                "avg_latency": self.latency_sum / self.calls if self.calls else 0.0,
+                "max_latency": self.latency_max,
+                "avg_first_track_seconds": (
+                    self.first_track_sum / self.first_track_count
+                    if self.first_track_count
+                    else None
+                ),
+                "requests": self.requests,
+                "songs": self.songs,
+                "tokens_per_song": total / self.songs if self.songs else None,
+                "by_prompt_mode": dict(self.by_prompt_mode),
+            }
+
+
+llm_stats = LLMUsageStats()
+
+
+def begin_request() -> List[Dict[str, Any]]:
+    """현재 요청(컨텍스트)의 LLM 호출 기록을 새로 시작하고 그 리스트를 반환."""
+    calls: List[Dict[str, Any]] = []
+    _request_calls.set(calls)
+    return calls
+
+
+def record_call(
+    prompt_mode: str,
+    prompt_chars: int,
+    latency: float,
+    usage: Any = None,
+    chunks: int = 0,
+    tracks: int = 0,
+    first_track_seconds: Optional[float] = None,
+    completed: bool = True,
+) -> Dict[str, Any]:
+    """LLM 호출 1건 기록 (usage 는 OpenAI 응답의 usage 객체)."""
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        prompt_tokens: Optional[int] = usage.prompt_tokens
+        completion_tokens = usage.completion_tokens
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+        estimated = False
+    else:
+        ratio = llm_stats.prompt_tokens_per_char()
+        prompt_tokens = round(prompt_chars * ratio) if ratio else None
+        completion_tokens = chunks
+        cached_tokens = 0
+        estimated = True
+
+    call = {
+        "prompt_mode": prompt_mode,
+        "prompt_chars": prompt_chars,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "estimated": estimated,
+        "latency": round(latency, 4),
+        "first_track_seconds": (
+            round(first_track_seconds, 4) if first_track_seconds is not None else None
+        ),
+        "tracks": tracks,
+        "completed": completed,
+    }
+    llm_stats.record_call(call)
+    LLM_TOKENS.labels("prompt").inc(prompt_tokens or 0)
+    LLM_TOKENS.labels("completion").inc(completion_tokens or 0)
+    LLM_TOKENS.labels("cached").inc(cached_tokens)
+    calls = _request_calls.get()
+    if calls is not None:
+        calls.append(call)
+    return call
+
+
+def summarize(calls: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """chat log meta 에 넣을 요청 단위 요약. LLM 을 안 불렀으면 None."""
+    if not calls:
+        return None
+    return {
+        "calls": len(calls),
+        "prompt_mode": calls[-1]["prompt_mode"],
+        "prompt_tokens": sum(c["prompt_tokens"] or 0 for c in calls),
+        "completion_tokens": sum(c["completion_tokens"] or 0 for c in calls),
+        "cached_tokens": sum(c["cached_tokens"] for c in calls),
+        "latency": round(sum(c["latency"] for c in calls), 4),
+        "first_track_seconds": calls[-1]["first_track_seconds"],
+        "estimated": any(c["estimated"] for c in calls),
+        "completed": all(c["completed"] for c in calls),
+    }
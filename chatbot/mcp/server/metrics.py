@@ -0,0 +1,164 @@
+# chatbot/mcp/server/metrics.py
+# -*- coding: utf-8 -*-
+"""
+단계별 지연 시간 계측 + Prometheus 지표 (/metrics).
+
+    with stage("keybert"):
+        ...
+
+- 모든 호출은 ops_stage_seconds{stage=...} 히스토그램에 기록
+- 예외로 끝나면 ops_stage_errors_total{stage=...} 증가
+- 요청 처리 중이면 (begin_timings() 이후) 요청별 합계에도 더해서
+  METRICS_SERVER_TIMING=1 일 때 Server-Timing 응답 헤더로 내보낸다
+
+요청별 합계는 ContextVar 에 들어 있으므로, 스레드 풀로 넘기는 작업은
+contextvars.copy_context().run 으로 감싸야 같은 요청에 합산된다.
+
+pre-fork 다중 워커(serve.py)에서는 PROMETHEUS_MULTIPROC_DIR 을 설정해서
+워커별 값을 파일로 남기고, /metrics 는 모든 워커의 값을 합쳐서 내보낸다.
+(이 환경 변수는 prometheus_client import 전에 설정돼 있어야 함)
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# 1이면 요청별 단계 시간을 Server-Timing 헤더로 붙인다
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") != "0"
+
+_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "ops_stage_seconds",
+    "단계별 처리 시간 (초)",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "ops_stage_errors_total",
+    "예외로 끝난 단계 수",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "ops_request_seconds",
+    "HTTP 요청 처리 시간 (초, 스트리밍은 헤더 전송까지)",
+    ["route", "method", "status"],
+    buckets=_BUCKETS,
+)
+SPOTIFY_MATCHES = Counter(
+    "ops_spotify_match_total",
+    "Spotify 매칭 결과 (found / not_found / low_ratio / no_link / error, "
+    "cache_* 는 캐시 적중)",
+    ["result"],
+)
+LLM_TOKENS = Counter(
+    "ops_llm_tokens_total",
+    "추천 LLM 토큰 수 (prompt / completion / cached)",
+    ["kind"],
+)
+SPOTIFY_HTTP_EVENTS = Counter(
+    "ops_spotify_http_total",
+    "Spotify API 호출 이벤트 (request / throttled=429 / retry / gave_up / hedge / hedge_win)",
+    ["client", "event"],
+)
+SPOTIFY_REFRESH_TRACKS = Counter(
+    "ops_spotify_refresh_tracks_total",
+    "메타데이터 일괄 갱신 결과 곡 수 (updated / unchanged / gone / failed)",
+    ["result"],
+)
+CHAT_LOG_RETENTION_ROWS = Counter(
+    "ops_chat_log_retention_total",
+    "채팅 로그 정리 건수 (archived=보관 파일로 이동 / compacted=프로필 분리 / "
+    "profiles_pruned=프로필 삭제)",
+    ["action"],
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "ops_singleflight_total",
+    "single-flight 호출 수 (leader=직접 실행, follower=진행 중인 작업에 합류, error)",
+    ["name", "role"],
+)
+
+# 요청별 단계 합계: stage → [누적 초, 횟수]
+_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "stage_timings", default=None
+)
+
+
+def begin_timings() -> Dict[str, List[float]]:
+    """현재 요청(컨텍스트)의 단계별 합계를 새로 시작하고 그 dict 를 반환."""
+    timings: Dict[str, List[float]] = {}
+    _timings.set(timings)
+    return timings
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        entry = timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def server_timing_header(
+    timings: Dict[str, List[float]], total: Optional[float] = None
+) -> str:
+    """
+    Server-Timing 헤더 값. 여러 번 실행된 단계(예: Spotify 검색)는
+    합계 시간 + 횟수(desc)로 표시 (병렬 실행이면 합계가 벽시계 시간보다 클 수 있음).
+    """
+    parts = []
+    for name, (seconds, count) in timings.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{int(count)}"'
+        parts.append(part)
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # 모든 워커 프로세스의 값을 합산
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,20 +1,51 @@
 # chatbot/mcp/server/model.py
 # -*- coding: utf-8 -*-
+import contextvars
+import copy
+import functools
+import hashlib
 import json
+import math
 import os
-from typing import Any, Dict, List, Tuple, Optional
+import queue
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 
 import difflib
+import numpy as np
 from dotenv import load_dotenv
 from openai import OpenAI
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from transformers import pipeline
-from keybert import KeyBERT
-import requests
-
-# 파일 맨 위 import 쪽에 추가
 
+from .batching import MicroBatcher
+from .cache import TTLCache
+from .catalog import TrackCatalog
+from .json_stream import TrackStreamParser
+from .lazy import (
+    STATE_ERROR,
+    STATE_LOADING,
+    STATE_NOT_LOADED,
+    STATE_READY,
+    LazyResource,
+)
+from .llm_usage import record_call as record_llm_call
+from .metrics import SPOTIFY_MATCHES, observe_stage, stage
+from .rec_cache import RecommendationCache
+from .singleflight import SingleFlight
+from .situation import situation_classifier
+from .spotify_client import SpotifyClient
+from .spotify_refresh import SpotifyMetadataRefresher
+from .spotify_cache import (
+    STATUS_FOUND,
+    STATUS_LOW_RATIO,
+    STATUS_NO_LINK,
+    STATUS_NOT_FOUND,
+    TRACK_GONE,
+    normalize_key,
+    spotify_cache,
+)
 
 # =========================
 # 환경 변수 / 외부 API 설정
@@ -22,32 +53,26 @@ import requests
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 
-if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
-    raise RuntimeError(
-        "SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET 환경 변수가 필요합니다."
-    )
 
-sp_auth = SpotifyClientCredentials(
-    client_id=SPOTIFY_CLIENT_ID,
-    client_secret=SPOTIFY_CLIENT_SECRET,
-)
-session = requests.Session()
-session.headers.update(
-    {
-        "Accept-Language": "ko-KR,ko;q=0.9",
-    }
-)
+def _build_openai_client() -> OpenAI:
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
+    return OpenAI(api_key=OPENAI_API_KEY)
+
 
-sp = spotipy.Spotify(
-    auth_manager=sp_auth,
-    requests_session=session,
+def _build_spotify_client() -> SpotifyClient:
+    # 토큰 버킷 / Retry-After 재시도 / 커넥션 풀 크기는 spotify_client.py 참고
+    # (SPOTIFY_API_BASE / SPOTIFY_TOKEN_URL 로 로컬 가짜 서버도 사용 가능)
+    return SpotifyClient(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+
+
+# 실제 클라이언트는 처음 get() 할 때 생성 (import 시점에는 만들지 않음)
+openai_client: LazyResource[OpenAI] = LazyResource("openai", _build_openai_client)
+spotify_client: LazyResource[SpotifyClient] = LazyResource(
+    "spotify", _build_spotify_client
 )
 
 # =========================
@@ -68,83 +93,224 @@ EMOTION_MAP_EN: Dict[str, str] = {
 # 모델 로딩 (제로샷 + 키워드)
 # =========================
 ZSC_MODEL = "MoritzLaurer/mDeBERTa-v3-base-mnli-xnli"
-zsc = pipeline(
-    "zero-shot-classification",
-    model=ZSC_MODEL,
-    device_map="auto",
-    truncation=True,
+KW_MODEL = "jhgan/ko-sroberta-multitask"
+
+
+# torch: transformers/sentence-transformers (기본값)
+# onnx: ONNX Runtime + int8 양자화 (onnx_backend.py build 로 아티팩트 생성 필요)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+
+
+def _build_zsc() -> Any:
+    if INFERENCE_BACKEND == "onnx":
+        from .onnx_backend import load_zsc_pipeline
+
+        return load_zsc_pipeline()
+
+    # transformers/torch import 자체도 수 초 걸리므로 로딩 시점으로 미룸
+    from transformers import pipeline
+
+    return pipeline(
+        "zero-shot-classification",
+        model=ZSC_MODEL,
+        device_map="auto",
+        truncation=True,
+    )
+
+
+def _build_kw() -> Any:
+    if INFERENCE_BACKEND == "onnx":
+        from .onnx_backend import load_keybert
+
+        return load_keybert()
+
+    from keybert import KeyBERT
+
+    return KeyBERT(KW_MODEL)
+
+
+zsc_model: LazyResource[Any] = LazyResource("zsc", _build_zsc)
+kw_model: LazyResource[Any] = LazyResource("keybert", _build_kw)
+
+# =========================
+# 제로샷 분류 마이크로 배칭
+# =========================
+# 동시 요청을 모으는 최대 대기 시간(ms). 0이면 배칭 없이 바로 실행
+ZSC_BATCH_WINDOW_MS = float(os.getenv("ZSC_BATCH_WINDOW_MS", "10"))
+# 한 배치에 묶을 최대 텍스트 수
+ZSC_MAX_BATCH = int(os.getenv("ZSC_MAX_BATCH", "16"))
+ZSC_HYPOTHESIS_TEMPLATE = "이 문장의 감정은 {}이다."
+
+
+def _zsc_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """여러 텍스트를 한 번의 패딩 배치로 제로샷 분류한다."""
+    model = zsc_model.get()
+    with stage("zsc_batch"):
+        res = model(
+            texts,
+            candidate_labels=EMOTION_LABELS_KO,
+            multi_label=True,
+            hypothesis_template=ZSC_HYPOTHESIS_TEMPLATE,
+            # (텍스트 × 라벨) 쌍 전체를 한 번의 forward로 처리
+            batch_size=len(texts) * len(EMOTION_LABELS_KO),
+        )
+    if isinstance(res, dict):
+        res = [res]
+    return res
+
+
+zsc_batcher: MicroBatcher[str, Dict[str, Any]] = MicroBatcher(
+    _zsc_batch,
+    max_batch_size=ZSC_MAX_BATCH,
+    max_wait_ms=ZSC_BATCH_WINDOW_MS,
+    name="zsc",
 )
 
-KW_MODEL = "jhgan/ko-sroberta-multitask"
-kw = KeyBERT(KW_MODEL)
+
+def _classify_emotions(text: str) -> List[Tuple[str, float]]:
+    """감정 라벨별 점수를 높은 순으로 정렬해 반환."""
+    if ZSC_BATCH_WINDOW_MS > 0:
+        res = zsc_batcher(text)
+    else:
+        res = _zsc_batch([text])[0]
+
+    labels: List[str] = res["labels"]
+    scores: List[float] = res["scores"]
+    return sorted(zip(labels, scores), key=lambda x: x[1], reverse=True)
 
 
 def classify_situation(text: str) -> str:
     """
     사용자의 원문 텍스트를 보고 대략적인 상황을 분류한다.
-    healing / breakup / focus / workout / general 중 하나를 반환.
-    """
-    t = (text or "").lower()
-
-    # 1) 위로/힐링 모드
-    heal_keywords = [
-        "힘들",
-        "지쳤",
-        "우울",
-        "힘빠지",
-        "버겁",
-        "수고했",
-        "힘 빠져",
-        "지치",
-    ]
-    if any(k in t for k in heal_keywords):
-        return "healing"  # 위로/힐링
-
-    # 2) 이별/연애 모드
-    breakup_keywords = [
-        "이별",
-        "헤어졌",
-        "차였",
-        "실연",
-        "전여친",
-        "전 남친",
-        "전남친",
-        "전여자친구",
-        "전남자친구",
-        "새벽",
-    ]
-    if any(k in t for k in breakup_keywords):
-        return "breakup"
-
-    # 3) 공부/집중 모드
-    focus_keywords = [
-        "공부",
-        "집중",
-        "코딩",
-        "과제",
-        "숙제",
-        "시험",
-        "레포트",
-        "프로젝트",
-        "논문",
-    ]
-    if any(k in t for k in focus_keywords):
-        return "focus"
+    키워드 규칙은 situation_rules.json (situation.py 참고).
+    healing / breakup / focus / workout / sleep / commute / party / general 등을 반환.
+    """
+    return situation_classifier.classify(text)
+
+
+# =========================
+# 임베딩 기반 감정 분류 (EMOTION_BACKEND=embedding)
+# =========================
+# nli: mDeBERTa 제로샷 분류 (기본값)
+# embedding: KeyBERT가 어차피 계산하는 sroberta 문장 임베딩과
+#            감정별 프로토타입 임베딩의 코사인 유사도로 점수 계산
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "nli").lower()
+# 코사인 유사도 → 점수 변환 softmax 온도 (작을수록 top1에 점수가 몰림)
+EMOTION_EMBED_TEMPERATURE = float(os.getenv("EMOTION_EMBED_TEMPERATURE", "0.05"))
+
+EMOTION_PROTOTYPES_KO: Dict[str, List[str]] = {
+    "기쁨": [
+        "이 문장의 감정은 기쁨이다.",
+        "오늘 너무 행복하고 기분이 좋아",
+        "좋은 일이 생겨서 신나고 즐거워",
+    ],
+    "슬픔": [
+        "이 문장의 감정은 슬픔이다.",
+        "너무 슬프고 눈물이 나",
+        "마음이 아프고 우울해",
+    ],
+    "차분": [
+        "이 문장의 감정은 차분이다.",
+        "조용하고 편안하게 쉬고 싶어",
+        "마음이 잔잔하고 평온해",
+    ],
+    "에너지": [
+        "이 문장의 감정은 에너지이다.",
+        "힘이 넘치고 신나게 달리고 싶어",
+        "텐션 올려서 운동하고 싶어",
+    ],
+    "분노": [
+        "이 문장의 감정은 분노이다.",
+        "너무 화나고 짜증나",
+        "열받아서 참을 수가 없어",
+    ],
+    "설렘": [
+        "이 문장의 감정은 설렘이다.",
+        "좋아하는 사람 생각에 두근거려",
+        "데이트 앞두고 설레는 기분이야",
+    ],
+    "집중": [
+        "이 문장의 감정은 집중이다.",
+        "공부에 집중하고 싶어",
+        "일에 몰입해서 작업해야 해",
+    ],
+}
+
+
+def _embed_texts(texts: List[str]) -> np.ndarray:
+    """KeyBERT 백엔드(sroberta)로 문장 임베딩 계산."""
+    return np.asarray(kw_model.get().model.embed(texts))
+
+
+def _l2_normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.clip(norms, 1e-12, None)
+
+
+def _build_emotion_prototypes() -> np.ndarray:
+    """감정 라벨별 프로토타입 문장 임베딩 평균 (라벨 순서 = EMOTION_LABELS_KO)."""
+    rows = []
+    for label in EMOTION_LABELS_KO:
+        emb = _l2_normalize(_embed_texts(EMOTION_PROTOTYPES_KO[label]))
+        rows.append(emb.mean(axis=0))
+    return _l2_normalize(np.vstack(rows))
+
 
-    # 4) 운동/에너지 모드
-    workout_keywords = ["운동", "러닝", "헬스", "뛰", "달리기", "조깅"]
-    if any(k in t for k in workout_keywords):
-        return "workout"
+emotion_prototypes: LazyResource[np.ndarray] = LazyResource(
+    "emotion_prototypes", _build_emotion_prototypes
+)
+
+
+def _rank_emotions_by_embedding(
+    doc_embeddings: np.ndarray,
+) -> List[List[Tuple[str, float]]]:
+    """문장 임베딩들 → 문장별 (감정라벨, 점수) 높은 순 리스트."""
+    sims = _l2_normalize(doc_embeddings) @ emotion_prototypes.get().T
+    logits = sims / EMOTION_EMBED_TEMPERATURE
+    logits = logits - logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    probs = probs / probs.sum(axis=1, keepdims=True)
 
-    return "general"
+    ranked_all: List[List[Tuple[str, float]]] = []
+    for row in probs:
+        pairs = [(label, float(p)) for label, p in zip(EMOTION_LABELS_KO, row)]
+        ranked_all.append(sorted(pairs, key=lambda x: x[1], reverse=True))
+    return ranked_all
 
 
 # =========================
 # 1) 감정/키워드 분석 로직
 # =========================
-def analyze_text_logic(
-    text: str,
-) -> Tuple[Dict[str, float], List[Tuple[str, str]], str, str, str]:
+AnalysisResult = Tuple[Dict[str, float], List[Tuple[str, str]], str, str, str]
+
+# 같은(또는 공백만 다른) 문장 재전송 시 분석 결과 재사용
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "2048"))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "600"))
+analysis_cache = TTLCache(
+    maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL, name="analysis"
+)
+# 캐시에 아직 없는 같은 문장이 동시에 들어오면 추론은 한 번만
+analysis_flight: SingleFlight[AnalysisResult] = SingleFlight("analysis")
+
+
+def analysis_cache_key(text: str) -> str:
+    """정규화한 텍스트 + 모델 / 규칙 버전의 해시 (바뀌면 자동으로 다른 키)."""
+    norm = " ".join(unicodedata.normalize("NFKC", text).split())
+    raw = "\x1f".join(
+        [
+            INFERENCE_BACKEND,
+            EMOTION_BACKEND,
+            ZSC_MODEL,
+            KW_MODEL,
+            # 상황 규칙이 바뀌면 (핫 리로드 포함) 캐시된 situation 도 다시 계산
+            situation_classifier.version(),
+            norm,
+        ]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def analyze_text_logic(text: str) -> AnalysisResult:
     """
     입력 텍스트를 받아:
     - mood_dict: {감정라벨: 점수}
@@ -153,25 +319,64 @@ def analyze_text_logic(
     - keywords_csv: 키워드 쉼표 연결 문자열
     - raw_text: 정제된 원문 텍스트
     를 반환한다.
+    (같은 텍스트는 analysis_cache 에서 바로 반환)
     """
     text = (text or "").strip()
     if not text:
         return {"unknown": 1.0}, [], "", "", ""
 
-    situation = classify_situation(text)
+    key = analysis_cache_key(text)
+    cached = analysis_cache.get(key)
+    if cached is None:
+        cached = analysis_flight.do(key, _analyze_and_cache, key, text)
 
-    # 제로샷 감정 분류
-    res = zsc(
-        text,
-        candidate_labels=EMOTION_LABELS_KO,
-        multi_label=True,
-        hypothesis_template="이 문장의 감정은 {}이다.",
-    )
+    # 호출 측에서 dict/list를 수정해도 캐시가 오염되지 않도록 복사본 반환
+    return copy.deepcopy(cached)
+
+
+def _analyze_and_cache(key: str, text: str) -> AnalysisResult:
+    result = _analyze_text_uncached(text)
+    analysis_cache.set(key, result)
+    return result
+
+
+def _analyze_text_uncached(text: str) -> AnalysisResult:
+    with stage("situation"):
+        situation = classify_situation(text)
+
+    doc_embeddings = None
+    if EMOTION_BACKEND == "embedding":
+        # sroberta 한 번으로 감정 점수 + KeyBERT 문서 임베딩을 같이 사용
+        with stage("emotion_embedding"):
+            doc_embeddings = _embed_texts([text])
+            ranked = _rank_emotions_by_embedding(doc_embeddings)[0]
+    else:
+        # 제로샷 감정 분류 (동시 요청은 배치로 묶어서 실행, 배치 대기 포함)
+        with stage("zsc"):
+            ranked = _classify_emotions(text)
+
+    # 키워드 추출
+    with stage("keybert"):
+        keywords: List[str] = [
+            k
+            for k, _ in kw_model.get().extract_keywords(
+                text,
+                keyphrase_ngram_range=(1, 2),
+                top_n=6,
+                doc_embeddings=doc_embeddings,
+            )
+        ]
+
+    return _build_analysis_result(text, situation, ranked, keywords)
 
-    labels: List[str] = res["labels"]
-    scores: List[float] = res["scores"]
-    ranked = sorted(zip(labels, scores), key=lambda x: x[1], reverse=True)
 
+def _build_analysis_result(
+    text: str,
+    situation: str,
+    ranked: List[Tuple[str, float]],
+    keywords: List[str],
+) -> AnalysisResult:
+    """감정 순위 + 키워드 → analyze_text_logic 반환 형태."""
     top1 = ranked[0]
     top2 = ranked[1] if len(ranked) > 1 else None
 
@@ -179,15 +384,6 @@ def analyze_text_logic(
     if top2 and top2[1] > 0.2:
         mood_dict[top2[0]] = float(top2[1])
 
-    # 키워드 추출
-    keywords: List[str] = [
-        k
-        for k, _ in kw.extract_keywords(
-            text,
-            keyphrase_ngram_range=(1, 2),
-            top_n=6,
-        )
-    ]
     kw_spans: List[Tuple[str, str]] = [(k, "KEYWORD") for k in keywords]
 
     # 상위 감정 + 키워드 JSON (추천 단계에서 사용)
@@ -216,6 +412,93 @@ def analyze_text_logic(
     return mood_dict, kw_spans, analysis_json, keywords_csv, text
 
 
+# =========================
+# 1-1) 배치 분석 (오프라인 재처리 / 백필용)
+# =========================
+# 한 번의 forward 로 묶을 텍스트 수 (zsc 는 텍스트 × 감정 라벨 쌍이 배치에 들어감)
+ANALYZE_BATCH_SIZE = int(os.getenv("ANALYZE_BATCH_SIZE", "32"))
+# /analyze/batch 한 요청에 받을 최대 텍스트 수
+ANALYZE_BATCH_MAX_TEXTS = int(os.getenv("ANALYZE_BATCH_MAX_TEXTS", "10000"))
+# 이보다 많으면 (stream 을 지정하지 않은 경우) NDJSON 으로 스트리밍
+ANALYZE_BATCH_STREAM_THRESHOLD = int(os.getenv("ANALYZE_BATCH_STREAM_THRESHOLD", "256"))
+
+
+def _analyze_chunk_uncached(texts: List[str]) -> List[AnalysisResult]:
+    """
+    texts 를 한 번에 분석한다 (모두 공백 제거된 비어 있지 않은 문장).
+    마이크로 배처를 거치지 않고 zsc / 임베딩 / KeyBERT 를 각각 배치 한 번으로 실행.
+    """
+    with stage("situation"):
+        situations = [classify_situation(t) for t in texts]
+
+    doc_embeddings = None
+    if EMOTION_BACKEND == "embedding":
+        with stage("emotion_embedding"):
+            doc_embeddings = _embed_texts(texts)
+            ranked_all = _rank_emotions_by_embedding(doc_embeddings)
+    else:
+        ranked_all = [
+            sorted(zip(r["labels"], r["scores"]), key=lambda x: x[1], reverse=True)
+            for r in _zsc_batch(texts)
+        ]
+
+    with stage("keybert"):
+        kw_res = kw_model.get().extract_keywords(
+            texts,
+            keyphrase_ngram_range=(1, 2),
+            top_n=6,
+            doc_embeddings=doc_embeddings,
+        )
+    # KeyBERT 는 문서가 하나면 리스트를 한 겹 벗겨서 반환
+    if len(texts) == 1:
+        kw_res = [kw_res]
+
+    return [
+        _build_analysis_result(text, situation, ranked, [k for k, _ in kws])
+        for text, situation, ranked, kws in zip(texts, situations, ranked_all, kw_res)
+    ]
+
+
+def analyze_texts_logic(
+    texts: List[str], batch_size: Optional[int] = None
+) -> List[AnalysisResult]:
+    """
+    여러 텍스트를 배치로 분석한다. 반환 순서 = 입력 순서.
+    - 빈 문장은 analyze_text_logic 과 같은 기본값
+    - analysis_cache 에 있는 문장과 배치 안의 중복 문장은 한 번만 계산
+    - 나머지를 batch_size 개씩 묶어서 추론 (기본 ANALYZE_BATCH_SIZE)
+    """
+    batch_size = max(1, batch_size or ANALYZE_BATCH_SIZE)
+    results: List[Optional[AnalysisResult]] = [None] * len(texts)
+    pending: Dict[str, List[int]] = {}  # 캐시 키 → 입력 위치들
+    pending_text: Dict[str, str] = {}
+
+    for i, raw in enumerate(texts):
+        text = (raw or "").strip()
+        if not text:
+            results[i] = ({"unknown": 1.0}, [], "", "", "")
+            continue
+        key = analysis_cache_key(text)
+        cached = analysis_cache.get(key)
+        if cached is not None:
+            results[i] = copy.deepcopy(cached)
+            continue
+        pending.setdefault(key, []).append(i)
+        pending_text.setdefault(key, text)
+
+    keys = list(pending)
+    for start in range(0, len(keys), batch_size):
+        chunk = keys[start : start + batch_size]
+        for key, res in zip(
+            chunk, _analyze_chunk_uncached([pending_text[k] for k in chunk])
+        ):
+            analysis_cache.set(key, res)
+            for i in pending[key]:
+                results[i] = copy.deepcopy(res)
+
+    return results  # type: ignore[return-value]
+
+
 # =========================
 # 2) OpenAI 기반 추천 로직
 # =========================
@@ -237,7 +520,7 @@ emotion 구조는 대략 다음과 같다:
   "keywords": [string, ...],
   "raw_text": string,
   "weights": [[string, float], ...]
-  "situation": string  // "healing", "breakup", "focus", "workout", "general" 중 하나
+  "situation": string  // "healing", "breakup", "focus", "workout", "sleep", "commute", "party", "general" 중 하나
 }
 
 추가 규칙 (situation 필드 사용):
@@ -247,6 +530,9 @@ emotion 구조는 대략 다음과 같다:
   - "breakup": 실제로 이별/실연을 겪는 상황
   - "focus": 공부, 코딩, 일에 집중하고 싶은 상황
   - "workout": 운동하면서 에너지를 내고 싶은 상황
+  - "sleep": 잠들기 전이거나 잠이 안 와서 편하게 쉬고 싶은 상황
+  - "commute": 출퇴근/등하교 등 이동 중에 듣는 상황
+  - "party": 파티, 모임, 회식처럼 여럿이 분위기를 띄우고 싶은 상황
   - "general": 위에 딱 맞지는 않는 일반적인 상황
 
 - situation == "healing" 인 경우:
@@ -266,6 +552,17 @@ emotion 구조는 대략 다음과 같다:
 - situation == "workout" 인 경우:
   - BPM이 빠르고, 에너지가 느껴지는 곡 위주로 추천해라.
 
+- situation == "sleep" 인 경우:
+  - 템포가 느리고 자극이 적은 잔잔한 곡 위주로 추천해라.
+  - 갑자기 소리가 커지거나 강한 비트가 나오는 곡은 피해라.
+
+- situation == "commute" 인 경우:
+  - 이어폰으로 듣기 좋은, 기분 전환이 되는 곡 위주로 추천해라.
+  - 출근길이면 하루를 시작할 힘을 주는 곡, 퇴근길이면 하루를 마무리하는 곡을 우선해라.
+
+- situation == "party" 인 경우:
+  - 여럿이 함께 따라 부르거나 분위기를 띄울 수 있는 신나는 곡 위주로 추천해라.
+
 - 곡을 선택할 때는 다음 우선순위를 지켜라:
   1순위: situation 과 잘 맞는지 여부
   2순위: emotion.mood_top1_en 과 mood_top2_en 에 맞는 분위기인지
@@ -341,20 +638,137 @@ user_profile의 구조는 대략 다음과 같다:
 """.strip()
 
 
-def recommend_songs_via_openai_logic(
+# 압축 프롬프트 모드용 시스템 프롬프트.
+# 요청마다 바뀌는 값(곡 수 포함)은 전부 user 메시지로 보내서
+# system 프롬프트가 항상 같은 접두어가 되도록 한다 (프로바이더 프롬프트 캐시 적중용).
+SYSTEM_PROMPT_MUSIC_COMPACT = """
+너는 한국어 음악 추천 큐레이터다. 입력은 사용자 원문과 압축 JSON 이다.
+필드: m=[[감정, 가중치], ...] (앞이 주 감정), s=상황, k=키워드, n=추천할 곡 수,
+p=취향 {nov: 0~10 새 곡 선호도, yr: 선호 시대(ALL=무관), g: 선호 장르, a: 선호 아티스트(순위순)}
+
+상황(s)별 규칙:
+- healing: 위로·응원·편안한 곡. 이별/상실을 직접 묘사해 마음을 무겁게 하는 곡은 피함
+- breakup: 이별 공감 발라드 가능, 극단적 표현(죽음·포기)은 피함
+- focus: 가사가 강하지 않고 루프감 있는 집중용 곡
+- workout: 빠른 BPM, 에너지 있는 곡
+- sleep: 느린 템포, 자극 적은 잔잔한 곡. 강한 비트 피함
+- commute: 이어폰으로 듣기 좋은 기분 전환 곡 (출근길은 힘 나는 곡, 퇴근길은 마무리하는 곡)
+- party: 함께 따라 부르고 분위기 띄우는 신나는 곡
+- general: 감정과 키워드 위주
+
+우선순위: 1) 상황 2) 감정 3) 취향(g, a, yr). 상황에 안 맞으면 선호 아티스트 곡이라도 제외.
+취향 규칙:
+- nov>=7 이면 새로운 아티스트/곡 비중을 늘리고, nov<=3 이면 대중적인 곡 위주
+- 선호 장르를 우선하되 2~3개 장르를 섞음
+- 아티스트당 최대 4곡, 선호 아티스트 곡은 전체의 2/3 이하, 같은 제목 중복 금지
+- yr 가 특정 시대면 그 시대 중심으로, 다른 시대 곡도 일부 섞음
+
+실제로 존재하는 곡만 정확히 n곡 추천한다.
+reason 은 한국어 1~2문장, 가수 이름 없이 원문의 감정/키워드와 연결해서 쓴다.
+출력은 JSON 객체 하나만:
+{"tracks":[{"title":"","artist":"","reason":"","mood_tags":[""],"match_score":0.0}]}
+""".strip()
+
+
+RECOMMEND_MODEL = "gpt-4o-mini"
+RECOMMEND_TEMPERATURE = 0.8
+# full: 기존 긴 프롬프트 (항상 20곡) / compact: 압축 프롬프트 + 곡 수 자동 조절
+RECOMMEND_PROMPT_MODE = os.getenv("RECOMMEND_PROMPT_MODE", "full").lower()
+RECOMMEND_MAX_TRACKS = int(os.getenv("RECOMMEND_MAX_TRACKS", "20"))
+# 스트리밍을 중간에 끊었을 때, 이만큼 받았으면 받은 곡까지 추천 캐시에 저장
+RECOMMEND_CACHE_MIN_TRACKS = int(os.getenv("RECOMMEND_CACHE_MIN_TRACKS", "6"))
+# 요청 곡 수 = min_valid / (최근 Spotify 매칭 성공률) * 여유 배수
+RECOMMEND_TRACK_MARGIN = float(os.getenv("RECOMMEND_TRACK_MARGIN", "1.3"))
+
+# 추천 경로 (기본 llm — 카탈로그 경로는 켤 때만)
+# - llm: 항상 OpenAI
+# - catalog: 카탈로그에 비슷한 곡이 충분하면(자주 나오는 상황) 카탈로그, 아니면 OpenAI
+# - auto: OpenAI 우선, 실패/타임아웃이면 카탈로그로 대체
+RECOMMEND_MODE = os.getenv("RECOMMEND_MODE", "llm").lower()
+RECOMMEND_LLM_TIMEOUT = float(os.getenv("RECOMMEND_LLM_TIMEOUT", "20"))
+# 스트리밍 추천(LLM + Spotify 검색) 전체 제한 시간 (초, 0 이하면 없음)
+# RECOMMEND_LLM_TIMEOUT 은 토큰 사이 대기에만 걸려서, 조금씩 계속 오면 끝나지 않음
+RECOMMEND_STREAM_DEADLINE = float(os.getenv("RECOMMEND_STREAM_DEADLINE", "30"))
+# 1이면 LLM 응답을 스트리밍으로 받아 곡이 완성될 때마다 바로 Spotify 검색
+RECOMMEND_STREAMING = os.getenv("RECOMMEND_STREAMING", "1") != "0"
+CATALOG_RECOMMEND_K = int(os.getenv("CATALOG_RECOMMEND_K", "15"))
+
+
+# LLM 이 추천한 곡의 최근 Spotify 매칭 성공률 (지수 이동 평균)
+_MATCH_RATE_ALPHA = 0.05
+_match_rate = 0.7
+
+
+def observe_spotify_match(result: str) -> None:
+    """매칭 결과(found / not_found / low_ratio / no_link, 캐시 적중은 cache_ 접두어)."""
+    global _match_rate
+    SPOTIFY_MATCHES.labels(result).inc()
+    matched = result in ("found", "cache_found")
+    _match_rate += _MATCH_RATE_ALPHA * ((1.0 if matched else 0.0) - _match_rate)
+
+
+def adaptive_track_count(min_valid: Optional[int]) -> int:
+    """min_valid개를 건지려면 LLM 에 몇 곡을 요청해야 하는지 (compact 모드)."""
+    if not min_valid:
+        return RECOMMEND_MAX_TRACKS
+    n = math.ceil(min_valid / max(_match_rate, 0.25) * RECOMMEND_TRACK_MARGIN)
+    return max(min_valid, min(n, RECOMMEND_MAX_TRACKS))
+
+
+def _compact_payload(
+    info: Dict[str, Any],
+    user_profile: Optional[Dict[str, Any]],
+    track_count: int,
+) -> Dict[str, Any]:
+    moods = [[info.get("mood_top1_ko"), round(info.get("mood_top1_score", 1.0), 2)]]
+    if info.get("mood_top2_ko") and info.get("mood_top2_score", 0.0) > 0.2:
+        moods.append([info["mood_top2_ko"], round(info["mood_top2_score"], 2)])
+    payload: Dict[str, Any] = {
+        "m": moods,
+        "s": info.get("situation", "general"),
+        "k": info.get("keywords") or [],
+        "n": track_count,
+    }
+    p = user_profile or {}
+    taste = {
+        "nov": p.get("novelty_score"),
+        "yr": p.get("preferred_year_category"),
+        "g": p.get("favorite_genres") or None,
+        "a": [a.get("name") for a in p.get("favorite_artists") or []] or None,
+    }
+    taste = {k: v for k, v in taste.items() if v is not None}
+    if taste:
+        payload["p"] = taste
+    return payload
+
+
+def build_recommend_messages(
     analysis_json: str,
     user_profile: Optional[Dict[str, Any]] = None,
-) -> List[Dict[str, Any]]:
+    track_count: Optional[int] = None,
+) -> List[Dict[str, str]]:
     """
-    감정 분석 결과(analysis_json)를 기반으로 곡 추천 리스트를 반환.
-    반환값: [{"title": ..., "artist": ..., "reason": ..., ...}, ...]
+    추천 요청용 chat messages (system + user) 를 만든다.
+    compact 모드에서는 track_count 곡을 요청한다 (None 이면 RECOMMEND_MAX_TRACKS).
     """
     info = json.loads(analysis_json or "{}")
+    if RECOMMEND_PROMPT_MODE == "compact":
+        payload = _compact_payload(
+            info, user_profile, track_count or RECOMMEND_MAX_TRACKS
+        )
+        user_prompt = "{}\n{}".format(
+            info.get("raw_text", ""),
+            json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
+        )
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT_MUSIC_COMPACT},
+            {"role": "user", "content": user_prompt},
+        ]
+
     mood1 = info.get("mood_top1_ko")
     mood2 = info.get("mood_top2_ko")
     s1 = info.get("mood_top1_score", 1.0)
     s2 = info.get("mood_top2_score", 0.0)
-    keywords = info.get("keywords", [])
     text = info.get("raw_text", "")
 
     # 감정 가중치 계산 (LLM 참고용)
@@ -382,18 +796,15 @@ def recommend_songs_via_openai_logic(
 {json.dumps(payload, ensure_ascii=False)}
 """.strip()
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT_MUSIC},
-            {"role": "user", "content": user_prompt_ko},
-        ],
-        temperature=0.8,
-    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_MUSIC},
+        {"role": "user", "content": user_prompt_ko},
+    ]
 
-    content = resp.choices[0].message.content.strip()
 
+def parse_recommended_tracks(content: str) -> List[Dict[str, Any]]:
+    """LLM 응답(JSON 문자열)에서 tracks 리스트를 꺼낸다. 실패하면 []."""
+    content = (content or "").strip()
     try:
         obj = json.loads(content)
         tracks = obj.get("tracks", [])
@@ -406,111 +817,861 @@ def recommend_songs_via_openai_logic(
         return []
 
 
+# 같은 situation/감정/취향 + 비슷한 키워드·원문이면 LLM 추천 결과 재사용
+recommendation_cache = RecommendationCache(embed_fn=_embed_texts)
+
+
+def prompt_chars(messages: List[Dict[str, str]]) -> int:
+    return sum(len(m["content"]) for m in messages)
+
+
+# sync / async 경로가 같이 쓰는 순수 로직 (요청 인자, 응답 파싱, 측정).
+# OpenAI / Spotify 호출과 캐시 저장 같은 I/O 만 각 경로에서 따로 한다.
+def recommend_completion_kwargs(
+    messages: List[Dict[str, str]], stream: bool = False
+) -> Dict[str, Any]:
+    """OpenAI 추천 요청 인자."""
+    kwargs: Dict[str, Any] = {
+        "model": RECOMMEND_MODEL,
+        "response_format": {"type": "json_object"},
+        "messages": messages,
+        "temperature": RECOMMEND_TEMPERATURE,
+        "timeout": RECOMMEND_LLM_TIMEOUT,
+    }
+    if stream:
+        kwargs["stream"] = True
+        # 마지막 청크에 토큰 사용량 포함 (끝까지 받은 경우에만 옴)
+        kwargs["stream_options"] = {"include_usage": True}
+    return kwargs
+
+
+def tracks_from_completion(
+    resp: Any, messages: List[Dict[str, str]], started: float
+) -> List[Dict[str, Any]]:
+    """비스트리밍 응답 → 곡 목록 (토큰 사용량 기록 포함)."""
+    tracks = parse_recommended_tracks(resp.choices[0].message.content)
+    record_llm_call(
+        RECOMMEND_PROMPT_MODE,
+        prompt_chars(messages),
+        time.perf_counter() - started,
+        usage=resp.usage,
+        tracks=len(tracks),
+    )
+    return tracks
+
+
+class RecommendStream:
+    """
+    스트리밍 응답 청크 → 완성된 곡 + 측정값 (sync / async 공통).
+    호출 측은 청크를 feed 하고, 끝나면 completed / stopped 를 표시한 뒤 finish.
+    """
+
+    def __init__(self, messages: List[Dict[str, str]]) -> None:
+        self.messages = messages
+        self.started = time.perf_counter()
+        self.parser = TrackStreamParser()
+        self.tracks: List[Dict[str, Any]] = []
+        self.usage: Any = None
+        self.chunks = 0
+        self.first_track: Optional[float] = None
+        # 끝까지 받음 / 호출 측이 충분히 받고 끊음 (둘 다 아니면 오류로 끊김)
+        self.completed = False
+        self.stopped = False
+
+    def feed(self, chunk: Any) -> List[Dict[str, Any]]:
+        """청크 하나를 넣고 이번에 완성된 곡들을 반환."""
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return []
+        self.chunks += 1
+        tracks = self.parser.feed(chunk.choices[0].delta.content or "")
+        if tracks and self.first_track is None:
+            self.first_track = time.perf_counter() - self.started
+        self.tracks.extend(tracks)
+        return tracks
+
+    def finish(self) -> bool:
+        """지연 시간 / 토큰 사용량 기록. 반환: 받은 곡을 추천 캐시에 넣을지."""
+        elapsed = time.perf_counter() - self.started
+        observe_stage("openai", elapsed)
+        if self.first_track is not None:
+            observe_stage("openai_first_track", self.first_track)
+        record_llm_call(
+            RECOMMEND_PROMPT_MODE,
+            prompt_chars(self.messages),
+            elapsed,
+            usage=self.usage,
+            chunks=self.chunks,
+            tracks=len(self.tracks),
+            first_track_seconds=self.first_track,
+            completed=self.completed,
+        )
+        return cacheable_tracks(self.tracks, self.completed, self.stopped)
+
+
+def recommend_songs_via_openai_logic(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    track_count: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    감정 분석 결과(analysis_json)를 기반으로 곡 추천 리스트를 반환.
+    반환값: [{"title": ..., "artist": ..., "reason": ..., ...}, ...]
+    비슷한 요청의 추천 결과가 캐시에 있으면 LLM 을 호출하지 않는다.
+    """
+    cached = recommendation_cache.lookup(analysis_json, user_profile)
+    if cached is not None:
+        return cached
+
+    messages = build_recommend_messages(analysis_json, user_profile, track_count)
+    started = time.perf_counter()
+    with stage("openai"):
+        resp = openai_client.get().chat.completions.create(
+            **recommend_completion_kwargs(messages)
+        )
+    tracks = tracks_from_completion(resp, messages, started)
+    recommendation_cache.store(analysis_json, user_profile, tracks)
+    return tracks
+
+
+def stream_recommended_tracks(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    stop_event: Optional[threading.Event] = None,
+    track_count: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    recommend_songs_via_openai_logic 의 스트리밍 버전.
+    LLM 응답을 토큰 단위로 받으면서 track 객체가 닫히는 즉시 yield 한다.
+    - stop_event 가 set 되거나 호출 측이 generator 를 닫으면 스트림을 끊어
+      남은 토큰 생성을 중단 (버릴 토큰 비용을 내지 않음)
+    - 끝까지 받았거나, 중간에 끊었어도 RECOMMEND_CACHE_MIN_TRACKS 곡 이상 받았으면
+      받은 곡까지 추천 캐시에 저장 (스트리밍은 보통 min_valid 개를 찾으면 끊기므로)
+    """
+    cached = recommendation_cache.lookup(analysis_json, user_profile)
+    if cached is not None:
+        yield from cached
+        return
+
+    messages = build_recommend_messages(analysis_json, user_profile, track_count)
+    state = RecommendStream(messages)
+    stream = openai_client.get().chat.completions.create(
+        **recommend_completion_kwargs(messages, stream=True)
+    )
+    try:
+        for chunk in stream:
+            if stop_event is not None and stop_event.is_set():
+                state.stopped = True
+                break
+            yield from state.feed(chunk)
+        else:
+            state.completed = True
+    except GeneratorExit:
+        # 호출 측이 충분히 받고 generator 를 닫음
+        state.stopped = True
+        raise
+    finally:
+        stream.close()
+        if state.finish():
+            recommendation_cache.store(analysis_json, user_profile, state.tracks)
+
+
+def cacheable_tracks(
+    tracks: List[Dict[str, Any]], completed: bool, stopped: bool
+) -> bool:
+    """스트리밍으로 받은 곡을 추천 캐시에 넣을지 (오류로 끊긴 경우는 제외)."""
+    if completed:
+        return True
+    return stopped and len(tracks) >= RECOMMEND_CACHE_MIN_TRACKS
+
+
+# 채팅 로그에 쌓인 Spotify 매칭 곡으로 만든 로컬 카탈로그
+track_catalog = TrackCatalog(embed_fn=_embed_texts)
+
+
+def recommend_from_catalog(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    require_confident: bool = False,
+) -> List[Dict[str, Any]]:
+    try:
+        return track_catalog.recommend(
+            analysis_json,
+            user_profile,
+            k=CATALOG_RECOMMEND_K,
+            require_confident=require_confident,
+        )
+    except Exception as e:
+        print("[catalog] 추천 실패:", e)
+        return []
+
+
+def recommend_songs_logic(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    track_count: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """RECOMMEND_MODE 에 따라 카탈로그 / OpenAI 중에서 추천."""
+    if RECOMMEND_MODE == "catalog":
+        songs = recommend_from_catalog(
+            analysis_json, user_profile, require_confident=True
+        )
+        if songs:
+            return songs
+    if RECOMMEND_MODE != "auto":
+        return recommend_songs_via_openai_logic(
+            analysis_json, user_profile, track_count
+        )
+
+    try:
+        return recommend_songs_via_openai_logic(
+            analysis_json, user_profile, track_count
+        )
+    except Exception as e:
+        print("[recommend] OpenAI 실패 → 카탈로그로 대체:", e)
+        songs = recommend_from_catalog(analysis_json, user_profile)
+        if not songs:
+            raise
+        return songs
+
+
 # =========================
 # 3) Spotify 메타데이터 붙이기
 # =========================
+# 병렬 검색 워커 수 (1 이하이면 기존처럼 순차 검색)
+SPOTIFY_MAX_WORKERS = int(os.getenv("SPOTIFY_MAX_WORKERS", "6"))
+
+
+def _normalize_title(s: str) -> str:
+    return "".join(ch for ch in s.lower() if not ch.isspace())
+
+
+def _build_enriched_song(
+    reason: str,
+    title: str,
+    artist: str,
+    track_id: str,
+    uri: str,
+    link: str,
+    preview_url: str,
+    mood_tags: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    embed_url = f"https://open.spotify.com/embed/track/{track_id}" if track_id else ""
+    return {
+        "title": title,
+        "artist": artist,
+        "reason": reason,
+        "link": link,
+        "preview_url": preview_url,
+        "track_id": track_id,
+        "uri": uri,
+        "embed_url": embed_url,
+        # 카탈로그(catalog.py)가 채팅 로그에서 곡 분위기를 모을 때 사용
+        "mood_tags": list(mood_tags or []),
+    }
+
+
+def lookup_cached_track(
+    song: Dict[str, Any],
+) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    spotify_cache 에서 곡을 찾는다.
+    반환: (캐시 적중 여부, 링크가 붙은 곡 또는 None(=이미 실패한 곡))
+    카탈로그 추천처럼 이미 track_id/link 가 있는 곡은 그대로 적중 처리.
+    """
+    title = song.get("title", "").strip()
+    artist = song.get("artist", "").strip()
+    if song.get("track_id") and song.get("link"):
+        # 로그에 남은 값보다 spotify_refresh 가 갱신한 메타데이터를 우선
+        fresh = spotify_cache.track_metadata(song["track_id"])
+        if fresh is None:
+            fresh = {}
+        elif fresh["status"] == TRACK_GONE:
+            return True, None
+        return True, _build_enriched_song(
+            song.get("reason", ""),
+            title=fresh.get("title") or title,
+            artist=fresh.get("artist") or artist,
+            track_id=song["track_id"],
+            uri=fresh.get("uri") or song.get("uri") or "",
+            link=fresh.get("link") or song["link"],
+            preview_url=(fresh["preview_url"] if fresh else song.get("preview_url"))
+            or "",
+            mood_tags=song.get("mood_tags"),
+        )
+
+    cached = spotify_cache.get(title, artist)
+    if cached is None:
+        return False, None
+    observe_spotify_match(f"cache_{cached['status']}")
+    if cached["status"] != STATUS_FOUND:
+        return True, None
+    return True, _build_enriched_song(
+        song.get("reason", ""),
+        title=cached["spotify_title"] or title,
+        artist=cached["spotify_artist"] or artist,
+        track_id=cached["track_id"] or "",
+        uri=cached["uri"] or "",
+        link=cached["link"] or "",
+        preview_url=cached["preview_url"] or "",
+        mood_tags=song.get("mood_tags"),
+    )
+
+
+# 여러 요청이 동시에 같은 곡을 검색하면 Spotify API 는 한 번만 호출
+spotify_search_flight: SingleFlight[Optional[List[Dict[str, Any]]]] = SingleFlight(
+    "spotify_search"
+)
+
+
+def spotify_search_key(title: str, artist: str) -> str:
+    """single-flight 키 (spotify_cache 와 같은 정규화)."""
+    return normalize_key(title, artist)
+
+
+def spotify_search_items(res: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """/v1/search 응답 → track items."""
+    return res.get("tracks", {}).get("items", [])
+
+
+def spotify_search_queries(title: str, artist: str) -> List[str]:
+    """1차 검색 쿼리 + (아티스트가 있으면) 제목만으로 하는 재검색 쿼리."""
+    if artist:
+        return [f"track:{title} artist:{artist}", title]
+    return [title]
+
+
+def match_spotify_items(
+    song: Dict[str, Any],
+    items: List[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Spotify 검색 결과(items)를 추천 곡과 비교해서 링크가 붙은 곡을 만든다.
+    - 검색 실패 / 제목 유사도 낮음 / 링크 없음이면 None
+    - 결과(실패 포함)는 spotify_cache에 저장
+    """
+    title = song.get("title", "").strip()
+    artist = song.get("artist", "").strip()
+    reason = song.get("reason", "")
+
+    # 매칭 결과는 아래 각 분기에서 성공률에 반영
+    if not items:
+        observe_spotify_match(STATUS_NOT_FOUND)
+        print(f"[Spotify] '{title}' ({artist}) 검색 실패, 스킵.")
+        spotify_cache.put(title, artist, STATUS_NOT_FOUND)
+        return None
+
+    track = items[0]
+
+    spotify_title = track.get("name", "")
+    spotify_artists = track.get("artists", [])
+    spotify_main_artist = spotify_artists[0]["name"] if spotify_artists else artist
+
+    title_ratio = difflib.SequenceMatcher(
+        None, _normalize_title(title), _normalize_title(spotify_title)
+    ).ratio()
+
+    if title_ratio < 0.7:
+        print(
+            f"[Spotify] 제목 유사도 낮음 → '{title}' vs '{spotify_title}' "
+            f"(ratio={title_ratio:.2f}) → 스킵"
+        )
+        spotify_cache.put(title, artist, STATUS_LOW_RATIO, title_ratio=title_ratio)
+        observe_spotify_match(STATUS_LOW_RATIO)
+        return None
+
+    print(
+        f"[Spotify] 매칭 성공 ✅ 입력='{title}' / Spotify='{spotify_title}' "
+        f"(ratio={title_ratio:.2f})"
+    )
+
+    link = track.get("external_urls", {}).get("spotify", "")
+    preview_url = track.get("preview_url") or ""
+    track_id = track.get("id") or ""
+    uri = track.get("uri") or ""
+
+    if not track_id and not link:
+        print(f"[Spotify] '{title}' ({artist})는 링크 정보가 없음, 스킵.")
+        spotify_cache.put(title, artist, STATUS_NO_LINK, title_ratio=title_ratio)
+        observe_spotify_match(STATUS_NO_LINK)
+        return None
+
+    spotify_cache.put(
+        title,
+        artist,
+        STATUS_FOUND,
+        track={
+            "spotify_title": spotify_title,
+            "spotify_artist": spotify_main_artist,
+            "track_id": track_id,
+            "uri": uri,
+            "link": link,
+            "preview_url": preview_url,
+        },
+        title_ratio=title_ratio,
+    )
+    observe_spotify_match(STATUS_FOUND)
+
+    return _build_enriched_song(
+        reason,
+        title=spotify_title or title,
+        artist=spotify_main_artist,
+        track_id=track_id,
+        uri=uri,
+        link=link,
+        preview_url=preview_url,
+        mood_tags=song.get("mood_tags"),
+    )
+
+
+# track_id 를 아는 곡은 검색 대신 /v1/tracks 로 50곡씩 메타데이터 갱신
+spotify_refresher = SpotifyMetadataRefresher(lambda: spotify_client.get())
+
+
+def _resolve_spotify_track(
+    song: Dict[str, Any],
+    stop_event: Optional[threading.Event] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    추천 곡 하나를 Spotify에서 찾아 링크 + 미리듣기를 붙인다.
+    - 검색 실패 / 제목 유사도 낮음 / 링크 없음이면 None
+    - stop_event가 set 되면 제목만으로 하는 재검색은 생략
+    - 결과(실패 포함)는 spotify_cache에 저장해 두고 다음 요청에서 재사용
+    """
+    title = song.get("title", "").strip()
+    artist = song.get("artist", "").strip()
+
+    if not title:
+        return None
+
+    try:
+        # 캐시 조회도 SQLite 락 대기 / database is locked 가 날 수 있으므로 try 안에서
+        hit, cached = lookup_cached_track(song)
+        if hit:
+            return cached
+
+        # 같은 (제목, 아티스트) 검색이 진행 중이면 그 결과를 같이 쓴다
+        items = spotify_search_flight.do(
+            spotify_search_key(title, artist),
+            _search_spotify_items,
+            title,
+            artist,
+            stop_event=stop_event,
+        )
+        if items is None:
+            return None
+        # 매칭 / 캐시 저장은 곡마다 (추천 이유, mood_tags 가 요청마다 다름)
+        return match_spotify_items(song, items)
+
+    except Exception as e:
+        # 재시도 후에도 실패한 경우 (429 지속 / 5xx / 연결 오류)
+        SPOTIFY_MATCHES.labels("error").inc()
+        print("Spotify 검색 에러:", e)
+        return None
+
+
+def _search_spotify_items(
+    title: str,
+    artist: str,
+    stop_event: Optional[threading.Event] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Spotify 검색 결과 items 를 반환. 재검색 전에 stop_event 가 set 되면 None.
+    (single-flight 로 묶이면 먼저 시작한 요청의 stop_event 를 따른다)
+    """
+    items: List[Dict[str, Any]] = []
+    for i, query in enumerate(spotify_search_queries(title, artist)):
+        # 1차 실패 시 제목만으로 재시도 (이미 충분히 찾았으면 생략)
+        if i > 0 and stop_event is not None and stop_event.is_set():
+            return None
+        with stage("spotify_search"):
+            res = spotify_client.get().search(q=query, type="track", limit=1)
+        items = spotify_search_items(res)
+        if items:
+            break
+    return items
+
+
+def iter_spotify_links_logic(
+    songs: List[Dict[str, Any]],
+    min_valid: int = 6,
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    추천 곡들을 Spotify에서 찾으면서, 매칭된 곡을 찾는 즉시
+    (songs 안에서의 인덱스, 링크가 붙은 곡) 형태로 내보낸다.
+    - max_workers > 1 이면 스레드 풀에서 병렬 검색 (완료 순서대로 yield)
+    - min_valid개를 찾으면 아직 시작 안 한 검색은 취소한다
+    """
+    if max_workers is None:
+        max_workers = SPOTIFY_MAX_WORKERS
+
+    if max_workers <= 1:
+        found = 0
+        for idx, s in enumerate(songs):
+            enriched = _resolve_spotify_track(s)
+            if enriched is None:
+                continue
+            yield idx, enriched
+            found += 1
+            if found >= min_valid:
+                break
+        return
+
+    stop_event = threading.Event()
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, max(len(songs), 1)),
+        thread_name_prefix="spotify-search",
+    )
+    try:
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run, _resolve_spotify_track, s, stop_event
+            ): idx
+            for idx, s in enumerate(songs)
+        }
+        found = 0
+        for fut in as_completed(futures):
+            enriched = fut.result()
+            if enriched is None:
+                continue
+            yield futures[fut], enriched
+            found += 1
+            if found >= min_valid:
+                break
+    finally:
+        # 충분히 찾았거나 호출 측이 중단하면 남은 검색은 취소
+        stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 def attach_spotify_links_logic(
     songs: List[Dict[str, Any]],
     min_valid: int = 6,
+    max_workers: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
     OpenAI 추천 결과에 Spotify 링크 + 미리듣기 추가.
     - Spotify에서 실제로 찾은 곡만 반환
     - 제목 유사도가 너무 낮으면 스킵
     - 최소 min_valid개 이상 찾으려고 시도
+    - 병렬로 찾더라도 결과는 LLM이 추천한 순서를 유지
     """
-    enriched: List[Dict[str, Any]] = []
+    resolved = sorted(
+        iter_spotify_links_logic(songs, min_valid=min_valid, max_workers=max_workers),
+        key=lambda x: x[0],
+    )
+    return [enriched for _, enriched in resolved]
 
-    def _normalize(s: str) -> str:
-        return "".join(ch for ch in s.lower() if not ch.isspace())
 
-    for s in songs:
-        title = s.get("title", "").strip()
-        artist = s.get("artist", "").strip()
-        reason = s.get("reason", "")
+class StreamedLinks:
+    """
+    LLM 스트림 + Spotify 검색 결과 메시지를 모아서 내보낼 곡을 정한다 (sync / async 공통).
+    메시지: ("song", idx, 곡|None) / ("done", 총 곡 수, None) / ("error", 곡 수, 예외)
+    """
 
-        if not title:
-            continue
+    def __init__(self, min_valid: int) -> None:
+        self.min_valid = min_valid
+        self.total: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.finished = 0
+        self.found = 0
+
+    @property
+    def pending(self) -> bool:
+        """더 기다릴 메시지가 있는지 (min_valid개를 찾았으면 False)."""
+        if self.found >= self.min_valid:
+            return False
+        return self.total is None or self.finished < self.total
+
+    def on_message(self, kind: str, idx: int, payload: Any) -> Optional[Dict[str, Any]]:
+        """메시지 하나 처리. 내보낼 곡이면 반환."""
+        if kind == "error":
+            self.error, self.total = payload, idx
+            return None
+        if kind == "done":
+            self.total = idx
+            return None
+        self.finished += 1
+        if payload is None:
+            return None
+        self.found += 1
+        return payload
+
+    def raise_if_failed(self) -> None:
+        """LLM 오류로 끊겼고 min_valid개를 못 채웠으면 그 오류를 올림."""
+        if self.error is not None and self.found < self.min_valid:
+            raise self.error
+
+
+def stream_deadline() -> Optional[float]:
+    """스트리밍 추천의 마감 시각 (time.monotonic 기준, 제한 없으면 None)."""
+    if RECOMMEND_STREAM_DEADLINE <= 0:
+        return None
+    return time.monotonic() + RECOMMEND_STREAM_DEADLINE
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def stream_timeout_error() -> TimeoutError:
+    return TimeoutError(
+        f"추천 스트리밍이 {RECOMMEND_STREAM_DEADLINE:g}s 안에 끝나지 않음"
+    )
 
-        query = f"track:{title} artist:{artist}" if artist else title
 
-        link = ""
-        preview_url = ""
-        track_id = ""
-        uri = ""
-        embed_url = ""
+def iter_streaming_links_logic(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    min_valid: int = 6,
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    LLM 스트리밍과 Spotify 검색을 겹쳐서 실행한다.
+    - track 이 완성될 때마다 바로 검색 워커에 넘기고
+    - 매칭된 곡을 찾는 즉시 (LLM 추천 순서 인덱스, 곡) 으로 yield
+    - min_valid개를 찾으면 LLM 스트림과 남은 검색을 모두 중단
+    - RECOMMEND_STREAM_DEADLINE 이 지나면 TimeoutError 로 중단
+    LLM 오류가 나면 이미 받은 곡의 검색까지 마저 내보낸 뒤, 그래도 min_valid개가
+    안 되면 호출 측으로 전달한다 (남은 자리를 채울지는 호출 측이 정함).
+    """
+    if max_workers is None:
+        max_workers = SPOTIFY_MAX_WORKERS
+
+    stop_event = threading.Event()
+    # StreamedLinks 가 처리하는 메시지
+    results: "queue.Queue[Tuple[str, int, Any]]" = queue.Queue()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, max_workers), thread_name_prefix="spotify-search"
+    )
 
+    def _on_resolved(idx: int, fut: Any) -> None:
+        # 곡마다 "song" 메시지는 반드시 하나 (안 오면 아래 루프가 끝나지 않음)
+        enriched = None
+        if not fut.cancelled() and fut.exception() is None:
+            enriched = fut.result()
+        results.put(("song", idx, enriched))
+
+    def _pump() -> None:
+        count = 0
+        tracks = stream_recommended_tracks(
+            analysis_json, user_profile, stop_event, adaptive_track_count(min_valid)
+        )
         try:
-            # 1차 검색
-            res = sp.search(q=query, type="track", limit=1)
-            items = res.get("tracks", {}).get("items", [])
-
-            # 1차 실패 시, 제목만으로 재시도
-            if not items and artist:
-                res = sp.search(q=title, type="track", limit=1)
-                items = res.get("tracks", {}).get("items", [])
-
-            if not items:
-                print(f"[Spotify] '{title}' ({artist}) 검색 실패, 스킵.")
-                continue
-
-            track = items[0]
+            for track in tracks:
+                if stop_event.is_set():
+                    break
+                fut = executor.submit(
+                    contextvars.copy_context().run,
+                    _resolve_spotify_track,
+                    track,
+                    stop_event,
+                )
+                fut.add_done_callback(functools.partial(_on_resolved, count))
+                count += 1
+        except Exception as e:
+            results.put(("error", count, e))
+            return
+        finally:
+            tracks.close()
+        results.put(("done", count, None))
+
+    # 요청 컨텍스트(LLM 사용량 기록 등)를 pump 스레드에서도 그대로 쓰도록
+    ctx = contextvars.copy_context()
+    threading.Thread(
+        target=ctx.run, args=(_pump,), name="llm-stream", daemon=True
+    ).start()
+    deadline = stream_deadline()
+    links = StreamedLinks(min_valid)
+    try:
+        while links.pending:
+            try:
+                kind, idx, payload = results.get(timeout=time_left(deadline))
+            except queue.Empty:
+                raise stream_timeout_error() from None
+            song = links.on_message(kind, idx, payload)
+            if song is not None:
+                yield idx, song
+        links.raise_if_failed()
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def catalog_fill_songs(
+    songs: List[Dict[str, Any]],
+    yielded: List[Tuple[int, Dict[str, Any]]],
+    min_valid: int,
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    LLM 스트림이 실패했을 때 카탈로그 곡으로 남은 자리만 채우기 위한 계산.
+    반환: (이미 내보낸 곡을 뺀 카탈로그 곡, 인덱스 오프셋, 더 찾을 곡 수)
+    오프셋은 내보낸 LLM 인덱스 다음부터라서 인덱스로 정렬해도 LLM 곡이 앞에 온다.
+    """
+    seen_ids = {s.get("track_id") for _, s in yielded if s.get("track_id")}
+    seen_names = {
+        (_normalize_title(s.get("title", "")), _normalize_title(s.get("artist", "")))
+        for _, s in yielded
+    }
+    rest = [
+        s
+        for s in songs
+        if s.get("track_id") not in seen_ids
+        and (
+            _normalize_title(s.get("title", "")),
+            _normalize_title(s.get("artist", "")),
+        )
+        not in seen_names
+    ]
+    offset = max((idx for idx, _ in yielded), default=-1) + 1
+    return rest, offset, min_valid - len(yielded)
 
-            spotify_title = track.get("name", "")
-            spotify_artists = track.get("artists", [])
-            spotify_main_artist = (
-                spotify_artists[0]["name"] if spotify_artists else artist
-            )
 
-            input_title_norm = _normalize(title)
-            spotify_title_norm = _normalize(spotify_title)
+def iter_recommend_links_logic(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    min_valid: int = 6,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    추천 + Spotify 링크 붙이기를 한 번에. 매칭된 곡을 (인덱스, 곡)으로 yield.
+    RECOMMEND_MODE(catalog/auto 대체)와 RECOMMEND_STREAMING 설정을 따른다.
+    """
+    if not RECOMMEND_STREAMING:
+        songs = recommend_songs_logic(
+            analysis_json, user_profile, adaptive_track_count(min_valid)
+        )
+        yield from iter_spotify_links_logic(songs, min_valid=min_valid)
+        return
 
-            title_ratio = difflib.SequenceMatcher(
-                None, input_title_norm, spotify_title_norm
-            ).ratio()
+    if RECOMMEND_MODE == "catalog":
+        songs = recommend_from_catalog(
+            analysis_json, user_profile, require_confident=True
+        )
+        if songs:
+            yield from iter_spotify_links_logic(songs, min_valid=min_valid)
+            return
 
-            if title_ratio < 0.7:
-                print(
-                    f"[Spotify] 제목 유사도 낮음 → '{title}' vs '{spotify_title}' "
-                    f"(ratio={title_ratio:.2f}) → 스킵"
-                )
-                continue
+    yielded: List[Tuple[int, Dict[str, Any]]] = []
+    try:
+        for pair in iter_streaming_links_logic(
+            analysis_json, user_profile, min_valid=min_valid
+        ):
+            yielded.append(pair)
+            yield pair
+        return
+    except Exception as e:
+        # 이미 곡을 내보냈으면 오류를 올리지 않고 받은 곡까지만 (auto 면 남은 자리 채움)
+        if RECOMMEND_MODE != "auto":
+            if not yielded:
+                raise
+            print("[recommend] 스트리밍 중단:", e)
+            return
+        print("[recommend] OpenAI 실패 → 카탈로그로 대체:", e)
+        songs = recommend_from_catalog(analysis_json, user_profile)
+        if not songs and not yielded:
+            raise
+    songs, offset, need = catalog_fill_songs(songs, yielded, min_valid)
+    if need <= 0:
+        return
+    for idx, song in iter_spotify_links_logic(songs, min_valid=need):
+        yield offset + idx, song
+
+
+def recommend_with_links_logic(
+    analysis_json: str,
+    user_profile: Optional[Dict[str, Any]] = None,
+    min_valid: int = 6,
+) -> List[Dict[str, Any]]:
+    """iter_recommend_links_logic 결과를 LLM 추천 순서대로 모아서 반환."""
+    resolved = sorted(
+        iter_recommend_links_logic(analysis_json, user_profile, min_valid=min_valid),
+        key=lambda x: x[0],
+    )
+    return [enriched for _, enriched in resolved]
 
-            print(
-                f"[Spotify] 매칭 성공 ✅ 입력='{title}' / Spotify='{spotify_title}' "
-                f"(ratio={title_ratio:.2f})"
-            )
 
-            link = track.get("external_urls", {}).get("spotify", "")
-            preview_url = track.get("preview_url") or ""
-            track_id = track.get("id") or ""
-            uri = track.get("uri") or ""
+# =========================
+# 4) 모델 워밍업 / 준비 상태
+# =========================
+# background: 포트를 먼저 열고 모델은 백그라운드에서 로딩 (기본값)
+# eager: 서버 startup 단계에서 로딩이 끝날 때까지 대기
+# lazy: 미리 로딩하지 않고 첫 요청에서 로딩
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "background").lower()
+WARMUP_TEXT = "오늘 하루 너무 지쳤는데 잔잔한 노래 듣고 싶어"
+
+_warmup_lock = threading.Lock()
+_warmup_status: Dict[str, Any] = {
+    "state": STATE_NOT_LOADED,
+    "seconds": None,
+    "inference_seconds": None,
+    "finished_at": None,
+    "error": None,
+}
 
-            if not track_id and not link:
-                print(f"[Spotify] '{title}' ({artist})는 링크 정보가 없음, 스킵.")
-                continue
 
-            if track_id:
-                embed_url = f"https://open.spotify.com/embed/track/{track_id}"
-
-            enriched.append(
-                {
-                    "title": spotify_title or title,
-                    "artist": spotify_main_artist,
-                    "reason": reason,
-                    "link": link,
-                    "preview_url": preview_url,
-                    "track_id": track_id,
-                    "uri": uri,
-                    "embed_url": embed_url,
-                }
-            )
+def _warmup_resources() -> List[LazyResource[Any]]:
+    if EMOTION_BACKEND == "embedding":
+        # 임베딩 모드에서는 mDeBERTa를 아예 올리지 않음
+        models: List[LazyResource[Any]] = [kw_model, emotion_prototypes]
+    else:
+        models = [zsc_model, kw_model]
+    return [openai_client, spotify_client, *models]
 
-            if len(enriched) >= min_valid:
-                break
 
+def warmup_models() -> None:
+    """
+    클라이언트/모델을 전부 로딩하고 워밍업 추론을 한 번 돌린다.
+    (첫 실제 요청이 lazy-init + 첫 forward 비용을 내지 않도록)
+    """
+    with _warmup_lock:
+        if _warmup_status["state"] == STATE_READY:
+            return
+        _warmup_status["state"] = STATE_LOADING
+        _warmup_status["error"] = None
+        started = time.perf_counter()
+        try:
+            for res in _warmup_resources():
+                res.get()
+            infer_started = time.perf_counter()
+            _analyze_text_uncached(WARMUP_TEXT)
+            _warmup_status["inference_seconds"] = time.perf_counter() - infer_started
+            if RECOMMEND_MODE != "llm":
+                # 카탈로그 실패가 준비 상태를 막지는 않음
+                recommend_from_catalog("{}")
         except Exception as e:
-            print("Spotify 검색 에러:", e)
-            continue
-
-    return enriched
+            _warmup_status["state"] = STATE_ERROR
+            _warmup_status["error"] = f"{type(e).__name__}: {e}"
+            print("[warmup] 실패:", e)
+            return
+        _warmup_status["seconds"] = time.perf_counter() - started
+        _warmup_status["finished_at"] = time.time()
+        _warmup_status["state"] = STATE_READY
+        print(f"[warmup] 완료 ({_warmup_status['seconds']:.2f}s)")
+
+
+def start_background_warmup() -> threading.Thread:
+    t = threading.Thread(target=warmup_models, name="model-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def readiness() -> Dict[str, Any]:
+    """/ready 응답: 모델별 로딩 상태 + 워밍업 시간."""
+    resources = _warmup_resources()
+    if MODEL_LOAD_MODE == "lazy":
+        # 첫 요청에서 로딩하기로 한 모드 → 따로 기다릴 것이 없음
+        ready = True
+    else:
+        ready = _warmup_status["state"] == STATE_READY
+    return {
+        "ready": ready,
+        "load_mode": MODEL_LOAD_MODE,
+        "emotion_backend": EMOTION_BACKEND,
+        "inference_backend": INFERENCE_BACKEND,
+        "models": {r.name: r.status() for r in resources},
+        "warmup": dict(_warmup_status),
+    }
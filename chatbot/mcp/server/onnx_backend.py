@@ -0,0 +1,289 @@
+# chatbot/mcp/server/onnx_backend.py
+# -*- coding: utf-8 -*-
+"""
+ONNX Runtime (+ 동적 int8 양자화) CPU 추론 백엔드.
+
+CPU 전용 노드에서 PyTorch 대신 ONNX Runtime 으로 분석 모델을 돌린다.
+- 제로샷 감정 분류 (mDeBERTa NLI) → ORTModelForSequenceClassification
+- KeyBERT 문장 임베딩 (ko-sroberta)  → ORTModelForFeatureExtraction + mean pooling
+
+선택 의존성: pip install "optimum[onnxruntime]>=1.17"
+
+사용법:
+    # 1) 아티팩트 생성 (export + int8 양자화)
+    python -m chatbot.mcp.server.onnx_backend build
+    # 2) PyTorch 경로와 결과 비교
+    python -m chatbot.mcp.server.onnx_backend parity
+    # 3) 서버에서 사용
+    INFERENCE_BACKEND=onnx python -m chatbot.mcp.server.server
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from keybert.backend import BaseEmbedder
+
+ONNX_MODEL_DIR = Path(
+    os.getenv(
+        "ONNX_MODEL_DIR",
+        str(Path(__file__).resolve().parent / "onnx_models"),
+    )
+)
+# 1이면 양자화된 model_quantized.onnx 사용, 0이면 fp32 model.onnx 사용
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "1") != "0"
+
+ZSC_SUBDIR = "zsc"
+KW_SUBDIR = "keybert"
+QUANTIZED_FILE = "model_quantized.onnx"
+FP32_FILE = "model.onnx"
+
+# sroberta(SentenceTransformer) 설정과 동일하게 맞춤
+KW_MAX_SEQ_LENGTH = 128
+
+PARITY_TEXTS = [
+    "오늘 하루 너무 지쳤는데 잔잔한 노래 듣고 싶어",
+    "시험 기간이라 집중해서 공부해야 해",
+    "헤어지고 나서 새벽에 자꾸 생각나",
+    "친구들이랑 여행 가서 너무 신났어!",
+    "회사에서 너무 화나는 일이 있었어",
+    "운동하면서 들을 신나는 노래 추천해줘",
+    "좋아하는 사람이랑 데이트 가는 날이야",
+    "비 오는 날 카페에서 조용히 책 읽는 중",
+]
+
+
+def _require_optimum() -> None:
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "ONNX 백엔드를 쓰려면 optimum[onnxruntime] 이 필요합니다: "
+            'pip install "optimum[onnxruntime]>=1.17"'
+        ) from e
+
+
+def _model_file() -> str:
+    return QUANTIZED_FILE if ONNX_QUANTIZED else FP32_FILE
+
+
+# =========================
+# 아티팩트 생성 (export + 양자화)
+# =========================
+def _export(ort_cls: Any, model_id: str, out_dir: Path, quantize: bool) -> None:
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    print(f"[onnx] export {model_id} → {out_dir}")
+    model = ort_cls.from_pretrained(model_id, export=True)
+    model.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(out_dir)
+
+    if quantize:
+        # 가중치만 int8, 활성값은 실행 시 동적으로 양자화
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer = ORTQuantizer.from_pretrained(out_dir, file_name=FP32_FILE)
+        quantizer.quantize(save_dir=out_dir, quantization_config=qconfig)
+        print(f"[onnx] int8 양자화 완료 → {out_dir / QUANTIZED_FILE}")
+
+
+def build_artifacts(out_dir: Path = ONNX_MODEL_DIR, quantize: bool = True) -> None:
+    """제로샷 분류 모델과 KeyBERT 임베딩 모델을 ONNX로 export (+ int8 양자화)."""
+    _require_optimum()
+    from optimum.onnxruntime import (
+        ORTModelForFeatureExtraction,
+        ORTModelForSequenceClassification,
+    )
+
+    from .model import KW_MODEL, ZSC_MODEL
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _export(
+        ORTModelForSequenceClassification, ZSC_MODEL, out_dir / ZSC_SUBDIR, quantize
+    )
+    _export(ORTModelForFeatureExtraction, KW_MODEL, out_dir / KW_SUBDIR, quantize)
+
+
+# =========================
+# 런타임 로딩
+# =========================
+def load_zsc_pipeline(model_dir: Path = ONNX_MODEL_DIR) -> Any:
+    """ONNX 제로샷 분류 파이프라인 (transformers pipeline 과 같은 인터페이스)."""
+    _require_optimum()
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    path = model_dir / ZSC_SUBDIR
+    model = ORTModelForSequenceClassification.from_pretrained(
+        path, file_name=_model_file()
+    )
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    return pipeline(
+        "zero-shot-classification",
+        model=model,
+        tokenizer=tokenizer,
+        truncation=True,
+    )
+
+
+class OnnxSentenceEmbedder(BaseEmbedder):
+    """KeyBERT 백엔드용 ONNX 문장 임베더 (SentenceTransformer mean pooling과 동일)."""
+
+    def __init__(self, model_dir: Path = ONNX_MODEL_DIR, batch_size: int = 32):
+        super().__init__()
+        _require_optimum()
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        path = model_dir / KW_SUBDIR
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            path, file_name=_model_file()
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.batch_size = batch_size
+
+    def embed(self, documents: List[str], verbose: bool = False) -> np.ndarray:
+        chunks = []
+        for i in range(0, len(documents), self.batch_size):
+            batch = documents[i : i + self.batch_size]
+            enc = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=KW_MAX_SEQ_LENGTH,
+                return_tensors="np",
+            )
+            out = self.model(**enc)
+            hidden = np.asarray(out.last_hidden_state)
+            mask = enc["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            chunks.append(pooled)
+        if not chunks:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(chunks)
+
+
+def load_keybert(model_dir: Path = ONNX_MODEL_DIR) -> Any:
+    from keybert import KeyBERT
+
+    return KeyBERT(model=OnnxSentenceEmbedder(model_dir))
+
+
+# =========================
+# PyTorch 경로와 정합성 비교
+# =========================
+def _zsc_scores(zsc: Any, texts: List[str]) -> np.ndarray:
+    from .model import EMOTION_LABELS_KO, ZSC_HYPOTHESIS_TEMPLATE
+
+    res = zsc(
+        texts,
+        candidate_labels=EMOTION_LABELS_KO,
+        multi_label=True,
+        hypothesis_template=ZSC_HYPOTHESIS_TEMPLATE,
+    )
+    if isinstance(res, dict):
+        res = [res]
+    rows = []
+    for r in res:
+        by_label = dict(zip(r["labels"], r["scores"]))
+        rows.append([by_label[label] for label in EMOTION_LABELS_KO])
+    return np.asarray(rows)
+
+
+def check_parity(
+    texts: List[str] = PARITY_TEXTS,
+    model_dir: Path = ONNX_MODEL_DIR,
+    score_tolerance: float = 0.05,
+    min_cosine: float = 0.98,
+) -> Dict[str, Any]:
+    """
+    같은 문장들에 대해 PyTorch / ONNX 결과를 비교한다.
+    - 감정 점수 최대 절대 오차, top1 감정 일치율
+    - 문장 임베딩 코사인 유사도 (최소값)
+    - KeyBERT 키워드 top-6 겹침 비율
+    """
+    # INFERENCE_BACKEND 설정과 상관없이 기준은 항상 PyTorch 경로
+    from keybert import KeyBERT
+    from transformers import pipeline
+
+    from .model import KW_MODEL, ZSC_MODEL
+
+    torch_zsc = pipeline("zero-shot-classification", model=ZSC_MODEL, truncation=True)
+    onnx_zsc = load_zsc_pipeline(model_dir)
+    s_torch = _zsc_scores(torch_zsc, texts)
+    s_onnx = _zsc_scores(onnx_zsc, texts)
+
+    torch_kw = KeyBERT(KW_MODEL)
+    onnx_kw = load_keybert(model_dir)
+    e_torch = np.asarray(torch_kw.model.embed(texts))
+    e_onnx = np.asarray(onnx_kw.model.embed(texts))
+    cos = (e_torch * e_onnx).sum(axis=1) / (
+        np.linalg.norm(e_torch, axis=1) * np.linalg.norm(e_onnx, axis=1)
+    )
+
+    overlaps = []
+    for t in texts:
+        k_torch = {k for k, _ in torch_kw.extract_keywords(t, (1, 2), top_n=6)}
+        k_onnx = {k for k, _ in onnx_kw.extract_keywords(t, (1, 2), top_n=6)}
+        overlaps.append(len(k_torch & k_onnx) / max(len(k_torch), 1))
+
+    max_abs_diff = float(np.abs(s_torch - s_onnx).max())
+    top1_agreement = float((s_torch.argmax(axis=1) == s_onnx.argmax(axis=1)).mean())
+    report = {
+        "texts": len(texts),
+        "quantized": ONNX_QUANTIZED,
+        "zsc_max_abs_diff": max_abs_diff,
+        "zsc_top1_agreement": top1_agreement,
+        "embedding_min_cosine": float(cos.min()),
+        "keyword_overlap_mean": float(np.mean(overlaps)),
+        "score_tolerance": score_tolerance,
+        "min_cosine": min_cosine,
+    }
+    report["ok"] = (
+        max_abs_diff <= score_tolerance
+        and top1_agreement == 1.0
+        and report["embedding_min_cosine"] >= min_cosine
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ONNX 추론 백엔드 도구")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="ONNX export + int8 양자화")
+    p_build.add_argument("--out", type=Path, default=ONNX_MODEL_DIR)
+    p_build.add_argument("--no-quantize", action="store_true")
+
+    p_parity = sub.add_parser("parity", help="PyTorch 경로와 결과 비교")
+    p_parity.add_argument("--model-dir", type=Path, default=ONNX_MODEL_DIR)
+    p_parity.add_argument("--texts-file", type=Path, default=None)
+    p_parity.add_argument("--tolerance", type=float, default=0.05)
+    p_parity.add_argument("--min-cosine", type=float, default=0.98)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        build_artifacts(args.out, quantize=not args.no_quantize)
+        return 0
+
+    texts = PARITY_TEXTS
+    if args.texts_file:
+        lines = args.texts_file.read_text(encoding="utf-8").splitlines()
+        texts = [line.strip() for line in lines if line.strip()]
+    report = check_parity(
+        texts,
+        model_dir=args.model_dir,
+        score_tolerance=args.tolerance,
+        min_cosine=args.min_cosine,
+    )
+    for k, v in report.items():
+        print(f"{k}: {v}")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
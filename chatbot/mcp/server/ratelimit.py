@@ -0,0 +1,147 @@
+# chatbot/mcp/server/ratelimit.py
+# -*- coding: utf-8 -*-
+"""
+클라이언트 쪽 토큰 버킷 rate limiter.
+
+Spotify 처럼 초당 호출 수 제한이 있는 API 를 여러 스레드 / 이벤트 루프가 같이
+쓸 때, 429 를 맞고 나서 물러나는 대신 미리 속도를 맞춰서 보낸다.
+
+- rate 개/초 로 토큰이 차고, 최대 burst 개까지 모아 둘 수 있다
+- reserve() 는 토큰을 하나 "예약"하고 기다려야 할 시간(초)을 돌려준다
+  (락은 계산할 때만 잡으므로 스레드 / asyncio 양쪽에서 같은 버킷을 쓸 수 있음)
+- pause(seconds) 는 서버가 Retry-After 로 알려준 시간 동안 버킷 전체를 멈춘다
+  (429 를 받은 요청 하나만이 아니라 같은 API 를 쓰는 모든 요청이 같이 쉰다)
+
+버킷은 프로세스마다 따로다. pre-fork 워커(serve.py)가 N 개면 전체 속도는 N 배.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class RateLimitTimeout(Exception):
+    """timeout 안에 토큰을 받을 수 없을 때."""
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate: float, burst: Optional[float] = None) -> None:
+        self.name = name
+        # rate <= 0 이면 제한 없음 (pause 만 적용)
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+        self.acquired = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.pauses = 0
+        self.rejected = 0
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # pause 중에는 _updated 가 미래 시각 → 토큰이 차지 않음
+        if now <= self._updated:
+            return
+        if self.rate > 0:
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def reserve(self, timeout: Optional[float] = None) -> float:
+        """
+        토큰 하나를 예약하고, 보내기 전에 기다려야 할 시간(초)을 반환.
+        기다릴 시간이 timeout 을 넘으면 예약하지 않고 RateLimitTimeout.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            pause_wait = max(0.0, self._paused_until - now)
+            if self.rate > 0:
+                # 토큰이 음수가 되면 그만큼 뒤 순번 (먼저 예약한 요청이 먼저 나감)
+                token_wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            else:
+                token_wait = 0.0
+            # 토큰은 pause 가 끝난 뒤부터 차므로 두 대기 시간을 더한다
+            wait = pause_wait + token_wait
+            if timeout is not None and wait > timeout:
+                self.rejected += 1
+                raise RateLimitTimeout(
+                    f"{self.name}: rate limit 대기 {wait:.2f}s > timeout {timeout:.2f}s"
+                )
+            if self.rate > 0:
+                self._tokens -= 1.0
+            self.acquired += 1
+            if wait > 0:
+                self.delayed += 1
+                self.wait_seconds += wait
+            return wait
+
+    def try_acquire(self) -> bool:
+        """기다리지 않고 바로 쓸 수 있는 토큰이 있을 때만 가져간다 (헤징용)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return False
+            if self.rate > 0:
+                if self._tokens < 1.0:
+                    return False
+                self._tokens -= 1.0
+            self.acquired += 1
+            return True
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """토큰을 받을 때까지 현재 스레드에서 기다린다. 기다린 시간을 반환."""
+        wait = self.reserve(timeout)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> float:
+        """acquire 의 asyncio 버전 (이벤트 루프를 막지 않음)."""
+        wait = self.reserve(timeout)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """지금부터 seconds 동안 새 토큰을 내주지 않는다 (Retry-After)."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until <= self._paused_until:
+                return
+            self._refill(time.monotonic())
+            self._paused_until = until
+            self.pauses += 1
+            # 쉬는 동안 토큰이 쌓여서 끝나자마자 한꺼번에 몰려가지 않도록
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = until
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "name": self.name,
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 3),
+                "paused_for": max(0.0, self._paused_until - now),
+                "acquired": self.acquired,
+                "delayed": self.delayed,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "pauses": self.pauses,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,208 @@
+# chatbot/mcp/server/rec_cache.py
+# -*- coding: utf-8 -*-
+"""
+추천 결과(LLM 트랙 리스트) 의미 기반 캐시.
+
+같은 situation / 같은 top1·top2 감정 / 비슷한 키워드 / 비슷한 취향이면
+LLM 이 내놓는 곡 목록도 거의 같으므로 gpt 호출 없이 저장된 목록을 재사용한다.
+- 정확히 같은 키: 바로 적중
+- 키가 달라도 같은 버킷(situation + top1 감정 + 취향 지문) 안에서
+  키워드/원문 임베딩 코사인 유사도가 threshold 이상이면 적중
+- 적중할 때마다 저장된 후보를 섞어서 반환 (매번 같은 답처럼 보이지 않도록)
+- 곡 자체의 정보만 저장한다. LLM 의 reason 은 처음 요청한 사용자의 문장에 맞춰
+  쓴 것이라, 적중하면 지금 요청의 감정 / 곡의 태그로 만든 이유로 바꿔서 반환
+"""
+import copy
+import hashlib
+import json
+import os
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from .cache import TTLCache
+
+REC_CACHE_ENABLED = os.getenv("REC_CACHE_ENABLED", "1") != "0"
+REC_CACHE_TTL = float(os.getenv("REC_CACHE_TTL", "1800"))
+REC_CACHE_SIZE = int(os.getenv("REC_CACHE_SIZE", "2000"))
+# 키워드/원문 임베딩 코사인 유사도가 이 값 이상이면 같은 요청으로 본다
+REC_CACHE_SIM_THRESHOLD = float(os.getenv("REC_CACHE_SIM_THRESHOLD", "0.9"))
+
+# 캐시에 저장하는 곡 필드 (reason 처럼 요청마다 다른 내용은 제외)
+_TRACK_FIELDS = ("title", "artist", "mood_tags", "match_score")
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
+
+def profile_fingerprint(user_profile: Optional[Dict[str, Any]]) -> str:
+    """취향 정보만으로 만든 지문 (user_id/표시 이름은 제외 → 취향이 같으면 공유)."""
+    p = user_profile or {}
+    taste = {
+        "novelty": p.get("novelty_score"),
+        "year": p.get("preferred_year_category"),
+        "genres": sorted(p.get("favorite_genres") or []),
+        "artists": [a.get("name") for a in (p.get("favorite_artists") or [])],
+    }
+    raw = json.dumps(taste, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class RecommendationCache:
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        ttl: float = REC_CACHE_TTL,
+        maxsize: int = REC_CACHE_SIZE,
+        threshold: float = REC_CACHE_SIM_THRESHOLD,
+        enabled: bool = REC_CACHE_ENABLED,
+    ) -> None:
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.enabled = enabled
+
+        # exact_key → {"tracks", "embedding", "bucket"}
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, name="recommend")
+        # bucket → exact_key 집합 (유사도 검색 범위)
+        self._buckets: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    # ---------- 키 ----------
+    @staticmethod
+    def _keys(info: Dict[str, Any], user_profile: Optional[Dict[str, Any]]) -> tuple:
+        fp = profile_fingerprint(user_profile)
+        situation = info.get("situation", "general")
+        mood1 = info.get("mood_top1_ko", "")
+        mood2 = info.get("mood_top2_ko", "")
+        keywords = sorted(info.get("keywords") or [])
+        bucket = "|".join([situation, mood1, fp])
+        exact = "|".join([bucket, mood2, ",".join(keywords)])
+        return bucket, exact
+
+    @staticmethod
+    def _semantic_text(info: Dict[str, Any]) -> str:
+        keywords = " ".join(info.get("keywords") or [])
+        return f"{keywords} {info.get('raw_text', '')}".strip()
+
+    def _embed(self, info: Dict[str, Any]) -> Optional[np.ndarray]:
+        # 임베딩 실패는 캐시를 못 쓰는 것일 뿐, 추천 자체를 막지는 않는다
+        try:
+            vec = np.asarray(self.embed_fn([self._semantic_text(info)]))[0]
+        except Exception as e:
+            print("[rec_cache] 임베딩 실패:", e)
+            return None
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    @staticmethod
+    def _track_only(track: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: copy.deepcopy(track[k]) for k in _TRACK_FIELDS if k in track}
+
+    @staticmethod
+    def _reason(info: Dict[str, Any], track: Dict[str, Any]) -> str:
+        parts = [info.get("mood_top1_ko")] + list(track.get("mood_tags") or [])[:1]
+        parts = [p for p in parts if p]
+        if not parts:
+            return "지금 분위기에 어울리는 곡"
+        return f"{'·'.join(parts)} 분위기에 어울리는 곡"
+
+    def _sampled(
+        self, tracks: List[Dict[str, Any]], info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        result = copy.deepcopy(random.sample(tracks, len(tracks)))
+        for track in result:
+            track["reason"] = self._reason(info, track)
+        return result
+
+    # ---------- 공개 API ----------
+    def lookup(
+        self,
+        analysis_json: str,
+        user_profile: Optional[Dict[str, Any]] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """캐시된 추천 목록(섞은 복사본)을 반환. 없으면 None."""
+        if not self.enabled:
+            return None
+        info = json.loads(analysis_json or "{}")
+        bucket, exact = self._keys(info, user_profile)
+
+        entry = self._entries.get(exact)
+        if entry is not None:
+            self.exact_hits += 1
+            return self._sampled(entry["tracks"], info)
+
+        with self._lock:
+            candidates = list(self._buckets.get(bucket, ()))
+        query = self._embed(info) if candidates else None
+        if query is not None:
+            best_sim, best, best_key = 0.0, None, None
+            for key in candidates:
+                # 후보는 peek 로만 훑고 (통계 / LRU 순서 유지) 고른 것만 touch
+                cand = self._entries.peek(key)
+                if cand is None:
+                    # 만료/밀려난 항목은 버킷에서도 정리
+                    with self._lock:
+                        self._buckets.get(bucket, set()).discard(key)
+                    continue
+                if cand["embedding"] is None:
+                    continue
+                sim = float(query @ cand["embedding"])
+                if sim > best_sim:
+                    best_sim, best, best_key = sim, cand, key
+            if best is not None and best_sim >= self.threshold:
+                self._entries.touch(best_key)
+                self.semantic_hits += 1
+                return self._sampled(best["tracks"], info)
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        analysis_json: str,
+        user_profile: Optional[Dict[str, Any]],
+        tracks: List[Dict[str, Any]],
+    ) -> None:
+        if not self.enabled or not tracks:
+            return
+        info = json.loads(analysis_json or "{}")
+        bucket, exact = self._keys(info, user_profile)
+        self._entries.set(
+            exact,
+            {
+                "tracks": [self._track_only(t) for t in tracks],
+                "embedding": self._embed(info),
+                "bucket": bucket,
+            },
+        )
+        with self._lock:
+            self._buckets.setdefault(bucket, set()).add(exact)
+        self.stores += 1
+
+    def clear(self) -> int:
+        with self._lock:
+            self._buckets.clear()
+        return self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+            ),
+            "stores": self.stores,
+            "threshold": self.threshold,
+            "ttl": self._entries.ttl,
+            "maxsize": self._entries.maxsize,
+        }
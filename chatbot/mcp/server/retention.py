@@ -0,0 +1,588 @@
+# chatbot/mcp/server/retention.py
+# -*- coding: utf-8 -*-
+"""
+chat.db 채팅 로그 보관 / 정리 (백그라운드).
+
+chat_logs 는 계속 쌓이기만 하므로, CHAT_LOG_RETENTION_DAYS 보다 오래된 로그를
+하루 단위 압축 파일(NDJSON + zstd, zstandard 가 없으면 gzip)로 옮기고 DB 에서 지운다.
+살아 있는 DB 는 최근 N 일치만 남아서 insert / 인덱스 / /logs 조회가 빠르게 유지된다.
+
+- 파일: CHAT_LOG_ARCHIVE_DIR/chat_logs-YYYY-MM-DD.ndjson.zst (하루 = 파티션 하나)
+  실행마다 압축 프레임(gzip 이면 member)을 하나씩 뒤에 붙이기만 한다 (append-only)
+- 순서: 파일에 쓰고 fsync → 같은 트랜잭션에서 chat_log_archives 의 committed_bytes
+  갱신 + 원본 행 삭제. 중간에 죽으면 committed_bytes 뒤의 내용은 다음 실행이
+  잘라내고 다시 쓰므로 로그가 빠지거나 두 번 들어가지 않는다
+  파일이 committed_bytes 보다 짧으면(유실 / 손상) 그 날은 건너뛰고 행을 DB 에 남긴다
+- 보관 파일의 로그에는 user_profile 을 다시 합쳐서 넣는다 (파일만으로 완결)
+- 더 이상 참조하지 않는 user_profiles 정리, 예전 행(meta_json 에 프로필 통째로)의 압축
+- 지운 뒤 ANALYZE, 빈 페이지 비율이 크면 VACUUM
+- 워커 프로세스가 여러 개면 파일 락으로 한 번에 한 프로세스만 실행
+
+기본은 꺼져 있다 (CHAT_LOG_RETENTION_ENABLED=1 로 켬). 켜면 chat_logs 의 행을
+실제로 지우므로, CHAT_LOG_ARCHIVE_DIR 은 반드시 영구 저장소(도커면 볼륨 / 바인드
+마운트)에 둘 것. 컨테이너 파일시스템에 두면 재배포 때 보관 파일이 사라진다.
+"""
+import gzip
+import io
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 락 없이 실행
+    fcntl = None  # type: ignore[assignment]
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+from .database import (
+    DB_PATH,
+    META_FULL,
+    PROFILE_UPSERT_SQL,
+    init_db,
+    parse_meta_keys,
+    profile_hash,
+)
+from .metrics import CHAT_LOG_RETENTION_ROWS
+
+# 켜면 오래된 행을 DB 에서 지우므로 명시적으로 켤 때만 (opt-in)
+CHAT_LOG_RETENTION_ENABLED = os.getenv("CHAT_LOG_RETENTION_ENABLED", "0") == "1"
+# 이보다 오래된 날의 로그를 보관 파일로 옮김 (0 이하면 옮기지 않음)
+CHAT_LOG_RETENTION_DAYS = int(os.getenv("CHAT_LOG_RETENTION_DAYS", "30"))
+# 보관 파일 위치 — 영구 저장소여야 함 (기본값 chat.db 옆은 컨테이너 안일 수 있음)
+CHAT_LOG_ARCHIVE_DIR = Path(
+    os.getenv("CHAT_LOG_ARCHIVE_DIR", str(DB_PATH.parent / "chat_archive"))
+)
+# 실행 주기 (초)
+CHAT_LOG_RETENTION_INTERVAL_SEC = float(
+    os.getenv("CHAT_LOG_RETENTION_INTERVAL_SEC", "3600")
+)
+# 한 트랜잭션에 옮길 행 수
+CHAT_LOG_ARCHIVE_BATCH = int(os.getenv("CHAT_LOG_ARCHIVE_BATCH", "5000"))
+CHAT_LOG_ZSTD_LEVEL = int(os.getenv("CHAT_LOG_ZSTD_LEVEL", "9"))
+# 빈 페이지가 전체의 이 비율 이상이고 CHAT_LOG_VACUUM_MIN_MB 이상이면 VACUUM
+CHAT_LOG_VACUUM_FREE_RATIO = float(os.getenv("CHAT_LOG_VACUUM_FREE_RATIO", "0.25"))
+CHAT_LOG_VACUUM_MIN_MB = float(os.getenv("CHAT_LOG_VACUUM_MIN_MB", "16"))
+
+_FILE_PREFIX = "chat_logs-"
+_ZSTD_SUFFIX = ".ndjson.zst"
+_GZIP_SUFFIX = ".ndjson.gz"
+
+
+def _codec_suffix() -> str:
+    return _ZSTD_SUFFIX if zstandard is not None else _GZIP_SUFFIX
+
+
+def _compress(data: bytes, suffix: str) -> bytes:
+    """파일 끝에 붙일 독립된 압축 프레임 하나."""
+    if suffix == _ZSTD_SUFFIX:
+        if zstandard is None:
+            raise RuntimeError(
+                "zstd 보관 파일에 이어 쓰려면 zstandard 가 필요합니다: "
+                'pip install "zstandard>=0.18"'
+            )
+        return zstandard.ZstdCompressor(level=CHAT_LOG_ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data: bytes, suffix: str) -> bytes:
+    """프레임(member) 여러 개가 이어진 내용을 한 번에 푼다."""
+    if suffix == _ZSTD_SUFFIX:
+        if zstandard is None:
+            raise RuntimeError(
+                "zstd 보관 파일을 읽으려면 zstandard 가 필요합니다: "
+                'pip install "zstandard>=0.18"'
+            )
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            io.BytesIO(data), read_across_frames=True
+        )
+        return reader.read()
+    return gzip.decompress(data)
+
+
+def _suffix_of(name: str) -> str:
+    return _ZSTD_SUFFIX if name.endswith(_ZSTD_SUFFIX) else _GZIP_SUFFIX
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _archive_record(row: sqlite3.Row) -> Dict[str, Any]:
+    """chat_logs 행 → 보관 파일 한 줄 (query_chat_logs 결과와 같은 모양)."""
+    try:
+        meta = json.loads(row["meta_json"]) if row["meta_json"] else {}
+    except json.JSONDecodeError:
+        meta = {"_raw": row["meta_json"]}
+    if row["profile_json"]:
+        meta["user_profile"] = json.loads(row["profile_json"])
+    return {
+        "id": row["id"],
+        "user_id": row["user_id"],
+        "user_text": row["user_text"],
+        "reply": row["reply"],
+        "meta": meta,
+        "created_at": row["created_at"],
+    }
+
+
+class ArchiveTruncated(Exception):
+    """보관 파일이 chat_log_archives 의 committed_bytes 보다 짧을 때 (유실 / 손상)."""
+
+
+class _FileLock:
+    """archive 디렉터리의 .lock 에 flock (잡지 못하면 acquired=False)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.acquired = False
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "_FileLock":
+        if fcntl is None:
+            self.acquired = True
+            return self
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.acquired = True
+        except OSError:
+            os.close(self._fd)
+            self._fd = None
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class ChatLogRetention:
+    def __init__(
+        self,
+        archive_dir: Path = CHAT_LOG_ARCHIVE_DIR,
+        retention_days: int = CHAT_LOG_RETENTION_DAYS,
+        interval: float = CHAT_LOG_RETENTION_INTERVAL_SEC,
+        batch_size: int = CHAT_LOG_ARCHIVE_BATCH,
+    ) -> None:
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 예전 형식(프로필 통째로) 행이 더 없으면 다시 찾지 않음
+        self._legacy_done = False
+
+        self.runs = 0
+        self.archived = 0
+        self.compacted = 0
+        self.profiles_pruned = 0
+        self.vacuums = 0
+        self.skipped = 0
+        self.partitions_broken = 0
+        self.errors = 0
+        self.last_run_at: Optional[float] = None
+        self.last_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def cutoff(self, now: Optional[datetime] = None) -> str:
+        """이 created_at 보다 앞선 로그를 옮긴다 (하루 단위로 자른 UTC 자정)."""
+        day = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        return day.strftime("%Y-%m-%dT00:00:00")
+
+    # ---------- 보관 ----------
+    def _append_partition(
+        self,
+        conn: sqlite3.Connection,
+        day: str,
+        records: List[Dict[str, Any]],
+    ) -> Tuple[str, int]:
+        """
+        하루치 로그를 파티션 파일 끝에 압축 프레임 하나로 붙이고 fsync.
+        반환: (파일 이름, 붙인 뒤 파일 크기) — DB 커밋 전까지는 확정되지 않은 내용
+        파일이 확정된 크기보다 짧으면 ArchiveTruncated (0 으로 채워 이어 쓰지 않음)
+        """
+        row = conn.execute(
+            "SELECT file, committed_bytes FROM chat_log_archives WHERE day = ?",
+            (day,),
+        ).fetchone()
+        if row is not None:
+            name, committed = row["file"], row["committed_bytes"]
+        else:
+            name, committed = f"{_FILE_PREFIX}{day}{_codec_suffix()}", 0
+        lines = "".join(
+            json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for r in records
+        )
+        frame = _compress(lines.encode("utf-8"), _suffix_of(name))
+
+        path = self.archive_dir / name
+        with open(path, "ab") as f:
+            size = f.tell()
+            if size < committed:
+                raise ArchiveTruncated(
+                    f"{name}: 파일 {size}B < 확정된 {committed}B (지워졌거나 잘림)"
+                )
+            # 지난 실행이 커밋 전에 죽었으면 남은 꼬리를 잘라내고 이어 씀
+            if size > committed:
+                f.truncate(committed)
+                f.seek(committed)
+            f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+            return name, f.tell()
+
+    def _archive_batch(
+        self, conn: sqlite3.Connection, cutoff: str, broken: Set[str]
+    ) -> Tuple[int, int]:
+        """
+        cutoff 이전 로그를 batch_size 만큼 보관. 반환: (읽은 행 수, 보관한 행 수)
+        보관 파일이 망가진 날은 broken 에 넣고 그 날의 행은 DB 에 그대로 둔다.
+        """
+        skip = ""
+        if broken:
+            skip = " AND substr(c.created_at, 1, 10) NOT IN (%s)" % ",".join(
+                "?" * len(broken)
+            )
+        rows = conn.execute(
+            "SELECT c.id, c.user_id, c.user_text, c.reply, c.meta_json, "
+            "c.created_at, p.profile_json AS profile_json "
+            "FROM chat_logs c LEFT JOIN user_profiles p USING (profile_hash) "
+            f"WHERE c.created_at < ?{skip} ORDER BY c.created_at, c.id LIMIT ?",
+            (cutoff, *sorted(broken), self.batch_size),
+        ).fetchall()
+        if not rows:
+            return 0, 0
+
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for r in rows:
+            by_day.setdefault(r["created_at"][:10], []).append(_archive_record(r))
+
+        written: List[Tuple[str, str, List[Dict[str, Any]], int]] = []
+        for day, records in by_day.items():
+            try:
+                name, size = self._append_partition(conn, day, records)
+            except ArchiveTruncated as e:
+                # 이어 쓰면 앞부분이 깨진 파일이 되므로 이 날은 건너뛰고 사람이 확인
+                broken.add(day)
+                self.partitions_broken += 1
+                self.last_error = f"ArchiveTruncated: {e}"
+                print(f"[retention] {day} 파티션 건너뜀: {e}")
+                continue
+            written.append((day, name, records, size))
+        if not written:
+            return len(rows), 0
+
+        now = time.time()
+        with conn:
+            for day, name, records, size in written:
+                ids = [r["id"] for r in records]
+                conn.execute(
+                    """
+                    INSERT INTO chat_log_archives
+                        (day, file, rows, committed_bytes, min_id, max_id, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(day) DO UPDATE SET
+                        rows = rows + excluded.rows,
+                        committed_bytes = excluded.committed_bytes,
+                        min_id = MIN(min_id, excluded.min_id),
+                        max_id = MAX(max_id, excluded.max_id),
+                        updated_at = excluded.updated_at
+                    """,
+                    (day, name, len(records), size, min(ids), max(ids), now),
+                )
+            conn.executemany(
+                "DELETE FROM chat_logs WHERE id = ?",
+                [(r["id"],) for _, _, records, _ in written for r in records],
+            )
+        return len(rows), sum(len(records) for _, _, records, _ in written)
+
+    def _prune_profiles(self, conn: sqlite3.Connection, cutoff: str) -> int:
+        """보관된 로그만 참조하던 프로필 삭제 (보관 파일에는 프로필이 들어 있음)."""
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM user_profiles WHERE last_seen_at < ? "
+                "AND profile_hash NOT IN "
+                "(SELECT profile_hash FROM chat_logs WHERE profile_hash IS NOT NULL)",
+                (cutoff,),
+            )
+        return cur.rowcount
+
+    def _compact_legacy(self, conn: sqlite3.Connection) -> int:
+        """meta_json 에 user_profile 을 통째로 들고 있는 예전 행을 분리 저장 형식으로."""
+        if self._legacy_done:
+            return 0
+        rows = conn.execute(
+            "SELECT id, created_at, json_extract(meta_json, '$.user_profile') AS prof "
+            "FROM chat_logs WHERE profile_hash IS NULL "
+            # 깨진 JSON 이 한 행이라도 있으면 json_type 이 쿼리 전체를 실패시킴
+            "AND json_valid(meta_json) "
+            "AND json_type(meta_json, '$.user_profile') = 'object' LIMIT ?",
+            (self.batch_size,),
+        ).fetchall()
+        if len(rows) < self.batch_size:
+            self._legacy_done = True
+        if not rows:
+            return 0
+        profiles: Dict[str, Tuple[str, str, str, str]] = {}
+        updates: List[Tuple[str, int]] = []
+        for r in rows:
+            p_hash, p_json = profile_hash(json.loads(r["prof"]))
+            prev = profiles.get(p_hash)
+            first = min(prev[2], r["created_at"]) if prev else r["created_at"]
+            seen = max(prev[3], r["created_at"]) if prev else r["created_at"]
+            profiles[p_hash] = (p_hash, p_json, first, seen)
+            updates.append((p_hash, r["id"]))
+        with conn:
+            conn.executemany(PROFILE_UPSERT_SQL, list(profiles.values()))
+            conn.executemany(
+                "UPDATE chat_logs SET profile_hash = ?, "
+                "meta_json = json_remove(meta_json, '$.user_profile') WHERE id = ?",
+                updates,
+            )
+        return len(updates)
+
+    def _maintain(self, conn: sqlite3.Connection, changed: bool) -> bool:
+        """통계 갱신 + 필요하면 VACUUM. VACUUM 했으면 True."""
+        if changed:
+            # 많이 지웠으면 쿼리 플래너 통계가 틀어지므로 다시 계산
+            conn.execute("ANALYZE")
+        else:
+            conn.execute("PRAGMA optimize")
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free_mb = free * page_size / (1024 * 1024)
+        if (
+            page_count
+            and free / page_count >= CHAT_LOG_VACUUM_FREE_RATIO
+            and free_mb >= CHAT_LOG_VACUUM_MIN_MB
+        ):
+            started = time.perf_counter()
+            conn.execute("VACUUM")
+            # VACUUM 이 WAL 에 쓴 내용을 본 파일로 옮기고 WAL 도 비움
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            print(
+                f"[retention] VACUUM: 빈 공간 {free_mb:.1f}MB 회수 "
+                f"({time.perf_counter() - started:.1f}s)"
+            )
+            return True
+        return False
+
+    def run_once(self) -> Dict[str, Any]:
+        """한 번 실행 (다른 스레드 / 프로세스가 실행 중이면 건너뜀). 결과를 반환."""
+        summary: Dict[str, Any] = {
+            "skipped": False,
+            "archived": 0,
+            "compacted": 0,
+            "profiles_pruned": 0,
+            "vacuumed": False,
+        }
+        if not self._run_lock.acquire(blocking=False):
+            summary["skipped"] = True
+            return summary
+        try:
+            init_db()
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            with _FileLock(self.archive_dir / ".lock") as lock:
+                if not lock.acquired:
+                    self.skipped += 1
+                    summary["skipped"] = True
+                    return summary
+                self._run_locked(summary)
+        finally:
+            self._run_lock.release()
+
+        self.archived += summary["archived"]
+        self.compacted += summary["compacted"]
+        self.profiles_pruned += summary["profiles_pruned"]
+        for key in ("archived", "compacted", "profiles_pruned"):
+            if summary[key]:
+                CHAT_LOG_RETENTION_ROWS.labels(key).inc(summary[key])
+        if summary["archived"] or summary["compacted"] or summary["vacuumed"]:
+            print(
+                f"[retention] 보관 {summary['archived']}건, "
+                f"프로필 분리 {summary['compacted']}건, "
+                f"프로필 정리 {summary['profiles_pruned']}개 "
+                f"({self.last_seconds:.1f}s)"
+            )
+        return summary
+
+    def _run_locked(self, summary: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        conn = _connect()
+        try:
+            if self.retention_days > 0:
+                cutoff = self.cutoff()
+                broken: Set[str] = set()
+                while not self._stop.is_set():
+                    n, archived = self._archive_batch(conn, cutoff, broken)
+                    summary["archived"] += archived
+                    if n < self.batch_size:
+                        break
+                summary["profiles_pruned"] = self._prune_profiles(conn, cutoff)
+            while not self._stop.is_set():
+                n = self._compact_legacy(conn)
+                summary["compacted"] += n
+                if n < self.batch_size:
+                    break
+            changed = bool(summary["archived"] or summary["compacted"])
+            summary["vacuumed"] = self._maintain(conn, changed)
+            if summary["vacuumed"]:
+                self.vacuums += 1
+        finally:
+            conn.close()
+            self.runs += 1
+            self.last_run_at = time.time()
+            self.last_seconds = time.perf_counter() - started
+
+    def _record_error(self, e: Exception) -> None:
+        self.errors += 1
+        self.last_error = f"{type(e).__name__}: {e}"
+        print(f"[retention] 실행 실패: {self.last_error}")
+
+    # ---------- 보관 파일 조회 ----------
+    def partitions(self) -> List[Dict[str, Any]]:
+        init_db()
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                "SELECT day, file, rows, committed_bytes, min_id, max_id "
+                "FROM chat_log_archives ORDER BY day DESC"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(r) for r in rows]
+
+    def _read_partition(self, part: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        # committed_bytes 뒤는 진행 중이거나 실패한 쓰기 → 읽지 않음
+        with open(self.archive_dir / part["file"], "rb") as f:
+            data = f.read(part["committed_bytes"])
+        for line in _decompress(data, _suffix_of(part["file"])).splitlines():
+            if line:
+                yield json.loads(line)
+
+    def query(
+        self,
+        limit: int = 20,
+        user_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[int] = None,
+        meta: str = META_FULL,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        보관된 로그 조회. 인자와 반환은 database.query_chat_logs 와 같다 (최신순).
+        날짜 / id 범위가 맞지 않는 파티션은 열지 않는다.
+        """
+        keys = parse_meta_keys(meta)
+        result: List[Dict[str, Any]] = []
+        for part in self.partitions():
+            if since and part["day"] < since[:10]:
+                break
+            if until and part["day"] > until[:10]:
+                continue
+            if cursor is not None and part["min_id"] >= cursor:
+                continue
+            matched = [
+                r
+                for r in self._read_partition(part)
+                if (user_id is None or r["user_id"] == user_id)
+                and (not since or r["created_at"] >= since)
+                and (not until or r["created_at"] < until)
+                and (cursor is None or r["id"] < cursor)
+            ]
+            matched.sort(key=lambda r: r["id"], reverse=True)
+            result.extend(matched[: limit + 1 - len(result)])
+            if len(result) > limit:
+                break
+
+        next_cursor: Optional[int] = None
+        if len(result) > limit:
+            result = result[:limit]
+            next_cursor = result[-1]["id"] if result else None
+        if keys is not None:
+            for r in result:
+                r["meta"] = {k: r["meta"].get(k) for k in keys} if keys else {}
+        return result, next_cursor
+
+    # ---------- 백그라운드 ----------
+    def _run(self) -> None:
+        # 워커가 여러 개면 같은 시각에 몰리지 않도록 시작을 흩뜨림
+        delay = random.uniform(0, min(self.interval, 60.0))
+        while not self._stop.wait(delay):
+            try:
+                self.run_once()
+            except Exception as e:
+                self._record_error(e)
+            delay = self.interval * random.uniform(0.9, 1.1)
+
+    def start(self) -> None:
+        if self.interval <= 0:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="chat-log-retention", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        parts = self.partitions()
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "retention_days": self.retention_days,
+            "interval": self.interval,
+            "codec": "zstd" if zstandard is not None else "gzip",
+            "archive_dir": str(self.archive_dir),
+            "partitions": len(parts),
+            "archived_rows": sum(p["rows"] for p in parts),
+            "archived_bytes": sum(p["committed_bytes"] for p in parts),
+            "db_bytes": DB_PATH.stat().st_size if DB_PATH.exists() else 0,
+            "runs": self.runs,
+            "archived": self.archived,
+            "compacted": self.compacted,
+            "profiles_pruned": self.profiles_pruned,
+            "vacuums": self.vacuums,
+            "skipped": self.skipped,
+            "partitions_broken": self.partitions_broken,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_seconds": self.last_seconds,
+            "last_error": self.last_error,
+        }
+
+
+chat_log_retention = ChatLogRetention()
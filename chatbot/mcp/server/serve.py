@@ -0,0 +1,251 @@
+# chatbot/mcp/server/serve.py
+# -*- coding: utf-8 -*-
+"""
+운영용 pre-fork 서버.
+
+    python -m chatbot.mcp.server.serve --workers 4 --port 8000
+
+1. 부모 프로세스가 모델(mDeBERTa, sroberta, 카탈로그)을 한 번만 올리고 워밍업
+2. gc.freeze() 후 워커를 fork → 모델 가중치 메모리를 copy-on-write 로 공유
+   (워커마다 모델을 따로 올리지 않으므로 워커 수를 늘려도 RAM 이 거의 안 늘어남)
+3. 부모가 연 소켓 하나를 모든 워커가 같이 accept (uvicorn.Server.run(sockets=...))
+4. 워커마다 torch 스레드 수를 코어 수 / 워커 수로 제한 (코어 과점유 방지)
+5. 워커가 죽으면 부모가 다시 fork (모델이 이미 올라가 있어서 바로 뜸)
+
+- 부모는 torch 스레드 1개로 워밍업한다. OpenMP 스레드 풀을 부모에서 만든 뒤
+  fork 하면 자식에서 멈출 수 있기 때문 (스레드 풀은 각 워커에서 처음 만든다)
+- INFERENCE_BACKEND=onnx 이면 onnxruntime 세션 스레드가 fork 를 넘어가지 못하므로
+  부모에서 미리 올리지 않고 워커마다 로딩한다 (int8 모델이라 메모리 부담이 작음)
+- /metrics 는 PROMETHEUS_MULTIPROC_DIR (없으면 임시 디렉터리) 로 워커 합산
+- 개발용 자동 리로드는 python -m chatbot.mcp.server.server (단일 프로세스)
+"""
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+_CPUS = os.cpu_count() or 1
+# 워커 수 (기본: 코어 2개당 1개)
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(max(1, _CPUS // 2))))
+# 워커당 torch 스레드 수 (0 이면 코어 수 / 워커 수)
+SERVE_TORCH_THREADS = int(os.getenv("SERVE_TORCH_THREADS", "0"))
+# 워커가 이 시간(초) 안에 죽으면 재시작 전에 잠깐 쉼 (크래시 루프 방지)
+_MIN_WORKER_UPTIME = 5.0
+
+
+def _set_torch_threads(n: int) -> None:
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(n)
+
+
+def _prepare_env() -> Optional[str]:
+    """
+    app import 전에 설정해야 하는 환경 변수.
+    반환: 이 프로세스가 만든 Prometheus 임시 디렉터리 (종료 시 삭제)
+    """
+    # 부모에서 토크나이저 병렬 처리를 쓰고 fork 하면 경고 + 비활성화되므로 처음부터 끔
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # startup 훅에서 다시 로딩/백그라운드 워밍업을 하지 않도록 (부모에서 이미 끝남)
+    os.environ["MODEL_LOAD_MODE"] = "eager"
+
+    created = None
+    prom_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not prom_dir:
+        prom_dir = created = tempfile.mkdtemp(prefix="ops-prom-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = prom_dir
+    else:
+        # 이전 실행에서 남은 값 파일은 지워야 합산이 맞음
+        os.makedirs(prom_dir, exist_ok=True)
+        for name in os.listdir(prom_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(prom_dir, name))
+    return created
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker_main(sock: socket.socket, torch_threads: int, worker_id: int) -> int:
+    """fork 된 자식 프로세스: torch 스레드 설정 후 공유 소켓으로 uvicorn 실행."""
+    import uvicorn
+
+    from .server import app
+
+    gc.enable()
+    _set_torch_threads(torch_threads)
+    print(f"[serve] worker {worker_id} pid={os.getpid()} torch_threads={torch_threads}")
+
+    config = uvicorn.Config(app, log_level="info", access_log=False)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    return 0
+
+
+class PreforkSupervisor:
+    def __init__(self, sock: socket.socket, workers: int, torch_threads: int) -> None:
+        self.sock = sock
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.children: Dict[int, int] = {}  # pid → worker id
+        self.started_at: Dict[int, float] = {}
+        self.stopping = False
+        self.restarts = 0
+
+    def spawn(self, worker_id: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # 부모의 시그널 핸들러(워커 종료 전달)를 물려받지 않도록 바로 초기화
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 1
+            try:
+                code = _worker_main(self.sock, self.torch_threads, worker_id)
+            except BaseException as e:
+                print(f"[serve] worker {worker_id} 종료 (에러): {e}")
+            finally:
+                # 부모의 atexit 핸들러 / 정리 코드를 자식에서 다시 실행하지 않음
+                os._exit(code)
+        self.children[pid] = worker_id
+        self.started_at[pid] = time.monotonic()
+        return pid
+
+    def _on_signal(self, signum: int, frame: object) -> None:
+        if self.stopping:
+            return
+        print(f"[serve] signal {signum} → 워커 종료")
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            worker_id = self.children.pop(pid, None)
+            started = self.started_at.pop(pid, time.monotonic())
+            if worker_id is None:
+                continue
+            _mark_process_dead(pid)
+            if self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            print(f"[serve] worker {worker_id} (pid={pid}) 종료 code={code} → 재시작")
+            if time.monotonic() - started < _MIN_WORKER_UPTIME:
+                time.sleep(1.0)
+            self.restarts += 1
+            self.spawn(worker_id)
+        return 0
+
+
+def _mark_process_dead(pid: int) -> None:
+    try:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
+    except Exception:
+        pass
+
+
+def preload() -> None:
+    """부모 프로세스에서 DB 스키마 준비 + 모델 로딩 / 워밍업 (실패하면 워커를 띄우지 않음)."""
+    from . import database
+    from .model import INFERENCE_BACKEND, readiness, warmup_models
+    from .spotify_cache import spotify_cache
+
+    # 워커들이 동시에 첫 요청을 받으면서 마이그레이션 / CREATE TABLE 을 경쟁하지 않도록
+    # 백엔드와 상관없이 fork 전에 한 번 (부모의 연결은 닫거나 자식에서 버림)
+    database.init_db()
+    spotify_cache.init_db()
+
+    if INFERENCE_BACKEND == "onnx":
+        print("[serve] INFERENCE_BACKEND=onnx → 워커마다 모델 로딩")
+        return
+    _set_torch_threads(1)
+    warmup_models()
+    status = readiness()
+    if not status["ready"]:
+        raise RuntimeError(f"모델 워밍업 실패: {status['warmup'].get('error')}")
+
+
+def serve(
+    host: str = SERVE_HOST,
+    port: int = SERVE_PORT,
+    workers: int = SERVE_WORKERS,
+    torch_threads: int = SERVE_TORCH_THREADS,
+) -> int:
+    if not hasattr(os, "fork"):
+        raise RuntimeError(
+            "pre-fork 서버는 fork 를 지원하는 OS(Linux/macOS)에서만 동작"
+        )
+    workers = max(1, workers)
+    if torch_threads <= 0:
+        torch_threads = max(1, _CPUS // workers)
+
+    created_prom_dir = _prepare_env()
+    # 부모가 만든 객체는 워커에서 GC 가 건드리지 않도록 (copy-on-write 유지)
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        preload()
+        print(f"[serve] 부모 프로세스 준비 완료 ({time.perf_counter() - started:.1f}s)")
+
+        sock = _bind(host, port)
+        print(
+            f"[serve] http://{host}:{port} workers={workers} "
+            f"torch_threads/worker={torch_threads} (cpus={_CPUS})"
+        )
+        gc.collect()
+        gc.freeze()
+        return PreforkSupervisor(sock, workers, torch_threads).run()
+    finally:
+        if created_prom_dir:
+            shutil.rmtree(created_prom_dir, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="pre-fork 모델 서버 (운영용)")
+    p.add_argument("--host", default=SERVE_HOST)
+    p.add_argument("--port", type=int, default=SERVE_PORT)
+    p.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    p.add_argument(
+        "--torch-threads",
+        type=int,
+        default=SERVE_TORCH_THREADS,
+        help="워커당 torch 스레드 수 (0 이면 코어 수 / 워커 수)",
+    )
+    args = p.parse_args(argv)
+    return serve(args.host, args.port, args.workers, args.torch_threads)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,60 @@
 # chatbot/mcp/server/server.py
 # -*- coding: utf-8 -*-
-from .user_profile import load_user_profile
-from typing import Any, Dict, List, Optional
-
-from fastapi import FastAPI
+import hmac
+import json
+import os
+import time
+from .user_profile import invalidate_user_profile, load_user_profile, profile_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-
+from pydantic import BaseModel, Field
+
+from .async_pipeline import (
+    aclose_clients,
+    analysis_flight_async,
+    async_spotify_client,
+    analyze_text_async,
+    analyze_texts_async,
+    iter_analyze_texts_async,
+    iter_recommend_links_async,
+    recommend_with_links_async,
+    spotify_search_flight_async,
+)
 from .model import (
-    analyze_text_logic,
-    recommend_songs_via_openai_logic,
-    attach_spotify_links_logic,
+    ANALYZE_BATCH_MAX_TEXTS,
+    ANALYZE_BATCH_STREAM_THRESHOLD,
+    AnalysisResult,
+    analysis_cache,
+    analysis_flight,
+    recommendation_cache,
+    spotify_client,
+    spotify_refresher,
+    spotify_search_flight,
+    track_catalog,
+    zsc_batcher,
+    MODEL_LOAD_MODE,
+    readiness,
+    start_background_warmup,
+    warmup_models,
+)
+from .database import chat_log_writer, init_db, save_chat_log, query_chat_logs
+from .spotify_cache import spotify_cache
+from .spotify_client import spotify_rate_limiter
+from .spotify_refresh import SPOTIFY_REFRESH_ENABLED
+from .retention import CHAT_LOG_RETENTION_ENABLED, chat_log_retention
+from .situation import situation_classifier
+from .llm_usage import begin_request as begin_llm_usage, llm_stats, summarize
+from .metrics import (
+    METRICS_SERVER_TIMING,
+    REQUEST_SECONDS,
+    begin_timings,
+    render_latest,
+    server_timing_header,
 )
-from .database import save_chat_log, get_recent_chat_logs
 
 
 # =========================
@@ -35,6 +77,18 @@ class AnalyzeResponse(BaseModel):
     raw_text: str
 
 
+class AnalyzeBatchRequest(BaseModel):
+    texts: List[str]
+    # 한 번의 forward 로 묶을 텍스트 수 (없으면 ANALYZE_BATCH_SIZE)
+    batch_size: Optional[int] = Field(None, ge=1, le=256)
+    # None 이면 텍스트 수가 ANALYZE_BATCH_STREAM_THRESHOLD 를 넘을 때만 스트리밍
+    stream: Optional[bool] = None
+
+
+class AnalyzeBatchResponse(BaseModel):
+    results: List[AnalyzeResponse]
+
+
 class RecommendRequest(BaseModel):
     analysis_json: str
     user_id: Optional[str] = None
@@ -49,6 +103,7 @@ class Song(BaseModel):
     track_id: Optional[str] = None
     uri: Optional[str] = None
     embed_url: Optional[str] = None
+    mood_tags: List[str] = []
 
 
 class RecommendResponse(BaseModel):
@@ -79,6 +134,29 @@ class ChatLog(BaseModel):
     created_at: str
 
 
+# =========================
+# 관리용 엔드포인트 인증
+# =========================
+# 캐시 삭제 / 보관 실행 / 카탈로그 재생성 / Spotify 갱신 같은 관리용 요청은
+# X-Admin-Token 헤더가 이 값과 같을 때만 받는다. 비워 두면 관리용 엔드포인트는 꺼짐 (403)
+CHATBOT_ADMIN_TOKEN = os.getenv("CHATBOT_ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not CHATBOT_ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="관리용 엔드포인트가 꺼져 있음 (CHATBOT_ADMIN_TOKEN 미설정)",
+        )
+    if not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode("utf-8"), CHATBOT_ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="잘못된 관리자 토큰")
+
+
+_admin = [Depends(require_admin)]
+
+
 # =========================
 # FastAPI 앱 정의
 # =========================
@@ -90,19 +168,83 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
 
+@app.middleware("http")
+async def stage_timing_middleware(request: Request, call_next: Any) -> Response:
+    """
+    요청마다 단계별 시간 기록을 시작하고, 끝나면 요청 시간 히스토그램에 기록.
+    METRICS_SERVER_TIMING=1 이면 단계별 합계를 Server-Timing 헤더로 붙인다.
+    """
+    timings = begin_timings()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    # 라벨 개수가 늘어나지 않도록 실제 경로 대신 라우트 템플릿 사용
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    if path != "/metrics":
+        REQUEST_SECONDS.labels(path, request.method, str(response.status_code)).observe(
+            elapsed
+        )
+    if METRICS_SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
+
+@app.on_event("startup")
+def on_startup() -> None:
+    init_db()
+    if MODEL_LOAD_MODE == "eager":
+        warmup_models()
+    elif MODEL_LOAD_MODE == "background":
+        # 포트는 바로 열고, 모델 로딩 + 워밍업은 백그라운드에서
+        start_background_warmup()
+    if SPOTIFY_REFRESH_ENABLED:
+        # track_id 를 아는 곡의 링크 / 미리듣기 주기적 갱신
+        spotify_refresher.start()
+    if CHAT_LOG_RETENTION_ENABLED:
+        # 오래된 채팅 로그 보관 파일로 이동 + VACUUM/ANALYZE
+        chat_log_retention.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await run_in_threadpool(spotify_refresher.stop)
+    await run_in_threadpool(chat_log_retention.stop)
+    await aclose_clients()
+    # 큐에 남은 채팅 로그 저장
+    await run_in_threadpool(chat_log_writer.stop)
+
+
 @app.get("/health")
 def health_check() -> Dict[str, str]:
+    """프로세스 생존 여부 (liveness). 모델 준비 여부는 /ready 참고"""
     return {"status": "ok"}
 
 
-@app.post("/analyze", response_model=AnalyzeResponse)
-def analyze_endpoint(req: AnalyzeRequest) -> AnalyzeResponse:
-    mood_dict, kw_spans, analysis_json, keywords_csv, raw_text = analyze_text_logic(
-        req.text
-    )
+@app.get("/metrics")
+def metrics_endpoint() -> Response:
+    """Prometheus 지표 (단계별 지연 시간, Spotify 매칭 결과, LLM 토큰 등)"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/ready")
+def ready_check() -> JSONResponse:
+    """
+    모델별 로딩 상태 + 워밍업 시간 (readiness).
+    아직 요청을 빠르게 처리할 수 없으면 503
+    """
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+def _to_analyze_response(result: AnalysisResult) -> AnalyzeResponse:
+    mood_dict, kw_spans, analysis_json, keywords_csv, raw_text = result
     keywords = [KeywordSpan(text=k, label=label) for (k, label) in kw_spans]
     return AnalyzeResponse(
         mood=mood_dict,
@@ -113,16 +255,58 @@ def analyze_endpoint(req: AnalyzeRequest) -> AnalyzeResponse:
     )
 
 
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_endpoint(req: AnalyzeRequest) -> AnalyzeResponse:
+    return _to_analyze_response(await analyze_text_async(req.text))
+
+
+@app.post("/analyze/batch", response_model=AnalyzeBatchResponse)
+async def analyze_batch_endpoint(req: AnalyzeBatchRequest) -> Any:
+    """
+    여러 텍스트를 배치 추론으로 분석 (오프라인 재처리 / 백필용).
+    결과는 입력 순서대로 반환한다.
+    - stream=true (또는 텍스트 수가 ANALYZE_BATCH_STREAM_THRESHOLD 초과):
+      application/x-ndjson 으로 한 줄에 {"index": i, ...AnalyzeResponse} 씩,
+      배치 하나가 끝날 때마다 내보낸다
+    """
+    if len(req.texts) > ANALYZE_BATCH_MAX_TEXTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"texts 는 최대 {ANALYZE_BATCH_MAX_TEXTS}개까지 가능합니다.",
+        )
+    stream = req.stream
+    if stream is None:
+        stream = len(req.texts) > ANALYZE_BATCH_STREAM_THRESHOLD
+    if not stream:
+        results = await analyze_texts_async(req.texts, req.batch_size)
+        return AnalyzeBatchResponse(results=[_to_analyze_response(r) for r in results])
+
+    async def ndjson_stream() -> AsyncIterator[str]:
+        try:
+            async for idx, result in iter_analyze_texts_async(
+                req.texts, req.batch_size
+            ):
+                line = {"index": idx, **_to_analyze_response(result).model_dump()}
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # 이미 200 을 보낸 뒤라 마지막 줄로 오류를 알림
+            print("[analyze/batch] 에러:", e)
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
 @app.post("/recommend", response_model=RecommendResponse)
-def recommend_endpoint(req: RecommendRequest) -> RecommendResponse:
+async def recommend_endpoint(req: RecommendRequest) -> RecommendResponse:
     user_profile = None
     if req.user_id:
-        user_profile = load_user_profile(req.user_id)
+        user_profile = await run_in_threadpool(load_user_profile, req.user_id)
 
-    songs = recommend_songs_via_openai_logic(
-        req.analysis_json, user_profile=user_profile
+    llm_calls = begin_llm_usage()
+    songs_with_links = await recommend_with_links_async(
+        req.analysis_json, user_profile=user_profile, min_valid=8
     )
-    songs_with_links = attach_spotify_links_logic(songs, min_valid=8)
+    llm_stats.record_request(llm_calls, len(songs_with_links))
     return RecommendResponse(
         songs=[
             Song(
@@ -134,14 +318,95 @@ def recommend_endpoint(req: RecommendRequest) -> RecommendResponse:
                 track_id=s.get("track_id", ""),
                 uri=s.get("uri", ""),
                 embed_url=s.get("embed_url", ""),
+                mood_tags=s.get("mood_tags") or [],
             )
             for s in songs_with_links
         ]
     )
 
 
+EMPTY_MESSAGE_REPLY = "메시지가 비어 있어요. 지금 기분이나 상황을 한 번 적어줄래요?"
+NO_SONGS_REPLY = (
+    "지금은 잘 맞는 곡을 찾지 못했어요. "
+    "조금만 더 자세히 마음이나 상황을 써주면 더 잘 찾아볼게요 ."
+)
+
+
+def _last_user_text(messages: List[ChatMessage]) -> str:
+    user_text = ""
+    for m in reversed(messages):
+        if m.role == "user":
+            user_text = m.content
+            break
+    return (user_text or "").strip()
+
+
+def _to_song_model(s: Dict[str, Any]) -> Song:
+    return Song(
+        title=s.get("title", ""),
+        artist=s.get("artist", ""),
+        reason=s.get("reason", ""),
+        link=s.get("link", ""),
+        preview_url=s.get("preview_url", ""),
+        track_id=s.get("track_id", ""),
+        uri=s.get("uri", ""),
+        embed_url=s.get("embed_url", ""),
+        mood_tags=s.get("mood_tags") or [],
+    )
+
+
+def _build_chat_reply(songs_with_links: List[Dict[str, Any]]) -> str:
+    if not songs_with_links:
+        return NO_SONGS_REPLY
+
+    lines: List[str] = []
+
+    lines.append("지금 상황에 어울리는 곡들을 몇 곡 골라봤어요:\n")
+
+    for s in songs_with_links[:5]:
+        title = s.get("title", "")
+        artist = s.get("artist", "")
+        reason = s.get("reason", "")
+        lines.append(f"- {title} - {artist}: {reason}")
+
+    return "\n".join(lines)
+
+
+def _save_chat(
+    user_text: str,
+    reply_text: str,
+    user_id: Optional[str],
+    mood_dict: Dict[str, float],
+    keywords_csv: str,
+    situation: Optional[str],
+    songs_with_links: List[Dict[str, Any]],
+    user_profile: Optional[Dict[str, Any]],
+    llm_calls: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    meta: Dict[str, Any] = {
+        "mood": mood_dict,
+        "keywords_csv": keywords_csv,
+        "situation": situation,
+    }
+    if songs_with_links:
+        meta["songs"] = songs_with_links
+    meta["user_profile"] = user_profile
+    # 추천 LLM 호출의 토큰/지연 시간 (LLM 을 안 불렀으면 생략)
+    llm = summarize(llm_calls or [])
+    if llm is not None:
+        meta["llm"] = llm
+    llm_stats.record_request(llm_calls or [], len(songs_with_links))
+
+    save_chat_log(
+        user_text=user_text,
+        reply=reply_text,
+        user_id=user_id,
+        meta=meta,
+    )
+
+
 @app.post("/chat", response_model=ChatResponse)
-def chat_endpoint(req: ChatRequest) -> ChatResponse:
+async def chat_endpoint(req: ChatRequest) -> ChatResponse:
     print("🔥 /chat user_id =", req.user_id)
     """
     React TextChat에서 사용하기 좋은 통합 채팅 엔드포인트.
@@ -149,17 +414,9 @@ def chat_endpoint(req: ChatRequest) -> ChatResponse:
     - 마지막 user 메시지를 기준으로 분석 + 추천을 수행,
       요약된 한국어 답변 문자열만 반환한다.
     """
-    user_text = ""
-    for m in reversed(req.messages):
-        if m.role == "user":
-            user_text = m.content
-            break
-
-    user_text = (user_text or "").strip()
+    user_text = _last_user_text(req.messages)
     if not user_text:
-        return ChatResponse(
-            reply="메시지가 비어 있어요. 지금 기분이나 상황을 한 번 적어줄래요?"
-        )
+        return ChatResponse(reply=EMPTY_MESSAGE_REPLY)
     # 0) user_id를 정수로 변환 (설문 DB의 users.user_id 기준)  # [추가]
     """numeric_user_id: Optional[int] = None  
     if req.user_id:  
@@ -169,94 +426,389 @@ def chat_endpoint(req: ChatRequest) -> ChatResponse:
             numeric_user_id = None   """
 
     # 1) 감정/키워드 분석
-    mood_dict, kw_spans, analysis_json, keywords_csv, raw_text = analyze_text_logic(
-        user_text
+    mood_dict, kw_spans, analysis_json, keywords_csv, raw_text = (
+        await analyze_text_async(user_text)
     )
 
     # 1-1) 설문 기반 user_profile 로드 (있으면)  # [추가]
     user_profile = None
     if req.user_id:
         # req.user_id 는 Spotify user id 문자열
-        user_profile = load_user_profile(req.user_id)
+        user_profile = await run_in_threadpool(load_user_profile, req.user_id)
     print("🔥 loaded user_profile =", user_profile)
-    # 2) 추천 + Spotify 링크
-    songs = recommend_songs_via_openai_logic(
+    # 2) 추천 + Spotify 링크 (LLM 스트림에서 곡이 나오는 대로 바로 검색)
+    llm_calls = begin_llm_usage()
+    songs_with_links = await recommend_with_links_async(
         analysis_json,
         user_profile=user_profile,
+        min_valid=4,
     )
-    songs_with_links = attach_spotify_links_logic(songs, min_valid=4)
 
-    if not songs_with_links:
-        reply_text = (
-            "지금은 잘 맞는 곡을 찾지 못했어요. "
-            "조금만 더 자세히 마음이나 상황을 써주면 더 잘 찾아볼게요 ."
+    reply_text = _build_chat_reply(songs_with_links)
+
+    # DB에 로그 저장
+    await run_in_threadpool(
+        _save_chat,
+        user_text,
+        reply_text,
+        req.user_id,
+        mood_dict,
+        keywords_csv,
+        json.loads(analysis_json).get("situation"),
+        songs_with_links,
+        user_profile,
+        llm_calls,
+    )
+
+    return ChatResponse(
+        reply=reply_text, songs=[_to_song_model(s) for s in songs_with_links]
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest) -> StreamingResponse:
+    """
+    /chat 의 Server-Sent Events 버전. 단계별로 이벤트를 보낸다.
+    - analysis: 감정/키워드 분석 결과 (가장 먼저)
+    - song: Spotify 매칭이 확인된 곡 (확인되는 즉시, index = LLM 추천 순서)
+    - reply: 최종 답변 문자열 + 곡 목록 (/chat 응답과 동일한 형태)
+    - error: 처리 중 오류
+    스트림이 끝나면(클라이언트가 끊은 경우 포함) 채팅 로그를 저장한다.
+    """
+    user_text = _last_user_text(req.messages)
+
+    async def event_stream() -> AsyncIterator[str]:
+        if not user_text:
+            yield _sse("reply", {"reply": EMPTY_MESSAGE_REPLY, "songs": []})
+            return
+
+        mood_dict: Dict[str, float] = {}
+        keywords_csv = ""
+        situation: Optional[str] = None
+        user_profile: Optional[Dict[str, Any]] = None
+        resolved: List[Tuple[int, Dict[str, Any]]] = []
+        llm_calls = begin_llm_usage()
+        reply_text = ""
+        analyzed = False
+        try:
+            mood_dict, kw_spans, analysis_json, keywords_csv, _ = (
+                await analyze_text_async(user_text)
+            )
+            analyzed = True
+            situation = json.loads(analysis_json).get("situation")
+            yield _sse(
+                "analysis",
+                {
+                    "mood": mood_dict,
+                    "keywords": [{"text": k, "label": lb} for k, lb in kw_spans],
+                    "keywords_csv": keywords_csv,
+                },
+            )
+
+            if req.user_id:
+                user_profile = await run_in_threadpool(load_user_profile, req.user_id)
+
+            async for idx, song in iter_recommend_links_async(
+                analysis_json, user_profile=user_profile, min_valid=4
+            ):
+                resolved.append((idx, song))
+                yield _sse("song", {"index": idx, **_to_song_model(song).model_dump()})
+
+            songs_with_links = [s for _, s in sorted(resolved, key=lambda x: x[0])]
+            reply_text = _build_chat_reply(songs_with_links)
+            yield _sse(
+                "reply",
+                {
+                    "reply": reply_text,
+                    "songs": [_to_song_model(s).model_dump() for s in songs_with_links],
+                },
+            )
+        except Exception as e:
+            print("[chat/stream] 에러:", e)
+            yield _sse("error", {"message": str(e)})
+        finally:
+            if analyzed:
+                songs_with_links = [s for _, s in sorted(resolved, key=lambda x: x[0])]
+                # 클라이언트가 끊으면 이 generator 가 취소되므로 여기서 await 하면
+                # 저장까지 같이 취소된다 → 동기 호출 (write-behind 큐에 넣기만 함)
+                _save_chat(
+                    user_text,
+                    reply_text or _build_chat_reply(songs_with_links),
+                    req.user_id,
+                    mood_dict,
+                    keywords_csv,
+                    situation,
+                    songs_with_links,
+                    user_profile,
+                    llm_calls,
+                )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/logs", response_model=List[ChatLog])
+def recent_logs(
+    response: Response,
+    limit: int = Query(20, ge=1, le=1000),
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[int] = None,
+    meta: str = "full",
+) -> List[ChatLog]:
+    """
+    최근 채팅 로그 반환 (모니터링/대시보드용)
+    - user_id: 특정 유저 로그만
+    - since / until: created_at 범위 (ISO 문자열, until 은 미포함)
+    - cursor: 이전 응답의 X-Next-Cursor 헤더 값 (다음 페이지)
+    - meta: full(기본) / none / "mood,songs" 처럼 필요한 키만
+    """
+    try:
+        rows, next_cursor = query_chat_logs(
+            limit=limit,
+            user_id=user_id,
+            since=since,
+            until=until,
+            cursor=cursor,
+            meta=meta,
         )
-        save_chat_log(
-            user_text=user_text,
-            reply=reply_text,
-            user_id=req.user_id,
-            meta={
-                "mood": mood_dict,
-                "keywords_csv": keywords_csv,
-                "user_profile": user_profile,
-            },
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return [ChatLog(**r) for r in rows]
+
+
+@app.get("/logs/archive", response_model=List[ChatLog])
+def archived_logs(
+    response: Response,
+    limit: int = Query(20, ge=1, le=1000),
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[int] = None,
+    meta: str = "full",
+) -> List[ChatLog]:
+    """
+    보관 파일로 옮겨진 채팅 로그 조회 (인자 / X-Next-Cursor 는 /logs 와 같음)
+    - 하루 단위 파티션을 통째로 풀어서 읽으므로 since / until 로 범위를 좁히는 게 좋음
+    """
+    try:
+        rows, next_cursor = chat_log_retention.query(
+            limit=limit,
+            user_id=user_id,
+            since=since,
+            until=until,
+            cursor=cursor,
+            meta=meta,
         )
-        return ChatResponse(reply=reply_text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return [ChatLog(**r) for r in rows]
 
-    moods_str = ", ".join(f"{k}({v:.2f})" for k, v in mood_dict.items())
-    lines: List[str] = []
 
-    lines.append("지금 상황에 어울리는 곡들을 몇 곡 골라봤어요:\n")
+@app.get("/cache/spotify")
+def spotify_cache_stats() -> Dict[str, Any]:
+    """
+    Spotify 검색 캐시 통계 (적중률, 항목 수 등) — 캐시 크기 산정용
+    """
+    return spotify_cache.stats()
 
-    for s in songs_with_links[:5]:
-        title = s.get("title", "")
-        artist = s.get("artist", "")
-        reason = s.get("reason", "")
-        lines.append(f"- {title} - {artist}: {reason}")
 
-    reply_text = "\n".join(lines)
+@app.delete("/cache/spotify", dependencies=_admin)
+def spotify_cache_clear() -> Dict[str, int]:
+    return {"removed": spotify_cache.clear()}
 
-    # DB에 로그 저장
-    songs_models = [
-        Song(
-            title=s.get("title", ""),
-            artist=s.get("artist", ""),
-            reason=s.get("reason", ""),
-            link=s.get("link", ""),
-            preview_url=s.get("preview_url", ""),
-            track_id=s.get("track_id", ""),
-            uri=s.get("uri", ""),
-            embed_url=s.get("embed_url", ""),
+
+@app.get("/cache/analysis")
+def analysis_cache_stats(entries: int = 0) -> Dict[str, Any]:
+    """
+    분석 결과 캐시 통계. entries > 0 이면 최근 항목 메타 정보도 함께 반환
+    """
+    result = analysis_cache.stats()
+    if entries > 0:
+        result["entries"] = analysis_cache.snapshot(limit=entries)
+    return result
+
+
+@app.delete("/cache/analysis", dependencies=_admin)
+def analysis_cache_clear() -> Dict[str, int]:
+    return {"removed": analysis_cache.clear()}
+
+
+@app.get("/cache/recommend")
+def recommend_cache_stats() -> Dict[str, Any]:
+    """
+    추천 결과 캐시 통계 (정확 적중 / 유사도 적중 / 미스)
+    """
+    return recommendation_cache.stats()
+
+
+@app.delete("/cache/recommend", dependencies=_admin)
+def recommend_cache_clear() -> Dict[str, int]:
+    return {"removed": recommendation_cache.clear()}
+
+
+@app.get("/catalog")
+def catalog_stats() -> Dict[str, Any]:
+    """
+    로컬 트랙 카탈로그 상태 (곡 수, 생성 시각, 카탈로그 추천 건수)
+    """
+    return track_catalog.stats()
+
+
+@app.post("/catalog/rebuild", dependencies=_admin)
+async def catalog_rebuild() -> Dict[str, Any]:
+    """
+    채팅 로그에서 카탈로그를 다시 만든다 (임베딩 계산 포함)
+    """
+    return await run_in_threadpool(track_catalog.rebuild)
+
+
+@app.get("/situation/rules")
+def situation_rules_stats(text: Optional[str] = None) -> Dict[str, Any]:
+    """
+    상황 분류 규칙 상태 (키워드 수, 파일 해시, 마지막 로딩 시각/오류).
+    text 를 주면 그 문장의 상황별 점수와 분류 결과도 함께 반환
+    """
+    result = situation_classifier.stats()
+    if text is not None:
+        result["scores"] = situation_classifier.scores(text)
+        result["situation"] = situation_classifier.classify(text)
+    return result
+
+
+@app.post("/situation/rules/reload")
+def situation_rules_reload() -> Dict[str, Any]:
+    """
+    규칙 파일을 즉시 다시 읽는다 (자동 재로딩 주기를 기다리지 않음).
+    파일이 잘못됐으면 400 + 기존 규칙 유지
+    """
+    try:
+        return situation_classifier.reload()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"{type(e).__name__}: {e}")
+
+
+@app.get("/cache/profile")
+def profile_cache_stats() -> Dict[str, Any]:
+    return profile_cache.stats()
+
+
+@app.delete("/cache/profile", dependencies=_admin)
+def profile_cache_clear() -> Dict[str, int]:
+    return {"removed": invalidate_user_profile()}
+
+
+@app.delete("/cache/profile/{user_id}", dependencies=_admin)
+def profile_cache_invalidate(user_id: str) -> Dict[str, int]:
+    """
+    유저 프로필 캐시 무효화 (백엔드가 설문 제출 직후 X-Admin-Token 을 붙여 호출)
+    """
+    return {"removed": invalidate_user_profile(user_id)}
+
+
+@app.get("/stats/chat-log")
+def chat_log_writer_stats() -> Dict[str, Any]:
+    """
+    채팅 로그 write-behind 저장 통계 (대기/저장/버림 건수)
+    """
+    return chat_log_writer.stats()
+
+
+@app.get("/stats/retention")
+def chat_log_retention_stats() -> Dict[str, Any]:
+    """
+    채팅 로그 보관 / 정리 통계 (보관 파티션 수, 보관된 행 / 바이트, DB 크기)
+    """
+    return chat_log_retention.stats()
+
+
+@app.post("/logs/retention/run", dependencies=_admin)
+def chat_log_retention_run() -> Dict[str, Any]:
+    """보관 / 정리를 지금 한 번 실행 (다른 프로세스가 실행 중이면 skipped)"""
+    if not CHAT_LOG_RETENTION_ENABLED:
+        # 로그를 DB 에서 지우는 작업이므로 보관을 켜지 않은 배포에서는 실행하지 않음
+        raise HTTPException(
+            status_code=409, detail="CHAT_LOG_RETENTION_ENABLED=1 일 때만 실행 가능"
         )
-        for s in songs_with_links
+    return chat_log_retention.run_once()
+
+
+@app.get("/stats/llm")
+def llm_usage_stats() -> Dict[str, Any]:
+    """
+    추천 LLM 토큰 사용량 / 지연 시간 누적 (성공한 곡 1개당 토큰 수 포함)
+    """
+    return llm_stats.stats()
+
+
+@app.get("/stats/zsc-batch")
+def zsc_batch_stats() -> Dict[str, Any]:
+    """
+    제로샷 감정 분류 배칭 통계 (배치 크기, 처리량, 지연 시간)
+    """
+    return zsc_batcher.stats()
+
+
+@app.get("/stats/singleflight")
+def singleflight_stats() -> Dict[str, Any]:
+    """
+    진행 중인 같은 작업 합치기 통계 (실행 수 / 합류 수 / 에러)
+    - *_async: async 엔드포인트 경로, 나머지: 스레드(동기) 경로
+    """
+    flights = [
+        analysis_flight_async,
+        analysis_flight,
+        spotify_search_flight_async,
+        spotify_search_flight,
     ]
+    return {stats["name"]: stats for stats in (f.stats() for f in flights)}
 
-    save_chat_log(
-        user_text=user_text,
-        reply=reply_text,
-        user_id=req.user_id,
-        meta={
-            "mood": mood_dict,
-            "keywords_csv": keywords_csv,
-            "songs": songs_with_links,
-            "user_profile": user_profile,
-        },
-    )
 
-    return ChatResponse(reply=reply_text, songs=songs_models)
+@app.get("/stats/spotify")
+def spotify_http_stats() -> Dict[str, Any]:
+    """
+    Spotify API 호출 통계 (429 / 재시도 / 포기 / 헤징 횟수, 토큰 버킷 상태)
+    - 클라이언트는 아직 만들어지지 않았으면 빠짐
+    """
+    clients = {
+        res.name: res.get().stats()
+        for res in (spotify_client, async_spotify_client)
+        if res.ready
+    }
+    return {"rate_limiter": spotify_rate_limiter.stats(), "clients": clients}
 
 
-@app.get("/logs", response_model=List[ChatLog])
-def recent_logs(limit: int = 20) -> List[ChatLog]:
+@app.get("/stats/spotify/refresh")
+def spotify_refresh_stats() -> Dict[str, Any]:
     """
-    최근 채팅 로그 반환 (간단한 모니터링/디버깅용)
+    메타데이터 일괄 갱신 통계 + 신선도 (오래된 곡 수, 가장 오래된 곡의 나이)
     """
-    rows = get_recent_chat_logs(limit=limit)
-    return [ChatLog(**r) for r in rows]
+    return spotify_refresher.stats()
+
+
+@app.post("/spotify/refresh", dependencies=_admin)
+def spotify_refresh_now(
+    max_tracks: Optional[int] = Query(None, ge=1, le=10000),
+) -> Dict[str, Any]:
+    """오래된 곡 메타데이터를 지금 바로 갱신 (이미 도는 중이면 끝날 때까지 대기)."""
+    return spotify_refresher.refresh_once(max_tracks)
 
 
 if __name__ == "__main__":
-    # python -m chatbot.mcp.server.server 로 실행 가능
+    # 개발용 (단일 프로세스 + 자동 리로드)
+    # 운영에서는 모델을 공유하는 pre-fork 서버 사용: python -m chatbot.mcp.server.serve
     import uvicorn
 
     uvicorn.run("chatbot.mcp.server.server:app", host="0.0.0.0", port=8000, reload=True)
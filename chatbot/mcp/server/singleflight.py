@@ -0,0 +1,227 @@
+# chatbot/mcp/server/singleflight.py
+# -*- coding: utf-8 -*-
+"""
+같은 키로 동시에 들어온 작업을 한 번만 실행하는 single-flight.
+
+인기 문장이 동시에 여러 번 들어오거나, LLM 이 같은 곡을 여러 유저에게
+동시에 추천하면 같은 분석 / 같은 Spotify 검색이 병렬로 중복 실행된다.
+캐시는 "끝난" 결과만 재사용하므로, 아직 진행 중인 작업은 여기서 합친다.
+
+- 처음 온 호출(leader)이 fn 을 실행하고, 같은 키로 그 사이에 온 호출(follower)은
+  leader 의 결과를 기다렸다가 같은 객체를 돌려받는다 (수정할 거면 복사해서 쓸 것)
+- fn 이 예외로 끝나면 기다리던 호출 모두에게 같은 예외가 전달된다
+- 작업이 끝나면 키를 바로 지운다 (결과를 오래 들고 있는 건 캐시의 역할)
+- do(..., stop_event=ev) 로 부르면 fn 의 마지막 인자로 "합친 stop" 이 넘어간다.
+  기다리는 호출 전부의 stop_event 가 set 됐을 때만 set 으로 보이므로,
+  leader 요청이 먼저 멈춰도 follower 가 필요한 재검색은 계속된다
+
+SingleFlight 는 스레드용, AsyncSingleFlight 는 이벤트 루프용.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from .metrics import SINGLEFLIGHT_CALLS
+
+T = TypeVar("T")
+
+
+class _FlightStats:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.leaders = 0
+        self.followers = 0
+        self.errors = 0
+
+    def count(self, role: str) -> None:
+        if role == "leader":
+            self.leaders += 1
+        elif role == "follower":
+            self.followers += 1
+        else:
+            self.errors += 1
+        SINGLEFLIGHT_CALLS.labels(self.name, role).inc()
+
+    def stats(self, in_flight: int) -> Dict[str, Any]:
+        calls = self.leaders + self.followers
+        return {
+            "name": self.name,
+            "calls": calls,
+            "executions": self.leaders,
+            "coalesced": self.followers,
+            "coalesced_ratio": self.followers / calls if calls else 0.0,
+            "errors": self.errors,
+            "in_flight": in_flight,
+        }
+
+
+# do() 에 stop_event 를 넘기지 않았음을 나타내는 값 (None 은 "멈추지 않음")
+_NO_STOP: Any = object()
+
+
+class _CombinedStop:
+    """
+    기다리는 호출들의 stop_event 를 합친 것 (threading / asyncio Event 모두 가능).
+    남은 호출 전부가 멈췄을 때만 is_set() 이 True. stop_event 가 None 인
+    호출이 하나라도 있으면 끝까지 멈추지 않는다.
+    """
+
+    def __init__(self) -> None:
+        self._events: List[Any] = []
+
+    def add(self, event: Any) -> None:
+        self._events.append(event)
+
+    def remove(self, event: Any) -> None:
+        self._events.remove(event)
+
+    def is_set(self) -> bool:
+        events = list(self._events)
+        return all(e is not None and e.is_set() for e in events)
+
+
+class SingleFlight(Generic[T]):
+    """스레드 간 single-flight. do(key, fn, *args) 로 호출."""
+
+    def __init__(self, name: str = "singleflight") -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, "Future[T]"] = {}
+        self._stops: Dict[Hashable, _CombinedStop] = {}
+        self._stats = _FlightStats(name)
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[..., T],
+        *args: Any,
+        stop_event: Any = _NO_STOP,
+    ) -> T:
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._calls[key] = Future()
+                self._stops[key] = _CombinedStop()
+            stop = self._stops[key]
+            if stop_event is not _NO_STOP:
+                stop.add(stop_event)
+            self._stats.count("leader" if leader else "follower")
+
+        try:
+            if not leader:
+                return fut.result()  # type: ignore[union-attr]
+            return self._run_leader(key, fut, fn, args, stop, stop_event)
+        finally:
+            if stop_event is not _NO_STOP:
+                with self._lock:
+                    stop.remove(stop_event)
+
+    def _run_leader(
+        self,
+        key: Hashable,
+        fut: "Future[T]",
+        fn: Callable[..., T],
+        args: tuple,
+        stop: _CombinedStop,
+        stop_event: Any,
+    ) -> T:
+        if stop_event is not _NO_STOP:
+            args = args + (stop,)
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            with self._lock:
+                self._stats.count("error")
+            fut.set_exception(e)  # type: ignore[union-attr]
+            raise
+        else:
+            fut.set_result(result)  # type: ignore[union-attr]
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                self._stops.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._stats.stats(len(self._calls))
+
+
+class _AsyncFlight:
+    """진행 중인 작업 하나 + 그 결과를 기다리는 호출 수."""
+
+    def __init__(self) -> None:
+        self.task: "Optional[asyncio.Task[Any]]" = None
+        self.waiters = 0
+        self.stop = _CombinedStop()
+
+
+class AsyncSingleFlight(Generic[T]):
+    """
+    이벤트 루프 안의 single-flight. await do(key, coro_fn, *args) 로 호출.
+    실제 작업은 별도 Task 로 돌리고 모든 호출자가 shield 해서 기다리므로,
+    leader 를 부른 요청이 취소돼도 기다리는 다른 요청의 작업은 계속된다.
+    기다리던 호출이 모두 취소되면 작업도 취소한다 (아무도 안 쓰는 Spotify 검색 등).
+    """
+
+    def __init__(self, name: str = "singleflight") -> None:
+        self._calls: Dict[Hashable, _AsyncFlight] = {}
+        self._stats = _FlightStats(name)
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[..., Awaitable[T]],
+        *args: Any,
+        stop_event: Any = _NO_STOP,
+    ) -> T:
+        flight = self._calls.get(key)
+        if flight is None:
+            self._stats.count("leader")
+            flight = _AsyncFlight()
+            if stop_event is not _NO_STOP:
+                args = args + (flight.stop,)
+            flight.task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _t: self._finish(key, flight))
+        else:
+            self._stats.count("follower")
+
+        task = flight.task
+        assert task is not None
+        flight.waiters += 1
+        if stop_event is not _NO_STOP:
+            flight.stop.add(stop_event)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight.waiters -= 1
+            if stop_event is not _NO_STOP:
+                flight.stop.remove(stop_event)
+            if flight.waiters == 0 and not task.done():
+                # 마지막으로 기다리던 호출까지 떠남 → 새 호출이 취소 중인 작업에
+                # 붙지 않도록 키를 먼저 지우고 취소
+                if self._calls.get(key) is flight:
+                    del self._calls[key]
+                task.cancel()
+
+    def _finish(self, key: Hashable, flight: _AsyncFlight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        task = flight.task
+        if task is not None and not task.cancelled() and task.exception() is not None:
+            self._stats.count("error")
+
+    def stats(self) -> Dict[str, Any]:
+        return self._stats.stats(len(self._calls))
@@ -0,0 +1,277 @@
+# chatbot/mcp/server/situation.py
+# -*- coding: utf-8 -*-
+"""
+상황(situation) 분류 규칙 엔진.
+
+키워드 표는 situation_rules.json (SITUATION_RULES_PATH) 에서 읽고,
+모든 키워드를 Aho-Corasick 오토마톤 하나로 컴파일해서 문장을 한 번만 훑는다.
+키워드가 수천 개로 늘어도 문장 길이에만 비례해서 시간이 든다.
+
+규칙 파일 형식:
+    {
+      "default": "general",
+      "situations": [
+        {"name": "healing", "priority": 100, "min_score": 0,
+         "keywords": ["힘들", {"pattern": "새벽", "weight": 0.5}, ...]},
+        ...
+      ]
+    }
+- 키워드 점수(weight, 기본 1.0)를 상황별로 합산한다 (같은 키워드는 한 번만)
+- 점수가 min_score 를 넘은 상황 중 priority 가 가장 높은 것을 고른다
+  (priority 가 같으면 점수가 높은 쪽)
+- 아무것도 없으면 default
+
+파일이 바뀌면 SITUATION_RULES_CHECK_SEC 마다 mtime 을 보고 자동으로 다시 읽는다
+(POST /situation/rules/reload 로 즉시 반영도 가능). 잘못된 파일이면 기존 규칙 유지.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+SITUATION_RULES_PATH = Path(
+    os.getenv(
+        "SITUATION_RULES_PATH",
+        str(Path(__file__).resolve().parent / "situation_rules.json"),
+    )
+)
+# 규칙 파일 변경 확인 주기 (초). 0 이면 자동 재로딩 안 함
+SITUATION_RULES_CHECK_SEC = float(os.getenv("SITUATION_RULES_CHECK_SEC", "5"))
+
+
+class AhoCorasick:
+    """여러 패턴을 한 번에 찾는 오토마톤 (문자 단위 trie + 실패 링크)."""
+
+    def __init__(self, patterns: List[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for pid, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            if state:
+                self._out[state] += (pid,)
+
+        # BFS 로 실패 링크 계산 (루트 바로 아래는 루트로)
+        queue = deque(self._goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, t in self._goto[s].items():
+                queue.append(t)
+                f = self._fail[s]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[t] = self._goto[f].get(ch, 0)
+                # 접미사로 끝나는 패턴도 같이 출력
+                self._out[t] += self._out[self._fail[t]]
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    def search(self, text: str) -> Set[int]:
+        """text 안에 등장하는 패턴 id 집합."""
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        found: Set[int] = set()
+        state = 0
+        for ch in text:
+            if state == 0:
+                state = root.get(ch, 0)
+            else:
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class SituationRuleSet:
+    """규칙 파일 하나를 컴파일한 결과 (읽기 전용, 통째로 교체됨)."""
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        self.default: str = config.get("default", "general")
+        situations = config.get("situations")
+        if not isinstance(situations, list) or not situations:
+            raise ValueError("situations 목록이 비어 있습니다.")
+
+        self.names: List[str] = []
+        self.priorities: List[float] = []
+        self.min_scores: List[float] = []
+        patterns: List[str] = []
+        pattern_ids: Dict[str, int] = {}
+        # 패턴 id → [(상황 index, weight), ...]
+        self._targets: List[List[Tuple[int, float]]] = []
+
+        for idx, sit in enumerate(situations):
+            name = sit.get("name")
+            if not name:
+                raise ValueError(f"situations[{idx}] 에 name 이 없습니다.")
+            if name in self.names:
+                raise ValueError(f"상황 이름 중복: {name}")
+            self.names.append(name)
+            self.priorities.append(float(sit.get("priority", 0)))
+            self.min_scores.append(float(sit.get("min_score", 0)))
+
+            for kw in sit.get("keywords") or []:
+                if isinstance(kw, str):
+                    pattern, weight = kw, 1.0
+                else:
+                    pattern, weight = kw.get("pattern", ""), float(
+                        kw.get("weight", 1.0)
+                    )
+                pattern = pattern.lower()
+                if not pattern:
+                    continue
+                pid = pattern_ids.get(pattern)
+                if pid is None:
+                    pid = pattern_ids[pattern] = len(patterns)
+                    patterns.append(pattern)
+                    self._targets.append([])
+                self._targets[pid].append((idx, weight))
+
+        self.patterns = patterns
+        self.automaton = AhoCorasick(patterns)
+
+    def _totals(self, text: str) -> Dict[int, float]:
+        t = (text or "").lower()
+        totals: Dict[int, float] = {}
+        for pid in self.automaton.search(t):
+            for idx, weight in self._targets[pid]:
+                totals[idx] = totals.get(idx, 0.0) + weight
+        return totals
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """상황별 점수 (매칭된 키워드 weight 합). 매칭 없는 상황은 빠짐."""
+        return {self.names[i]: s for i, s in self._totals(text).items()}
+
+    def classify(self, text: str) -> str:
+        best: Optional[Tuple[float, float]] = None
+        best_name = self.default
+        for idx, score in self._totals(text).items():
+            if score <= self.min_scores[idx]:
+                continue
+            key = (self.priorities[idx], score)
+            if best is None or key > best:
+                best, best_name = key, self.names[idx]
+        return best_name
+
+
+class SituationClassifier:
+    """규칙 파일을 읽어 두고, 바뀌면 다시 컴파일하는 상황 분류기."""
+
+    def __init__(
+        self,
+        path: Path = SITUATION_RULES_PATH,
+        check_interval: float = SITUATION_RULES_CHECK_SEC,
+    ) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._rules: Optional[SituationRuleSet] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+        self.fingerprint = ""
+        self.loaded_at: Optional[float] = None
+        self.compile_seconds: Optional[float] = None
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        규칙 파일을 다시 읽어 컴파일한다.
+        실패하면 기존 규칙을 유지하고 예외를 다시 던진다 (처음 로딩이면 그대로 실패).
+        """
+        with self._lock:
+            try:
+                started = time.perf_counter()
+                mtime = self.path.stat().st_mtime
+                raw = self.path.read_bytes()
+                rules = SituationRuleSet(json.loads(raw))
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[situation] 규칙 로딩 실패 ({self.path}): {self.last_error}")
+                raise
+            self._rules = rules
+            self._mtime = mtime
+            self.fingerprint = hashlib.sha256(raw).hexdigest()[:16]
+            self.compile_seconds = time.perf_counter() - started
+            self.loaded_at = time.time()
+            self.reloads += 1
+            self.last_error = None
+            print(
+                f"[situation] 규칙 {len(rules.patterns)}개 / 상황 {len(rules.names)}개 "
+                f"로딩 ({self.compile_seconds * 1000:.1f}ms)"
+            )
+        return self.stats()
+
+    def _maybe_reload(self) -> None:
+        if self._rules is None:
+            self.reload()
+            return
+        if self.check_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            # 잘못된 파일이면 다시 수정될 때까지 재시도하지 않도록 먼저 기록
+            self._mtime = mtime
+            try:
+                self.reload()
+            except Exception:
+                pass  # 기존 규칙 유지 (last_error 에 기록됨)
+
+    @property
+    def rules(self) -> SituationRuleSet:
+        self._maybe_reload()
+        return self._rules  # type: ignore[return-value]
+
+    def version(self) -> str:
+        """현재 규칙 파일 내용의 해시 (캐시 키에 섞어서 규칙 변경 시 무효화)."""
+        self._maybe_reload()
+        return self.fingerprint
+
+    def classify(self, text: str) -> str:
+        return self.rules.classify(text)
+
+    def scores(self, text: str) -> Dict[str, float]:
+        return self.rules.scores(text)
+
+    def stats(self) -> Dict[str, Any]:
+        rules = self._rules
+        return {
+            "path": str(self.path),
+            "fingerprint": self.fingerprint,
+            "situations": list(rules.names) if rules else [],
+            "keywords": len(rules.patterns) if rules else 0,
+            "states": rules.automaton.states if rules else 0,
+            "loaded_at": self.loaded_at,
+            "compile_seconds": self.compile_seconds,
+            "reloads": self.reloads,
+            "check_interval": self.check_interval,
+            "last_error": self.last_error,
+        }
+
+
+situation_classifier = SituationClassifier()
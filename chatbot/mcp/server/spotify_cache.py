@@ -0,0 +1,652 @@
+# chatbot/mcp/server/spotify_cache.py
+# -*- coding: utf-8 -*-
+"""
+Spotify 곡 검색 결과 영구 캐시 (SQLite).
+
+LLM이 추천하는 곡은 대부분 같은 몇백 곡이므로, (제목, 아티스트) 기준으로
+Spotify 검색 결과를 chat.db 옆의 spotify_cache.db 에 저장해 두고 재사용한다.
+- 매칭 성공: track_id / uri / link / preview_url + 제목 유사도(ratio) 저장
+- 매칭 실패(검색 실패, 유사도 낮음, 링크 없음)도 저장 → 같은 곡을 다시 검색하지 않음
+- 성공/실패 각각 TTL, 전체 개수 상한(오래 안 쓰인 것부터 삭제)
+
+spotify_tracks 테이블은 track_id 기준 메타데이터 (제목, 아티스트, 링크, preview_url).
+검색으로 찾은 곡과 채팅 로그에 남은 곡을 모아 두고, spotify_refresh.py 가
+/v1/tracks?ids= (50개씩) 로 오래된 것부터 다시 받아 갱신한다 (refreshed_at).
+"""
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CACHE_DB_PATH = Path(
+    os.getenv(
+        "SPOTIFY_CACHE_DB_PATH",
+        str(Path(__file__).resolve().parent / "spotify_cache.db"),
+    )
+)
+SPOTIFY_CACHE_ENABLED = os.getenv("SPOTIFY_CACHE_ENABLED", "1") != "0"
+# 매칭 성공 결과 TTL (기본 7일)
+SPOTIFY_CACHE_TTL = int(os.getenv("SPOTIFY_CACHE_TTL", str(7 * 24 * 3600)))
+# 매칭 실패 결과 TTL (기본 1일, 카탈로그가 바뀔 수 있으므로 더 짧게)
+SPOTIFY_CACHE_NEGATIVE_TTL = int(
+    os.getenv("SPOTIFY_CACHE_NEGATIVE_TTL", str(24 * 3600))
+)
+SPOTIFY_CACHE_MAX_ENTRIES = int(os.getenv("SPOTIFY_CACHE_MAX_ENTRIES", "50000"))
+
+# 캐시 상태 값
+STATUS_FOUND = "found"
+STATUS_NOT_FOUND = "not_found"  # 검색 결과 없음
+STATUS_LOW_RATIO = "low_ratio"  # 제목 유사도 낮음
+STATUS_NO_LINK = "no_link"  # 링크/ID 없음
+
+# spotify_tracks 상태 값
+TRACK_OK = "ok"
+TRACK_GONE = "gone"  # /v1/tracks 가 null 을 돌려준 곡 (삭제 / 지역 제한)
+
+# 메타데이터 갱신에 이 횟수 이상 실패한 곡은 더 시도하지 않음
+_TRACK_MAX_FAILURES = 5
+
+# put 몇 번마다 만료/상한 정리를 돌릴지
+_EVICT_EVERY = 200
+# 적중 시각(last_hit_at)은 LRU 정리용이라 정확할 필요가 없다.
+# 저장된 값이 이보다 최근이면 기록하지 않고, 기록할 것도 메모리에 모았다가
+# _HIT_FLUSH_SEC 마다 (또는 put / 정리 때) 한 트랜잭션으로 쓴다
+# → 캐시 적중(읽기)이 워커마다 쓰기 락을 잡지 않음
+_HIT_RESOLUTION_SEC = 300.0
+_HIT_FLUSH_SEC = 60.0
+_HIT_FLUSH_MAX = 1000
+
+
+def normalize_key(title: str, artist: str) -> str:
+    """제목/아티스트를 정규화해서 캐시 키를 만든다 (대소문자, 공백 무시)."""
+
+    def _norm(s: str) -> str:
+        s = unicodedata.normalize("NFKC", s or "")
+        return "".join(ch for ch in s.lower() if not ch.isspace())
+
+    return f"{_norm(title)}\x1f{_norm(artist)}"
+
+
+class SpotifyTrackCache:
+    """(제목, 아티스트) → Spotify 검색 결과 캐시."""
+
+    def __init__(
+        self,
+        db_path: Path = CACHE_DB_PATH,
+        ttl: int = SPOTIFY_CACHE_TTL,
+        negative_ttl: int = SPOTIFY_CACHE_NEGATIVE_TTL,
+        max_entries: int = SPOTIFY_CACHE_MAX_ENTRIES,
+        enabled: bool = SPOTIFY_CACHE_ENABLED,
+    ) -> None:
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts_since_evict = 0
+        # cache_key → 아직 DB 에 안 쓴 마지막 적중 시각
+        self._pending_hits: Dict[str, float] = {}
+        self._hits_flushed_at = time.time()
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+
+    # ---------- 내부 ----------
+    def _after_fork(self) -> None:
+        # fork 된 워커는 부모의 SQLite 연결을 쓰지 않고 새로 연결
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending_hits = {}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        # 처음 쓸 때 연결 (import 시점에는 파일을 만들지 않음)
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spotify_track_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    spotify_title TEXT,
+                    spotify_artist TEXT,
+                    track_id TEXT,
+                    uri TEXT,
+                    link TEXT,
+                    preview_url TEXT,
+                    title_ratio REAL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_hit_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_spotify_cache_expires "
+                "ON spotify_track_cache (expires_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_spotify_cache_last_hit "
+                "ON spotify_track_cache (last_hit_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_spotify_cache_track_id "
+                "ON spotify_track_cache (track_id)"
+            )
+            # refreshed_at = 0 이면 아직 /v1/tracks 로 확인한 적 없음
+            # lease_until: 갱신 중인 프로세스가 잡아 둔 시각 (워커끼리 중복 방지)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spotify_tracks (
+                    track_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    title TEXT,
+                    artist TEXT,
+                    uri TEXT,
+                    link TEXT,
+                    preview_url TEXT,
+                    refreshed_at REAL NOT NULL DEFAULT 0,
+                    first_seen_at REAL NOT NULL,
+                    last_seen_at REAL NOT NULL,
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_spotify_tracks_refreshed "
+                "ON spotify_tracks (status, refreshed_at)"
+            )
+            # 갱신 작업의 진행 위치 (워커 / 재시작과 상관없이 이어서 진행)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spotify_refresh_state (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _flush_hits_locked(self, now: float, commit: bool = True) -> None:
+        self._hits_flushed_at = now
+        if not self._pending_hits:
+            return
+        conn = self._get_conn()
+        # 그 사이 put 으로 더 최근 값이 들어갔을 수 있으므로 MAX
+        conn.executemany(
+            "UPDATE spotify_track_cache SET last_hit_at = MAX(last_hit_at, ?) "
+            "WHERE cache_key = ?",
+            [(ts, key) for key, ts in self._pending_hits.items()],
+        )
+        self._pending_hits = {}
+        if commit:
+            conn.commit()
+
+    def _evict_locked(self, now: float) -> None:
+        self._flush_hits_locked(now, commit=False)
+        conn = self._get_conn()
+        cur = conn.execute(
+            "DELETE FROM spotify_track_cache WHERE expires_at <= ?", (now,)
+        )
+        removed = cur.rowcount or 0
+        total = conn.execute("SELECT COUNT(*) FROM spotify_track_cache").fetchone()[0]
+        overflow = total - self.max_entries
+        if overflow > 0:
+            cur = conn.execute(
+                """
+                DELETE FROM spotify_track_cache WHERE cache_key IN (
+                    SELECT cache_key FROM spotify_track_cache
+                    ORDER BY last_hit_at ASC
+                    LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+            removed += cur.rowcount or 0
+        conn.commit()
+        self.evictions += removed
+
+    # ---------- 공개 API ----------
+    def get(self, title: str, artist: str) -> Optional[Dict[str, Any]]:
+        """
+        캐시된 검색 결과를 반환. 없거나 만료됐으면 None.
+        반환 dict의 status가 STATUS_FOUND가 아니면 '이미 실패한 곡'이라는 뜻.
+        """
+        if not self.enabled:
+            return None
+
+        key = normalize_key(title, artist)
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                "SELECT * FROM spotify_track_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or row["expires_at"] <= now:
+                self.misses += 1
+                return None
+
+            if now - row["last_hit_at"] >= _HIT_RESOLUTION_SEC:
+                self._pending_hits[key] = now
+                if (
+                    now - self._hits_flushed_at >= _HIT_FLUSH_SEC
+                    or len(self._pending_hits) >= _HIT_FLUSH_MAX
+                ):
+                    self._flush_hits_locked(now)
+            if row["status"] == STATUS_FOUND:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+            return dict(row)
+
+    def put(
+        self,
+        title: str,
+        artist: str,
+        status: str,
+        track: Optional[Dict[str, Any]] = None,
+        title_ratio: Optional[float] = None,
+    ) -> None:
+        """
+        검색 결과를 저장한다.
+        track: {"spotify_title", "spotify_artist", "track_id", "uri", "link",
+                "preview_url"} (매칭 성공일 때만)
+        """
+        if not self.enabled:
+            return
+
+        track = track or {}
+        now = time.time()
+        ttl = self.ttl if status == STATUS_FOUND else self.negative_ttl
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO spotify_track_cache (
+                    cache_key, status, spotify_title, spotify_artist, track_id,
+                    uri, link, preview_url, title_ratio,
+                    created_at, expires_at, last_hit_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    normalize_key(title, artist),
+                    status,
+                    track.get("spotify_title", ""),
+                    track.get("spotify_artist", ""),
+                    track.get("track_id", ""),
+                    track.get("uri", ""),
+                    track.get("link", ""),
+                    track.get("preview_url", ""),
+                    title_ratio,
+                    now,
+                    now + ttl,
+                    now,
+                ),
+            )
+            if status == STATUS_FOUND and track.get("track_id"):
+                # 방금 검색한 결과이므로 갱신된 메타데이터로 취급
+                self._upsert_tracks_locked([track], refreshed_at=now, now=now)
+            # 어차피 쓰기 트랜잭션이므로 모아 둔 적중 시각도 같이
+            self._flush_hits_locked(now, commit=False)
+            conn.commit()
+            self.puts += 1
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= _EVICT_EVERY:
+                self._puts_since_evict = 0
+                self._evict_locked(now)
+
+    # ---------- track_id 메타데이터 (spotify_tracks) ----------
+    def _upsert_tracks_locked(
+        self, tracks: Iterable[Dict[str, Any]], refreshed_at: float, now: float
+    ) -> int:
+        rows = [
+            (
+                t["track_id"],
+                TRACK_OK,
+                t.get("spotify_title") or t.get("title") or "",
+                t.get("spotify_artist") or t.get("artist") or "",
+                t.get("uri") or "",
+                t.get("link") or "",
+                t.get("preview_url") or "",
+                refreshed_at,
+                now,
+                now,
+            )
+            for t in tracks
+            if t.get("track_id")
+        ]
+        if not rows:
+            return 0
+        if refreshed_at > 0:
+            # 새로 받은 메타데이터 → 기존 값을 덮어씀
+            on_conflict = """
+                status = excluded.status, title = excluded.title,
+                artist = excluded.artist, uri = excluded.uri, link = excluded.link,
+                preview_url = excluded.preview_url,
+                refreshed_at = excluded.refreshed_at, failures = 0,
+                last_seen_at = MAX(last_seen_at, excluded.last_seen_at)
+            """
+        else:
+            # 로그에서 다시 본 곡 → 언제 마지막으로 쓰였는지만 갱신
+            on_conflict = "last_seen_at = MAX(last_seen_at, excluded.last_seen_at)"
+        self._get_conn().executemany(
+            f"""
+            INSERT INTO spotify_tracks (
+                track_id, status, title, artist, uri, link, preview_url,
+                refreshed_at, first_seen_at, last_seen_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(track_id) DO UPDATE SET {on_conflict}
+            """,
+            rows,
+        )
+        return len(rows)
+
+    def remember_tracks(self, tracks: Iterable[Dict[str, Any]]) -> int:
+        """
+        track_id 가 있는 곡(채팅 로그의 songs 등)을 메타데이터 갱신 대상에 등록.
+        이미 있는 곡은 last_seen_at 만 갱신한다. 등록/갱신한 곡 수를 반환.
+        """
+        if not self.enabled:
+            return 0
+        now = time.time()
+        with self._lock:
+            n = self._upsert_tracks_locked(tracks, refreshed_at=0.0, now=now)
+            self._get_conn().commit()
+        return n
+
+    def sync_tracks_from_search_cache(self) -> int:
+        """spotify_tracks 도입 전에 저장된 검색 성공 결과를 옮겨 담는다."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            conn = self._get_conn()
+            cur = conn.execute(
+                """
+                INSERT INTO spotify_tracks (
+                    track_id, status, title, artist, uri, link, preview_url,
+                    refreshed_at, first_seen_at, last_seen_at
+                )
+                SELECT track_id, ?, spotify_title, spotify_artist, uri, link,
+                       preview_url, MAX(created_at), MIN(created_at), MAX(last_hit_at)
+                FROM spotify_track_cache
+                WHERE status = ? AND track_id != ''
+                GROUP BY track_id
+                ON CONFLICT(track_id) DO NOTHING
+                """,
+                (TRACK_OK, STATUS_FOUND),
+            )
+            conn.commit()
+            return cur.rowcount or 0
+
+    def claim_stale_tracks(
+        self, stale_before: float, limit: int, lease: float
+    ) -> List[str]:
+        """
+        refreshed_at 이 stale_before(시각)보다 이전인 곡을 최대 limit 개 골라
+        lease 초 동안 잡아 둔다 (다른 워커 프로세스가 같은 곡을 동시에 갱신하지
+        않도록). 최근에 쓰인 곡부터.
+        """
+        if not self.enabled or limit <= 0:
+            return []
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            conn.commit()
+            # 고르기 + lease 기록을 한 쓰기 트랜잭션으로 (프로세스 간 경쟁 방지)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT track_id FROM spotify_tracks
+                    WHERE status = ? AND refreshed_at < ? AND lease_until <= ?
+                      AND failures < ?
+                    ORDER BY last_seen_at DESC
+                    LIMIT ?
+                    """,
+                    (TRACK_OK, stale_before, now, _TRACK_MAX_FAILURES, limit),
+                ).fetchall()
+                ids = [r["track_id"] for r in rows]
+                conn.executemany(
+                    "UPDATE spotify_tracks SET lease_until = ? WHERE track_id = ?",
+                    [(now + lease, tid) for tid in ids],
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return ids
+
+    def release_tracks(self, track_ids: List[str], count_failure: bool = True) -> None:
+        """
+        갱신하지 못한 곡을 돌려놓는다.
+        - count_failure=True: 곡 자체의 문제(잘못된 id 등). 실패 횟수를 올리고
+          lease 는 만료될 때까지 두어 같은 주기에 다시 고르지 않게 한다
+        - count_failure=False: 429 / 네트워크 오류처럼 곡과 무관한 실패.
+          lease 만 풀고 실패 횟수는 그대로 (다음 주기에 재시도)
+        """
+        if not self.enabled or not track_ids:
+            return
+        if count_failure:
+            sql = "UPDATE spotify_tracks SET failures = failures + 1 WHERE track_id = ?"
+        else:
+            sql = "UPDATE spotify_tracks SET lease_until = 0 WHERE track_id = ?"
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany(sql, [(tid,) for tid in track_ids])
+            conn.commit()
+
+    def apply_track_metadata(
+        self, results: List[Tuple[str, Optional[Dict[str, Any]]]]
+    ) -> Dict[str, int]:
+        """
+        /v1/tracks 응답을 반영한다. results: [(track_id, 새 메타데이터 또는 None)]
+        - 메타데이터: spotify_tracks + 같은 track_id 의 검색 캐시 항목 갱신
+        - None(삭제/재생 불가): gone 으로 표시하고 검색 캐시 항목은 지워서 재검색
+        반환: {"updated": 값이 바뀐 곡, "unchanged": 그대로인 곡, "gone": 없어진 곡}
+        """
+        counts = {"updated": 0, "unchanged": 0, "gone": 0}
+        if not self.enabled or not results:
+            return counts
+        now = time.time()
+        fields = ("title", "artist", "uri", "link", "preview_url")
+        with self._lock:
+            conn = self._get_conn()
+            for track_id, meta in results:
+                if meta is None:
+                    conn.execute(
+                        "UPDATE spotify_tracks SET status = ?, refreshed_at = ?, "
+                        "lease_until = 0 WHERE track_id = ?",
+                        (TRACK_GONE, now, track_id),
+                    )
+                    conn.execute(
+                        "DELETE FROM spotify_track_cache WHERE track_id = ?",
+                        (track_id,),
+                    )
+                    counts["gone"] += 1
+                    continue
+
+                old = conn.execute(
+                    "SELECT title, artist, uri, link, preview_url FROM spotify_tracks "
+                    "WHERE track_id = ?",
+                    (track_id,),
+                ).fetchone()
+                changed = old is None or any(
+                    (old[f] or "") != (meta.get(f) or "") for f in fields
+                )
+                conn.execute(
+                    """
+                    UPDATE spotify_tracks
+                    SET status = ?, title = ?, artist = ?, uri = ?, link = ?,
+                        preview_url = ?, refreshed_at = ?, lease_until = 0,
+                        failures = 0
+                    WHERE track_id = ?
+                    """,
+                    (TRACK_OK, *(meta.get(f) or "" for f in fields), now, track_id),
+                )
+                if changed:
+                    conn.execute(
+                        """
+                        UPDATE spotify_track_cache
+                        SET spotify_title = ?, spotify_artist = ?, uri = ?, link = ?,
+                            preview_url = ?
+                        WHERE track_id = ? AND status = ?
+                        """,
+                        (*(meta.get(f) or "" for f in fields), track_id, STATUS_FOUND),
+                    )
+                    counts["updated"] += 1
+                else:
+                    counts["unchanged"] += 1
+            conn.commit()
+        return counts
+
+    def refresh_state(self, name: str) -> int:
+        """갱신 작업 진행 위치 (없으면 0)."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            row = (
+                self._get_conn()
+                .execute(
+                    "SELECT value FROM spotify_refresh_state WHERE name = ?", (name,)
+                )
+                .fetchone()
+            )
+        return row["value"] if row else 0
+
+    def advance_refresh_state(self, name: str, value: int) -> None:
+        """진행 위치를 앞으로만 옮김 (다른 워커가 더 멀리 갔으면 그대로)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                """
+                INSERT INTO spotify_refresh_state (name, value) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)
+                """,
+                (name, value),
+            )
+            conn.commit()
+
+    def track_metadata(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """spotify_tracks 에 저장된 곡 메타데이터 (없으면 None)."""
+        if not self.enabled or not track_id:
+            return None
+        with self._lock:
+            row = (
+                self._get_conn()
+                .execute("SELECT * FROM spotify_tracks WHERE track_id = ?", (track_id,))
+                .fetchone()
+            )
+        return dict(row) if row is not None else None
+
+    def track_staleness(self, max_age: float) -> Dict[str, Any]:
+        """메타데이터 신선도: 상태별 곡 수, max_age 보다 오래된 곡 수, 가장 오래된 나이."""
+        if not self.enabled:
+            return {}
+        now = time.time()
+        with self._lock:
+            row = (
+                self._get_conn()
+                .execute(
+                    """
+                    SELECT
+                        COUNT(*) AS total,
+                        SUM(status = ?) AS ok,
+                        SUM(status = ?) AS gone,
+                        SUM(status = ? AND refreshed_at <= ?) AS stale,
+                        SUM(status = ? AND refreshed_at = 0) AS never_refreshed,
+                        MIN(CASE WHEN status = ? THEN refreshed_at END) AS oldest
+                    FROM spotify_tracks
+                    """,
+                    (TRACK_OK, TRACK_GONE, TRACK_OK, now - max_age, TRACK_OK, TRACK_OK),
+                )
+                .fetchone()
+            )
+        oldest = row["oldest"]
+        return {
+            "tracks": row["total"] or 0,
+            "ok": row["ok"] or 0,
+            "gone": row["gone"] or 0,
+            "stale": row["stale"] or 0,
+            "never_refreshed": row["never_refreshed"] or 0,
+            "oldest_age_seconds": (now - oldest if oldest else None),
+            "max_age": max_age,
+        }
+
+    def init_db(self) -> None:
+        """테이블만 만들고 연결은 닫음 (pre-fork 부모에서 워커를 띄우기 전에 호출)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._get_conn().close()
+            self._conn = None
+
+    def evict(self) -> None:
+        """만료된 항목 삭제 + 상한 초과분 정리."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._evict_locked(time.time())
+
+    def clear(self) -> int:
+        """캐시 전체 삭제. 삭제된 항목 수를 반환."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            conn = self._get_conn()
+            cur = conn.execute("DELETE FROM spotify_track_cache")
+            conn.commit()
+            return cur.rowcount or 0
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 크기 산정용 통계 (적중률 포함)."""
+        lookups = self.hits + self.negative_hits + self.misses
+        result: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.hits + self.negative_hits) / lookups if lookups else 0.0
+            ),
+            "puts": self.puts,
+            "evictions": self.evictions,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "max_entries": self.max_entries,
+        }
+        if self.enabled:
+            with self._lock:
+                conn = self._get_conn()
+                rows = conn.execute(
+                    "SELECT status, COUNT(*) AS n FROM spotify_track_cache "
+                    "GROUP BY status"
+                ).fetchall()
+            by_status = {r["status"]: r["n"] for r in rows}
+            result["entries"] = sum(by_status.values())
+            result["entries_by_status"] = by_status
+        return result
+
+
+# 서버 전체에서 공유하는 캐시 인스턴스
+spotify_cache = SpotifyTrackCache()
@@ -0,0 +1,447 @@
+# chatbot/mcp/server/spotify_client.py
+# -*- coding: utf-8 -*-
+"""
+Spotify Web API 클라이언트 (동기: requests / 비동기: httpx).
+
+spotipy 는 동기 requests 기반이라 이벤트 루프에서 쓰면 스레드를 하나씩
+붙잡고 있게 된다. async 엔드포인트에서는 AsyncSpotifyClient 로,
+동기 경로(스레드 풀 검색)에서는 SpotifyClient 로 검색한다.
+- Client Credentials 토큰을 만료 전까지 캐시
+- 하나의 커넥션 풀(keep-alive)을 요청 간 공유 (동시 검색 수에 맞춰 크기 설정)
+- 두 클라이언트가 같은 토큰 버킷(spotify_rate_limiter)으로 초당 호출 수를 맞춤
+- 429 는 Retry-After 만큼 버킷 전체를 멈추고 재시도, 5xx / 연결 오류는 지수 백오프
+- SPOTIFY_HEDGE_AFTER_MS 가 지나도 검색 응답이 없으면 같은 요청을 하나 더 보내서
+  먼저 온 응답을 쓴다 (토큰이 남아 있을 때만. 느린 꼬리 지연 줄이기)
+"""
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_futures
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import SPOTIFY_HTTP_EVENTS
+from .ratelimit import TokenBucket
+
+DEFAULT_SPOTIFY_API_BASE = "https://api.spotify.com/v1"
+DEFAULT_SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+SPOTIFY_API_BASE = os.getenv("SPOTIFY_API_BASE", DEFAULT_SPOTIFY_API_BASE)
+SPOTIFY_TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", DEFAULT_SPOTIFY_TOKEN_URL)
+SPOTIFY_HTTP_MAX_CONNECTIONS = int(os.getenv("SPOTIFY_HTTP_MAX_CONNECTIONS", "64"))
+SPOTIFY_HTTP_TIMEOUT = float(os.getenv("SPOTIFY_HTTP_TIMEOUT", "10"))
+
+# 프로세스당 초당 요청 수 / 순간 최대 (0 이면 제한 없이 Retry-After 만 따름)
+SPOTIFY_RATE_LIMIT = float(os.getenv("SPOTIFY_RATE_LIMIT", "20"))
+SPOTIFY_RATE_BURST = float(os.getenv("SPOTIFY_RATE_BURST", "40"))
+# 토큰을 이 시간(초) 넘게 기다려야 하면 기다리지 않고 실패 처리
+SPOTIFY_RATE_WAIT_MAX = float(os.getenv("SPOTIFY_RATE_WAIT_MAX", "5"))
+# 429 / 5xx / 연결 오류 재시도 횟수
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "3"))
+# Retry-After 가 이보다 길면 재시도하지 않음 (요청을 오래 붙잡지 않도록)
+SPOTIFY_RETRY_AFTER_MAX = float(os.getenv("SPOTIFY_RETRY_AFTER_MAX", "10"))
+# 검색 헤징 대기 시간 (ms, 0 이면 헤징 안 함)
+SPOTIFY_HEDGE_AFTER_MS = float(os.getenv("SPOTIFY_HEDGE_AFTER_MS", "0"))
+
+# 토큰 만료 몇 초 전에 미리 갱신할지
+_TOKEN_REFRESH_MARGIN = 60
+# 5xx / 연결 오류 백오프 (base * 2^attempt, ±50% jitter)
+_BACKOFF_BASE = 0.25
+_BACKOFF_MAX = 4.0
+
+# 동기 / 비동기 클라이언트가 같이 쓰는 초당 호출 수 제한
+spotify_rate_limiter = TokenBucket("spotify", SPOTIFY_RATE_LIMIT, SPOTIFY_RATE_BURST)
+
+
+class SpotifyThrottled(Exception):
+    """429 가 계속되거나 Retry-After 가 너무 길어서 포기한 경우."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 헤더 (초 또는 HTTP 날짜) → 초."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _backoff(attempt: int) -> float:
+    delay = min(_BACKOFF_MAX, _BACKOFF_BASE * (2**attempt))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class _SpotifyBase:
+    """동기 / 비동기 클라이언트 공통 설정 + 재시도 판단 + 카운터."""
+
+    kind = "base"
+
+    def __init__(
+        self,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        api_base: str = SPOTIFY_API_BASE,
+        token_url: str = SPOTIFY_TOKEN_URL,
+        max_connections: int = SPOTIFY_HTTP_MAX_CONNECTIONS,
+        timeout: float = SPOTIFY_HTTP_TIMEOUT,
+        limiter: TokenBucket = spotify_rate_limiter,
+        max_retries: int = SPOTIFY_MAX_RETRIES,
+        hedge_after: float = SPOTIFY_HEDGE_AFTER_MS / 1000,
+    ) -> None:
+        if not client_id or not client_secret:
+            raise RuntimeError(
+                "SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET 환경 변수가 필요합니다."
+            )
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_base = api_base.rstrip("/")
+        self.token_url = token_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._counters: Dict[str, int] = {}
+        self._counters_lock = threading.Lock()
+
+    def _count(self, event: str) -> None:
+        with self._counters_lock:
+            self._counters[event] = self._counters.get(event, 0) + 1
+        SPOTIFY_HTTP_EVENTS.labels(self.kind, event).inc()
+
+    def _token_valid(self) -> bool:
+        return bool(self._token) and time.time() < self._token_expires_at
+
+    def _store_token(self, data: Dict[str, Any]) -> str:
+        self._token = data["access_token"]
+        expires_in = int(data.get("expires_in", 3600))
+        self._token_expires_at = time.time() + expires_in - _TOKEN_REFRESH_MARGIN
+        return self._token  # type: ignore[return-value]
+
+    def _retry_delay(
+        self,
+        status: Optional[int],
+        retry_after: Optional[str],
+        attempt: int,
+        retries: bool = True,
+    ) -> Optional[float]:
+        """
+        재시도 전에 기다릴 시간(초). 재시도하면 안 되면 None.
+        status 가 None 이면 연결 오류 / 타임아웃.
+        retries=False (헤징 요청) 여도 429 의 Retry-After 는 리미터에 반영한다.
+        """
+        if status is not None and status != 429 and status < 500:
+            return None
+        retry_after_sec = None
+        if status == 429:
+            self._count("throttled")
+            retry_after_sec = parse_retry_after(retry_after)
+            if retry_after_sec is not None:
+                # 이 요청뿐 아니라 같은 프로세스의 모든 Spotify 요청이 같이 쉰다
+                self.limiter.pause(retry_after_sec)
+        if not retries:
+            return None
+        if attempt >= self.max_retries or (
+            retry_after_sec is not None and retry_after_sec > SPOTIFY_RETRY_AFTER_MAX
+        ):
+            self._count("gave_up")
+            return None
+        self._count("retry")
+        return retry_after_sec if retry_after_sec is not None else _backoff(attempt)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {
+            "client": self.kind,
+            "max_connections": self.max_connections,
+            "max_retries": self.max_retries,
+            "hedge_after_ms": self.hedge_after * 1000,
+            "events": counters,
+            "rate_limiter": self.limiter.stats(),
+        }
+
+
+class SpotifyClient(_SpotifyBase):
+    """동기 클라이언트 (스레드 풀 검색용). requests.Session 커넥션 풀 공유."""
+
+    kind = "sync"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._session = requests.Session()
+        # 기본 풀 크기(10)보다 동시 검색이 많으면 남는 연결을 버리고
+        # 매번 새로 TLS 연결을 맺으므로 동시 검색 수에 맞춰 늘린다
+        adapter = HTTPAdapter(
+            pool_connections=2, pool_maxsize=self.max_connections, max_retries=0
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers.update({"Accept-Language": "ko-KR,ko;q=0.9"})
+        self._token_lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_pool_lock = threading.Lock()
+
+    def _access_token(self) -> str:
+        if self._token_valid():
+            return self._token  # type: ignore[return-value]
+        with self._token_lock:
+            if self._token_valid():
+                return self._token  # type: ignore[return-value]
+            resp = self._session.post(
+                self.token_url,
+                data={"grant_type": "client_credentials"},
+                auth=(self.client_id, self.client_secret),
+                timeout=self.timeout,
+            )
+            resp.raise_for_status()
+            return self._store_token(resp.json())
+
+    def _send(self, path: str, params: Dict[str, Any]) -> requests.Response:
+        token = self._access_token()
+        resp = self._session.get(
+            f"{self.api_base}{path}",
+            params=params,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=self.timeout,
+        )
+        if resp.status_code == 401:
+            # 토큰이 서버 쪽에서 먼저 만료된 경우 한 번만 갱신 후 재시도
+            self._token = None
+            token = self._access_token()
+            resp = self._session.get(
+                f"{self.api_base}{path}",
+                params=params,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=self.timeout,
+            )
+        return resp
+
+    def _get_with_retry(
+        self, path: str, params: Dict[str, Any], retries: bool = True
+    ) -> Dict[str, Any]:
+        attempt = 0
+        reserved = not retries  # 헤징 요청은 try_acquire 로 토큰을 이미 받음
+        while True:
+            if not reserved:
+                self.limiter.acquire(SPOTIFY_RATE_WAIT_MAX)
+            reserved = False
+            self._count("request")
+            try:
+                resp = self._send(path, params)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._retry_delay(None, None, attempt, retries)
+                if delay is None:
+                    raise
+            else:
+                if resp.status_code < 400:
+                    return resp.json()
+                delay = self._retry_delay(
+                    resp.status_code, resp.headers.get("Retry-After"), attempt, retries
+                )
+                if delay is None:
+                    if resp.status_code == 429:
+                        raise SpotifyThrottled(
+                            f"Spotify 429 (Retry-After={resp.headers.get('Retry-After')})"
+                        )
+                    resp.raise_for_status()
+            time.sleep(delay)
+            attempt += 1
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=self.max_connections,
+                    thread_name_prefix="spotify-hedge",
+                )
+            return self._hedge_pool
+
+    def _get_hedged(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        pool = self._pool()
+        primary = pool.submit(self._get_with_retry, path, params)
+        try:
+            return primary.result(timeout=self.hedge_after)
+        except FutureTimeoutError:
+            pass
+        if not self.limiter.try_acquire():
+            # 토큰이 모자라면 헤징이 오히려 429 를 부르므로 원래 요청만 기다림
+            return primary.result()
+        self._count("hedge")
+        hedge = pool.submit(self._get_with_retry, path, params, False)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    if fut is hedge:
+                        self._count("hedge_win")
+                    # 진 쪽 요청은 끊을 수 없으므로 끝날 때까지 풀에서 돌게 둠
+                    return fut.result()
+        return primary.result()  # 둘 다 실패 → 원래 요청의 예외
+
+    def get(
+        self, path: str, params: Dict[str, Any], hedge: bool = False
+    ) -> Dict[str, Any]:
+        if hedge and self.hedge_after > 0:
+            return self._get_hedged(path, params)
+        return self._get_with_retry(path, params)
+
+    def search(self, q: str, type: str = "track", limit: int = 1) -> Dict[str, Any]:
+        """spotipy.Spotify.search 와 같은 형태의 결과를 반환."""
+        return self.get("/search", {"q": q, "type": type, "limit": limit}, hedge=True)
+
+    def close(self) -> None:
+        self._session.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+
+
+class AsyncSpotifyClient(_SpotifyBase):
+    kind = "async"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._token_lock: Optional[asyncio.Lock] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        # AsyncClient 는 이벤트 루프 안에서 만들어야 하므로 처음 쓸 때 생성
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={"Accept-Language": "ko-KR,ko;q=0.9"},
+            )
+        return self._http
+
+    async def _access_token(self) -> str:
+        if self._token_valid():
+            return self._token  # type: ignore[return-value]
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if self._token_valid():
+                return self._token  # type: ignore[return-value]
+            resp = await self._client().post(
+                self.token_url,
+                data={"grant_type": "client_credentials"},
+                auth=(self.client_id, self.client_secret),
+            )
+            resp.raise_for_status()
+            return self._store_token(resp.json())
+
+    async def _send(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        token = await self._access_token()
+        resp = await self._client().get(
+            f"{self.api_base}{path}",
+            params=params,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        if resp.status_code == 401:
+            # 토큰이 서버 쪽에서 먼저 만료된 경우 한 번만 갱신 후 재시도
+            self._token = None
+            token = await self._access_token()
+            resp = await self._client().get(
+                f"{self.api_base}{path}",
+                params=params,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        return resp
+
+    async def _get_with_retry(
+        self, path: str, params: Dict[str, Any], retries: bool = True
+    ) -> Dict[str, Any]:
+        attempt = 0
+        reserved = not retries  # 헤징 요청은 try_acquire 로 토큰을 이미 받음
+        while True:
+            if not reserved:
+                await self.limiter.acquire_async(SPOTIFY_RATE_WAIT_MAX)
+            reserved = False
+            self._count("request")
+            try:
+                resp = await self._send(path, params)
+            except httpx.TransportError:
+                delay = self._retry_delay(None, None, attempt, retries)
+                if delay is None:
+                    raise
+            else:
+                if resp.status_code < 400:
+                    return resp.json()
+                delay = self._retry_delay(
+                    resp.status_code, resp.headers.get("Retry-After"), attempt, retries
+                )
+                if delay is None:
+                    if resp.status_code == 429:
+                        raise SpotifyThrottled(
+                            f"Spotify 429 (Retry-After={resp.headers.get('Retry-After')})"
+                        )
+                    resp.raise_for_status()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get_hedged(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        primary = asyncio.ensure_future(self._get_with_retry(path, params))
+        hedge: "Optional[asyncio.Future[Dict[str, Any]]]" = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+            if done or not self.limiter.try_acquire():
+                return await primary
+            self._count("hedge")
+            hedge = asyncio.ensure_future(self._get_with_retry(path, params, False))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_win")
+                        return task.result()
+            return primary.result()  # 둘 다 실패 → 원래 요청의 예외
+        finally:
+            # 진 쪽 요청(또는 호출 측이 취소한 경우 둘 다)은 취소
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def get(
+        self, path: str, params: Dict[str, Any], hedge: bool = False
+    ) -> Dict[str, Any]:
+        if hedge and self.hedge_after > 0:
+            return await self._get_hedged(path, params)
+        return await self._get_with_retry(path, params)
+
+    async def search(
+        self, q: str, type: str = "track", limit: int = 1
+    ) -> Dict[str, Any]:
+        """spotipy.Spotify.search 와 같은 형태의 결과를 반환."""
+        return await self.get(
+            "/search", {"q": q, "type": type, "limit": limit}, hedge=True
+        )
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
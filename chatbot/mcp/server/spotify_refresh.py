@@ -0,0 +1,287 @@
+# chatbot/mcp/server/spotify_refresh.py
+# -*- coding: utf-8 -*-
+"""
+Spotify 곡 메타데이터 일괄 갱신 (백그라운드).
+
+track_id 를 이미 알고 있는 곡(검색 캐시, 채팅 로그의 songs)은 제목으로 다시
+검색할 필요 없이 /v1/tracks?ids= 로 한 번에 50곡씩 최신 정보를 받을 수 있다.
+곡당 검색 1~2회 대신 50곡당 1회라서 preview_url / 링크 / 표시 이름을
+싸게 최신으로 유지할 수 있다.
+
+- 주기마다: 새 채팅 로그의 곡을 spotify_tracks 에 등록 → refreshed_at 이
+  SPOTIFY_REFRESH_MAX_AGE_SEC 보다 오래된 곡을 최근에 쓰인 순으로 골라 갱신
+- 바뀐 값은 검색 캐시(spotify_track_cache)에도 반영, 없어진 곡은 검색 캐시에서 삭제
+- Spotify 호출은 검색과 같은 토큰 버킷을 쓰고, 429 로 포기하면 이번 주기는 중단
+  (곡의 실패 횟수는 400/404 처럼 곡 자체가 문제일 때만 센다. 배치가 400 이면
+  반씩 나눠서 문제 있는 id 만 골라냄)
+- 워커 프로세스가 여러 개여도 곡마다 lease 를 잡으므로 같은 곡을 두 번 받지 않음
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .database import query_chat_logs
+from .metrics import SPOTIFY_REFRESH_TRACKS, stage
+from .spotify_cache import SpotifyTrackCache, spotify_cache
+from .spotify_client import SpotifyClient
+
+SPOTIFY_REFRESH_ENABLED = os.getenv("SPOTIFY_REFRESH_ENABLED", "1") != "0"
+# 갱신 주기 (초)
+SPOTIFY_REFRESH_INTERVAL_SEC = float(os.getenv("SPOTIFY_REFRESH_INTERVAL_SEC", "900"))
+# 이보다 오래 확인하지 않은 곡을 갱신 (기본 3일)
+SPOTIFY_REFRESH_MAX_AGE_SEC = float(
+    os.getenv("SPOTIFY_REFRESH_MAX_AGE_SEC", str(3 * 24 * 3600))
+)
+# 한 주기에 갱신할 최대 곡 수 (50곡 = API 1회)
+SPOTIFY_REFRESH_MAX_TRACKS = int(os.getenv("SPOTIFY_REFRESH_MAX_TRACKS", "2000"))
+
+# /v1/tracks 한 번에 넣을 수 있는 최대 id 수
+SPOTIFY_TRACKS_PER_CALL = 50
+# 곡을 잡아 두는 시간 (이 안에 못 끝내면 다른 워커가 가져감)
+_LEASE_SEC = 300
+_SCAN_PAGE = 500
+# spotify_refresh_state 키: 이 id 이하의 채팅 로그는 이미 spotify_tracks 에 등록함
+_LOG_HIGH_WATER = "chat_log_high_water"
+
+
+def is_track_error(e: Exception) -> bool:
+    """
+    요청한 곡 때문에 난 오류인지 (400 잘못된 id / 404).
+    429 포기, RateLimitTimeout, 5xx, 연결 오류는 곡과 무관 → 실패로 세지 않음.
+    (requests.HTTPError / httpx.HTTPStatusError 모두 e.response.status_code)
+    """
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return status in (400, 404)
+
+
+def track_metadata_from_api(track: Dict[str, Any]) -> Dict[str, Any]:
+    """/v1/tracks 의 track 객체 → spotify_tracks 에 저장할 필드."""
+    artists = track.get("artists") or []
+    return {
+        "title": track.get("name") or "",
+        "artist": artists[0].get("name", "") if artists else "",
+        "uri": track.get("uri") or "",
+        "link": (track.get("external_urls") or {}).get("spotify", ""),
+        "preview_url": track.get("preview_url") or "",
+    }
+
+
+class SpotifyMetadataRefresher:
+    def __init__(
+        self,
+        client_fn: Callable[[], SpotifyClient],
+        cache: SpotifyTrackCache = spotify_cache,
+        interval: float = SPOTIFY_REFRESH_INTERVAL_SEC,
+        max_age: float = SPOTIFY_REFRESH_MAX_AGE_SEC,
+        max_tracks: int = SPOTIFY_REFRESH_MAX_TRACKS,
+    ) -> None:
+        self.client_fn = client_fn
+        self.cache = cache
+        self.interval = interval
+        self.max_age = max_age
+        self.max_tracks = max_tracks
+
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._search_cache_synced = False
+
+        self.cycles = 0
+        self.api_calls = 0
+        self.refreshed = 0
+        self.updated = 0
+        self.gone = 0
+        self.errors = 0
+        self.last_run_at: Optional[float] = None
+        self.last_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    # ---------- 대상 등록 ----------
+    def _seed_from_chat_logs(self) -> int:
+        """
+        마지막으로 본 로그 이후에 쌓인 채팅 로그의 곡을 등록 (최신순으로 읽음).
+        어디까지 봤는지는 spotify_cache.db 에 저장 → 워커마다 / 재시작마다
+        chat_logs 전체를 다시 훑지 않음
+        """
+        high_water = self.cache.refresh_state(_LOG_HIGH_WATER)
+        cursor: Optional[int] = None
+        newest = high_water
+        seen = 0
+        done = False
+        while not done:
+            rows, cursor = query_chat_logs(
+                limit=_SCAN_PAGE, cursor=cursor, meta="songs"
+            )
+            tracks: List[Dict[str, Any]] = []
+            for r in rows:
+                if r["id"] <= high_water:
+                    done = True
+                    break
+                newest = max(newest, r["id"])
+                for song in (r["meta"] or {}).get("songs") or []:
+                    if song.get("track_id") and song.get("link"):
+                        tracks.append(song)
+            seen += self.cache.remember_tracks(tracks)
+            if cursor is None:
+                break
+        if newest > high_water:
+            self.cache.advance_refresh_state(_LOG_HIGH_WATER, newest)
+        return seen
+
+    # ---------- 갱신 ----------
+    def _fetch(self, ids: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        self.api_calls += 1
+        with stage("spotify_tracks"):
+            res = self.client_fn().get("/tracks", {"ids": ",".join(ids)})
+        # 응답 순서 = 요청 순서, 없는 곡은 null
+        tracks = res.get("tracks") or []
+        by_id = {t["id"]: t for t in tracks if t and t.get("id")}
+        return [
+            (tid, track_metadata_from_api(by_id[tid]) if tid in by_id else None)
+            for tid in ids
+        ]
+
+    def _fetch_isolating(
+        self, ids: List[str]
+    ) -> Tuple[List[Tuple[str, Optional[Dict[str, Any]]]], List[str]]:
+        """
+        _fetch 와 같지만, 곡 때문에 400/404 가 나면 반씩 나눠 다시 받아서
+        문제 있는 id 만 골라낸다. 반환: (결과, 문제 있는 id 목록)
+        곡과 무관한 오류는 그대로 올려 보낸다.
+        """
+        try:
+            return self._fetch(ids), []
+        except Exception as e:
+            if not is_track_error(e):
+                raise
+            if len(ids) == 1:
+                print(f"[spotify-refresh] 곡 {ids[0]} 조회 실패: {e}")
+                return [], list(ids)
+        mid = len(ids) // 2
+        left, left_bad = self._fetch_isolating(ids[:mid])
+        right, right_bad = self._fetch_isolating(ids[mid:])
+        return left + right, left_bad + right_bad
+
+    def refresh_once(self, max_tracks: Optional[int] = None) -> Dict[str, Any]:
+        """한 주기 실행 (동시에 두 번 돌지 않음). 이번 주기 결과를 반환."""
+        limit = self.max_tracks if max_tracks is None else max_tracks
+        summary: Dict[str, Any] = {
+            "seeded": 0,
+            "api_calls": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "gone": 0,
+            "failed": 0,
+        }
+        if not self.cache.enabled:
+            return summary
+        with self._run_lock:
+            started = time.perf_counter()
+            try:
+                if not self._search_cache_synced:
+                    summary["seeded"] += self.cache.sync_tracks_from_search_cache()
+                    self._search_cache_synced = True
+                summary["seeded"] += self._seed_from_chat_logs()
+
+                # 주기 시작 시각 기준 (이번 주기에 갱신한 곡은 다시 고르지 않음)
+                stale_before = time.time() - self.max_age
+                remaining = limit
+                while remaining > 0 and not self._stop.is_set():
+                    ids = self.cache.claim_stale_tracks(
+                        stale_before,
+                        min(SPOTIFY_TRACKS_PER_CALL, remaining),
+                        _LEASE_SEC,
+                    )
+                    if not ids:
+                        break
+                    remaining -= len(ids)
+                    calls_before = self.api_calls
+                    try:
+                        results, bad = self._fetch_isolating(ids)
+                    except Exception as e:
+                        # 429 로 포기했거나 네트워크 오류 → 이번 주기는 여기까지
+                        # (검색, 즉 사용자 요청에 Spotify 호출량을 양보하고 다음 주기에)
+                        # 곡 탓이 아니므로 실패 횟수는 올리지 않음
+                        summary["api_calls"] += self.api_calls - calls_before
+                        self.cache.release_tracks(ids, count_failure=False)
+                        summary["failed"] += len(ids)
+                        self._record_error(e)
+                        break
+                    summary["api_calls"] += self.api_calls - calls_before
+                    if bad:
+                        self.cache.release_tracks(bad)
+                        summary["failed"] += len(bad)
+                    counts = self.cache.apply_track_metadata(results)
+                    for key, n in counts.items():
+                        summary[key] += n
+                        if n:
+                            SPOTIFY_REFRESH_TRACKS.labels(key).inc(n)
+            finally:
+                self.cycles += 1
+                self.last_run_at = time.time()
+                self.last_seconds = time.perf_counter() - started
+            if summary["failed"]:
+                SPOTIFY_REFRESH_TRACKS.labels("failed").inc(summary["failed"])
+            self.refreshed += summary["updated"] + summary["unchanged"]
+            self.updated += summary["updated"]
+            self.gone += summary["gone"]
+        if summary["api_calls"] or summary["failed"]:
+            print(
+                f"[spotify-refresh] 곡 {summary['updated'] + summary['unchanged']}개 "
+                f"확인 (변경 {summary['updated']}, 삭제 {summary['gone']}, "
+                f"실패 {summary['failed']}) / API {summary['api_calls']}회 "
+                f"({self.last_seconds:.1f}s)"
+            )
+        return summary
+
+    def _record_error(self, e: Exception) -> None:
+        self.errors += 1
+        self.last_error = f"{type(e).__name__}: {e}"
+        print(f"[spotify-refresh] 갱신 실패: {self.last_error}")
+
+    # ---------- 백그라운드 ----------
+    def _run(self) -> None:
+        # 워커가 여러 개면 같은 시각에 몰리지 않도록 시작을 흩뜨림
+        delay = random.uniform(0, min(self.interval, 60.0))
+        while not self._stop.wait(delay):
+            try:
+                self.refresh_once()
+            except Exception as e:
+                self._record_error(e)
+            delay = self.interval * random.uniform(0.9, 1.1)
+
+    def start(self) -> None:
+        if self.interval <= 0:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="spotify-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval": self.interval,
+            "max_tracks": self.max_tracks,
+            "cycles": self.cycles,
+            "api_calls": self.api_calls,
+            "refreshed": self.refreshed,
+            "updated": self.updated,
+            "gone": self.gone,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_seconds": self.last_seconds,
+            "last_error": self.last_error,
+            "staleness": self.cache.track_staleness(self.max_age),
+        }
@@ -1,36 +1,110 @@
 # server/user_profile.py
 
-from typing import Any, Dict, List
+import copy
+import os
+from typing import Any, Dict, List, Optional, Tuple
 
 from chatbot.database import get_db
 
+from .cache import TTLCache
+from .metrics import stage
+
+# 설문 응답은 거의 안 바뀌므로 프로필을 잠깐 캐시 (설문 제출 시 백엔드가 무효화)
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+profile_cache = TTLCache(
+    maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL, name="user_profile"
+)
+
+# 프롬프트에 실제로 쓰는 필드만 가져온다
+_USER_PROJECTION = {"_id": 0, "display_name": 1, "hasSurvey": 1}
+_SURVEY_PROJECTION = {
+    "_id": 0,
+    "novelty": 1,
+    "yearCategory": 1,
+    "genres": 1,
+    "favorite_artists": 1,
+}
+
+
+def _fetch_profile_docs(
+    spotify_user_id: str,
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    users + 최신 surveyresponses 를 aggregate 한 번으로 읽는다.
+    반환: (user_doc, survey_doc)
+    """
+    db = get_db()
+
+    pipeline = [
+        {"$match": {"spotify_user_id": spotify_user_id}},
+        {"$limit": 1},
+        {
+            "$lookup": {
+                "from": "surveyresponses",
+                "localField": "spotify_user_id",
+                "foreignField": "user_id",
+                "pipeline": [
+                    {"$sort": {"created_at": -1}},
+                    {"$limit": 1},
+                    {"$project": _SURVEY_PROJECTION},
+                ],
+                "as": "survey",
+            }
+        },
+        {"$project": {**_USER_PROJECTION, "survey": 1}},
+    ]
+    docs = list(db["users"].aggregate(pipeline))
+    if docs:
+        user_doc = docs[0]
+        surveys = user_doc.pop("survey", [])
+        return user_doc, (surveys[0] if surveys else None)
+
+    # users 문서가 없는 경우에도 설문은 있을 수 있음
+    survey_doc = db["surveyresponses"].find_one(
+        {"user_id": spotify_user_id},
+        projection=_SURVEY_PROJECTION,
+        sort=[("created_at", -1)],
+    )
+    return None, survey_doc
+
+
+def invalidate_user_profile(spotify_user_id: Optional[str] = None) -> int:
+    """
+    프로필 캐시 무효화. spotify_user_id 가 없으면 전체 삭제.
+    반환: 삭제된 항목 수
+    """
+    if spotify_user_id is None:
+        return profile_cache.clear()
+    return 1 if profile_cache.delete(spotify_user_id) else 0
+
 
 def load_user_profile(spotify_user_id: str) -> Dict[str, Any]:
     """
     MongoDB의 users, surveyresponses 컬렉션에서
     해당 Spotify 유저의 정보를 읽어와 LLM 프롬프트용 dict로 변환한다.
+    (profile_cache 에 있으면 Mongo 조회 없이 반환)
 
     spotify_user_id: 예) "31xjzjfhw..." 같은 문자열
     """
-
-    db = get_db()
-
-    users_col = db["users"]
-    surveys_col = db["surveyresponses"]
-
-    # 1) User 기본 정보
-    user_doc = users_col.find_one({"spotify_user_id": spotify_user_id})
-
+    cached = profile_cache.get(spotify_user_id)
+    if cached is None:
+        with stage("profile_load"):
+            user_doc, survey_doc = _fetch_profile_docs(spotify_user_id)
+        cached = _build_profile(spotify_user_id, user_doc, survey_doc)
+        profile_cache.set(spotify_user_id, cached)
+    return copy.deepcopy(cached)
+
+
+def _build_profile(
+    spotify_user_id: str,
+    user_doc: Optional[Dict[str, Any]],
+    survey_doc: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
     # display_name, hasSurvey 같은 부가정보 (없으면 None/False)
     display_name = user_doc.get("display_name") if user_doc else None
     has_survey = user_doc.get("hasSurvey") if user_doc else False
 
-    # 2) 설문 정보 (가장 최근 것 하나)
-    survey_doc = surveys_col.find_one(
-        {"user_id": spotify_user_id},
-        sort=[("created_at", -1)],
-    )
-
     if survey_doc is None:
         # 설문 안 했을 때 기본값
         return {